@@ -4,3 +4,12 @@ from django.apps import AppConfig
 class AnalyzerConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'analyzer'
+
+    def ready(self):
+        # Registers the background job handlers.
+        from . import tasks  # noqa: F401
+        from .utils.jobs import autostart_worker
+
+        # Runs jobs left queued by processes that have exited, not only the
+        # ones this process enqueues.
+        autostart_worker()
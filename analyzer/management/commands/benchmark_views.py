@@ -0,0 +1,87 @@
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from analyzer.utils.atomic import atomic_write_text
+from analyzer.utils.benchmark import compare, generate_dataset, parse_size, run_views, size_label
+
+
+class Command(BaseCommand):
+    help = 'Benchmark the dashboard, state and district pages on synthetic datasets'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', default='10k,100k', help='Dataset sizes, e.g. 10k,100k,1M,10M.')
+        parser.add_argument('--concurrency', default='1,4,16', help='Concurrent clients per measurement.')
+        parser.add_argument('--requests', type=int, default=100, help='Requests per view and concurrency level.')
+        parser.add_argument('--work-dir', help='Where datasets are generated (default: BASE_DIR/.benchmarks).')
+        parser.add_argument('--baseline', help='Baseline file (default: BASE_DIR/benchmarks/baseline.json).')
+        parser.add_argument('--save-baseline', action='store_true', help='Store this run as the baseline.')
+        parser.add_argument('--tolerance', type=float, default=0.25,
+                            help='Allowed growth of latencies, response bytes and RSS over the baseline (0.25 = 25%%).')
+        parser.add_argument('--output', help='Also write the results to this JSON file.')
+        # Used by the run for one dataset, which happens in a fresh process.
+        parser.add_argument('--child-data-dir', help='==SUPPRESS==')
+        parser.add_argument('--child-output', help='==SUPPRESS==')
+
+    def handle(self, *args, **options):
+        concurrency = [int(level) for level in options['concurrency'].split(',')]
+        if options['child_data_dir']:
+            return self._run_child(options['child_data_dir'], options['child_output'], concurrency, options['requests'])
+
+        try:
+            sizes = [parse_size(size) for size in options['sizes'].split(',')]
+        except ValueError as error:
+            raise CommandError(str(error))
+        work_dir = options['work_dir'] or os.path.join(settings.BASE_DIR, '.benchmarks')
+        baseline_path = options['baseline'] or os.path.join(settings.BASE_DIR, 'benchmarks', 'baseline.json')
+
+        results = {}
+        for rows in sizes:
+            label = size_label(rows)
+            data_dir = generate_dataset(rows, os.path.join(work_dir, label), log=self.stdout.write)
+            self.stdout.write(f"🚀 Benchmarking {label} rows...")
+            with tempfile.NamedTemporaryFile(suffix='.json') as output:
+                subprocess.run(
+                    [sys.executable, os.path.join(settings.BASE_DIR, 'manage.py'), 'benchmark_views',
+                     '--child-data-dir', data_dir, '--child-output', output.name, '--skip-checks',
+                     '--concurrency', options['concurrency'], '--requests', str(options['requests'])],
+                    check=True,
+                )
+                with open(output.name, encoding='utf-8') as handle:
+                    results[label] = json.load(handle)
+            self._report(label, results[label])
+
+        if options['output']:
+            atomic_write_text(json.dumps(results, indent=2), options['output'])
+        if options['save_baseline']:
+            atomic_write_text(json.dumps(results, indent=2), baseline_path)
+            self.stdout.write(f"💾 Baseline saved to {baseline_path}")
+            return
+        if os.path.exists(baseline_path):
+            with open(baseline_path, encoding='utf-8') as handle:
+                regressions = compare(results, json.load(handle), options['tolerance'])
+            if regressions:
+                raise CommandError("Performance regressions:\n" + "\n".join(f"  {line}" for line in regressions))
+            self.stdout.write(f"✅ No regressions beyond {options['tolerance']:.0%} of {baseline_path}")
+
+    def _run_child(self, data_dir, output, concurrency, requests):
+        # Must happen before the dataset store and catalog are first used.
+        settings.DATA_DIR = data_dir
+        settings.ALLOWED_HOSTS = [*settings.ALLOWED_HOSTS, 'testserver']
+        atomic_write_text(json.dumps(run_views(concurrency, requests)), output)
+
+    def _report(self, label, result):
+        self.stdout.write(f"  peak RSS {result['peak_rss_mb']:.1f} MiB")
+        for view, view_result in result['views'].items():
+            self.stdout.write(f"  {view:<16} cold {view_result['cold_ms']:>9.1f}ms")
+            for level, metrics in view_result['concurrency'].items():
+                self.stdout.write(
+                    f"    c={level:<4} p50 {metrics['p50_ms']:>8.1f}ms  p95 {metrics['p95_ms']:>8.1f}ms  "
+                    f"p99 {metrics['p99_ms']:>8.1f}ms  {metrics['requests_per_second']:>8.1f} req/s  "
+                    f"{metrics['response_bytes']:>9} bytes"
+                )
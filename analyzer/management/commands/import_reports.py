@@ -0,0 +1,47 @@
+import os
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+
+from analyzer.models import AccidentReport
+from analyzer.utils.columnar import list_partitions, partition_file, read_partition
+from analyzer.utils.schema import CSV_DTYPES, coerce_types
+from analyzer.utils.report_queries import IMPORT_BATCH_SIZE, import_frame
+
+
+class Command(BaseCommand):
+    help = 'Bulk import the state partitions under DATA_DIR/states into the AccidentReport table'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--states-dir', help='Directory with the state partitions (default: DATA_DIR/states).')
+        parser.add_argument('--append', action='store_true', help='Keep the rows already in the table.')
+        parser.add_argument('--batch-size', type=int, default=IMPORT_BATCH_SIZE, help='Rows per INSERT batch.')
+
+    def handle(self, *args, **options):
+        states_dir = options['states_dir'] or os.path.join(settings.DATA_DIR, 'states')
+        try:
+            names = list_partitions(states_dir)
+        except FileNotFoundError:
+            raise CommandError(f"State partitions not found: {states_dir}")
+
+        started = time.perf_counter()
+        if not options['append']:
+            with transaction.atomic():
+                deleted, _ = AccidentReport.objects.all().delete()
+            self.stdout.write(f"🧹 Removed {deleted} existing reports")
+
+        total = 0
+        for name in names:
+            path = partition_file(os.path.join(states_dir, name))
+            df = coerce_types(read_partition(path, dtype=CSV_DTYPES, on_bad_lines='skip'))
+            rows = import_frame(df, batch_size=options['batch_size'])
+            total += rows
+            self.stdout.write(f"  {name:<24} {rows:>8} rows")
+
+        if connection.vendor == 'sqlite':
+            # Refresh the planner statistics for the new indexes.
+            with connection.cursor() as cursor:
+                cursor.execute('ANALYZE')
+        self.stdout.write(f"✅ Imported {total} reports from {len(names)} states in {time.perf_counter() - started:.1f}s")
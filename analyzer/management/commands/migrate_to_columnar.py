@@ -0,0 +1,58 @@
+import os
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from analyzer.utils.columnar import columnar_available, read_partition, write_feather
+from analyzer.utils.schema import CSV_DTYPES, MASTER_COLUMN_ORDER, coerce_types
+
+
+class Command(BaseCommand):
+    help = 'Convert the CSV partitions under DATA_DIR into typed Feather files'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--force', action='store_true', help='Rewrite Feather files that are already up to date.')
+        parser.add_argument('--remove-csv', action='store_true', help='Delete each CSV after converting it.')
+
+    def _csv_files(self):
+        data_dir = settings.DATA_DIR
+        india_path = os.path.join(data_dir, 'all_india.csv')
+        if os.path.exists(india_path):
+            yield india_path
+        for root, _, files in os.walk(os.path.join(data_dir, 'states')):
+            for name in sorted(files):
+                if name.endswith('.csv'):
+                    yield os.path.join(root, name)
+        for root, _, files in sorted(os.walk(os.path.join(data_dir, 'districts'))):
+            for name in sorted(files):
+                if name.endswith('.csv'):
+                    yield os.path.join(root, name)
+
+    def handle(self, *args, **options):
+        if not columnar_available():
+            raise CommandError("pyarrow is required for Feather storage: pip install pyarrow")
+
+        self.stdout.write("📦 Converting CSV partitions to Feather...")
+        converted = skipped = 0
+        csv_bytes = feather_bytes = 0
+        for csv_path in self._csv_files():
+            feather_path = csv_path[:-len('.csv')] + '.feather'
+            if (not options['force'] and os.path.exists(feather_path)
+                    and os.path.getmtime(feather_path) >= os.path.getmtime(csv_path)):
+                skipped += 1
+                continue
+
+            df = read_partition(csv_path, dtype=CSV_DTYPES, on_bad_lines='skip')
+            df = coerce_types(df)[MASTER_COLUMN_ORDER]
+            write_feather(df, feather_path)
+            csv_bytes += os.path.getsize(csv_path)
+            feather_bytes += os.path.getsize(feather_path)
+            converted += 1
+            self.stdout.write(f"  {os.path.relpath(feather_path, settings.DATA_DIR)}: {len(df)} rows")
+            if options['remove_csv']:
+                os.remove(csv_path)
+
+        self.stdout.write(
+            f"✅ Converted {converted} partitions ({skipped} already up to date): "
+            f"{csv_bytes / 1e6:.1f} MB of CSV -> {feather_bytes / 1e6:.1f} MB of Feather."
+        )
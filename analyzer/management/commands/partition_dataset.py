@@ -0,0 +1,41 @@
+import os
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from analyzer.utils.ingest import swap_partitions
+from analyzer.utils.partitioner import CHUNK_SIZE, partition_dataset
+
+
+class Command(BaseCommand):
+    help = 'Split the national dataset into state and district partitions in a single pass'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--input', help='National CSV to split (default: DATA_DIR/all_india.csv).')
+        parser.add_argument('--output', help='Data directory to write states/ and districts/ to (default: DATA_DIR).')
+        parser.add_argument('--chunksize', type=int, default=CHUNK_SIZE, help='Rows read per chunk.')
+        parser.add_argument('--workers', type=int, help='Writer threads (default: twice the cores).')
+
+    def handle(self, *args, **options):
+        input_path = options['input'] or os.path.join(settings.DATA_DIR, 'all_india.csv')
+        output_dir = options['output'] or settings.DATA_DIR
+        if not os.path.exists(input_path):
+            raise CommandError(f"Input file not found: {input_path}")
+
+        self.stdout.write(f"🚀 Partitioning {input_path} by state and district...")
+        # Submissions wait while the partitions are replaced, and the flushed
+        # ones are put back into the rebuilt files.
+        restored = []
+        manifest = partition_dataset(
+            input_path, output_dir, chunksize=options['chunksize'], workers=options['workers'], log=self.stdout.write,
+            swap_lock=swap_partitions(output_dir, restored),
+        )
+        if restored and restored[0]:
+            self.stdout.write(f"✅ Restored {restored[0]} submitted accidents to the rebuilt partitions")
+        partitions = manifest['partitions']
+        states = sum(1 for name in partitions if name.startswith('states/'))
+        self.stdout.write(
+            f"🎉 {states} state and {len(partitions) - states} district partitions "
+            f"({manifest['input_rows']} rows read, {manifest['dropped_rows']} without state/coordinates). "
+            f"Manifest: {os.path.join(output_dir, 'manifest.json')}"
+        )
@@ -0,0 +1,31 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from analyzer.ml.pipeline import CHUNK_SIZE
+from analyzer.utils.incremental import refresh
+
+
+class Command(BaseCommand):
+    help = 'Bring the cleaned, geocoded and partitioned data and the hotspot models up to date with data/raw/'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--raw-dir', help='Directory with the raw CSVs (default: DATA_DIR/raw).')
+        parser.add_argument('--force', action='store_true', help='Rebuild every stage from scratch.')
+        parser.add_argument('--dry-run', action='store_true', help='Only show what each stage would do.')
+        parser.add_argument('--chunksize', type=int, default=CHUNK_SIZE, help='Rows read per chunk.')
+        parser.add_argument('--workers', type=int, help='Worker processes/threads per stage.')
+
+    def handle(self, *args, **options):
+        self.stdout.write("🔄 Refreshing derived data...")
+        try:
+            summary = refresh(
+                raw_dir=options['raw_dir'], force=options['force'], dry_run=options['dry_run'],
+                chunksize=options['chunksize'], workers=options['workers'], log=self.stdout.write,
+            )
+        except FileNotFoundError as error:
+            raise CommandError(str(error))
+        ran = [stage for stage in summary if stage['mode'] != 'skip']
+        if options['dry_run']:
+            self.stdout.write(f"🔍 {len(ran)} of {len(summary)} stages would run.")
+        else:
+            seconds = sum(stage['seconds'] for stage in ran)
+            self.stdout.write(f"🎉 {len(ran)} of {len(summary)} stages ran in {seconds:.2f}s.")
@@ -4,7 +4,21 @@ from analyzer.utils.cluster_accidents import retrain_dbscan
 class Command(BaseCommand):
     help = 'Retrain DBSCAN model with latest accident data'
 
+    def add_arguments(self, parser):
+        parser.add_argument('--states', nargs='+', help='Only retrain these states (default: all).')
+        parser.add_argument('--workers', type=int, help='Worker processes (default: all cores).')
+
     def handle(self, *args, **kwargs):
         self.stdout.write("📊 Retraining DBSCAN model...")
-        retrain_dbscan()
+        run = retrain_dbscan(states=kwargs.get('states'), workers=kwargs.get('workers'))
+        for result in run['states']:
+            self.stdout.write(
+                f"  {result['state']:<24} v{result['version']:<4} {result['points']:>8} points "
+                f"{result['clusters']:>6} clusters {result['noise']:>7} noise {result['seconds']:>8.2f}s"
+            )
+        summary = run['summary']
+        self.stdout.write(
+            f"🧠 {summary['states']} states, {summary['clusters']} clusters, {summary['noise']} noise points "
+            f"({summary['fit_seconds']:.2f}s of fitting in {summary['wall_seconds']:.2f}s on {summary['workers']} workers)"
+        )
         self.stdout.write("✅ DBSCAN retraining complete.")
@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+
+from analyzer.utils.jobs import JobWorker
+
+
+class Command(BaseCommand):
+    help = 'Run queued background jobs (retrains, ingest flushes) in this process'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help='Run the jobs that are due now and exit.')
+
+    def handle(self, *args, **options):
+        worker = JobWorker()
+        if options['once']:
+            ran = worker.run_due()
+            self.stdout.write(f"✅ Ran {ran} due job(s).")
+            return
+        self.stdout.write("⚙️ Running background jobs (Ctrl+C to stop)...")
+        try:
+            worker.run()
+        except KeyboardInterrupt:
+            self.stdout.write("👋 Job worker stopped.")
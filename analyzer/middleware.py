@@ -0,0 +1,80 @@
+# analyzer/middleware.py
+
+"""
+Per-request timing.
+
+``TimingMiddleware`` collects the spans recorded while a request is handled
+(see utils/instrumentation.py), returns them with the total time in a
+``Server-Timing`` header (shown in the browser's network panel), records the
+request in the per-view metrics and, when enabled, profiles it. It runs
+natively under ASGI, so the async views are not switched back to a thread.
+"""
+
+import os
+import random
+import threading
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+
+from .utils import instrumentation
+
+
+class TimingMiddleware:
+    """Goes first in MIDDLEWARE so the total covers the whole request."""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    @staticmethod
+    def _wants_profile(request):
+        if not instrumentation.PROFILE_REQUESTS:
+            return False
+        if request.GET.get('profile') == '1' or request.headers.get('X-Profile') == '1':
+            return True
+        return random.random() < instrumentation.PROFILE_SAMPLE_RATE
+
+    def _start(self, request):
+        profiler = None
+        if self._wants_profile(request):
+            profiler = instrumentation.SamplingProfiler(threading.get_ident()).start()
+        return profiler, instrumentation.start_request(profiler), time.perf_counter()
+
+    @staticmethod
+    def _finish(request, response, profiler, token, started):
+        """Records the request and adds the timing headers to ``response`` (None if the view raised)."""
+        elapsed = time.perf_counter() - started
+        match = getattr(request, 'resolver_match', None)
+        view = (match.url_name or match.view_name) if match else 'unmatched'
+        status = response.status_code if response is not None else 500
+        spans = instrumentation.end_request(token, view, status, elapsed)
+        path = profiler.stop().dump(view) if profiler is not None else None
+        if response is not None:
+            response['Server-Timing'] = instrumentation.server_timing(spans, elapsed)
+            if path is not None:
+                response['X-Profile'] = os.path.basename(path)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        profiler, token, started = self._start(request)
+        response = None
+        try:
+            response = self.get_response(request)
+        finally:
+            self._finish(request, response, profiler, token, started)
+        return response
+
+    async def __acall__(self, request):
+        profiler, token, started = self._start(request)
+        response = None
+        try:
+            response = await self.get_response(request)
+        finally:
+            self._finish(request, response, profiler, token, started)
+        return response
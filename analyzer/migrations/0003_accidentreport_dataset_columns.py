@@ -0,0 +1,76 @@
+# Generated by Django 5.2.18 on 2026-10-17 21:45
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('analyzer', '0002_backgroundjob'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='accidentreport',
+            name='accident_index',
+            field=models.BigIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='accidentreport',
+            name='date',
+            field=models.DateField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='accidentreport',
+            name='light_conditions',
+            field=models.CharField(blank=True, max_length=100, null=True),
+        ),
+        migrations.AddField(
+            model_name='accidentreport',
+            name='number_of_casualties',
+            field=models.PositiveSmallIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='accidentreport',
+            name='number_of_vehicles',
+            field=models.PositiveSmallIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='accidentreport',
+            name='road_type',
+            field=models.CharField(blank=True, max_length=100, null=True),
+        ),
+        migrations.AddField(
+            model_name='accidentreport',
+            name='time',
+            field=models.CharField(blank=True, max_length=5, null=True),
+        ),
+        migrations.AddField(
+            model_name='accidentreport',
+            name='weather_conditions',
+            field=models.CharField(blank=True, max_length=100, null=True),
+        ),
+        migrations.AlterField(
+            model_name='accidentreport',
+            name='latitude',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AlterField(
+            model_name='accidentreport',
+            name='longitude',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AlterField(
+            model_name='accidentreport',
+            name='severity',
+            field=models.CharField(blank=True, max_length=50, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='accidentreport',
+            index=models.Index(fields=['state', 'district', 'date'], name='report_scope_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='accidentreport',
+            index=models.Index(fields=['severity'], name='report_severity_idx'),
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.2.18 on 2026-10-17 22:28
+
+from django.db import migrations, models
+
+
+def merge_queued_duplicates(apps, schema_editor):
+    """Keeps the oldest queued run of each job so the constraint can be added."""
+    BackgroundJob = apps.get_model('analyzer', 'BackgroundJob')
+    seen = set()
+    for job in BackgroundJob.objects.filter(status='queued').order_by('created_at', 'pk'):
+        if job.name in seen:
+            job.delete()
+        seen.add(job.name)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('analyzer', '0003_accidentreport_dataset_columns'),
+    ]
+
+    operations = [
+        migrations.RunPython(merge_queued_duplicates, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='backgroundjob',
+            constraint=models.UniqueConstraint(condition=models.Q(('status', 'queued')), fields=('name',), name='backgroundjob_one_queued_per_name'),
+        ),
+    ]
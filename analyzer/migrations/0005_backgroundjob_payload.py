@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-17 22:38
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('analyzer', '0004_backgroundjob_one_queued_per_name'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='backgroundjob',
+            name='payload',
+            field=models.JSONField(blank=True, null=True),
+        ),
+    ]
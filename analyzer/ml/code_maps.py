@@ -0,0 +1,76 @@
+# analyzer/ml/code_maps.py
+
+"""
+Code → label maps for the coded columns of the raw accident data.
+
+Used by the ETL pipeline to label the raw codes and by the form
+vocabularies as the known values of each column.
+"""
+
+import numpy as np
+import pandas as pd
+
+accident_severity_map = {
+    1: 'Fatal',
+    2: 'Serious injury',
+    3: 'Minor injury'
+}
+
+road_type_map = {
+    1: 'Roundabout',
+    2: 'One way street',
+    3: 'Dual carriageway',
+    6: 'Single carriageway',
+    7: 'Slip road',
+    9: 'Unknown',
+    12: 'One way street',
+    -1: 'Data missing'
+}
+
+weather_conditions_map = {
+    1: 'Fine no high winds',
+    2: 'Raining no high winds',
+    3: 'Snowing no high winds',
+    4: 'Fine + high winds',
+    5: 'Raining + high winds',
+    6: 'Snowing + high winds',
+    7: 'Fog or mist',
+    8: 'Other',
+    9: 'Unknown'
+}
+
+light_conditions_map = {
+    1: 'Daylight',
+    4: 'Darkness - lights lit',
+    5: 'Darkness - lights unlit',
+    6: 'Darkness - no lighting',
+    7: 'Darkness - lighting unknown'
+}
+
+# Column name → code map, for the columns that are coded in the raw data.
+COLUMN_MAPS = {
+    'Accident_Severity': accident_severity_map,
+    'Road_Type': road_type_map,
+    'Weather_Conditions': weather_conditions_map,
+    'Light_Conditions': light_conditions_map,
+}
+
+
+def decode(codes, code_map):
+    """
+    Labels the codes in ``codes`` with a vectorized table lookup.
+
+    Returns a Categorical; codes that are missing or not in the map become NaN.
+    """
+    categories = sorted(set(code_map.values()))
+    category_numbers = {label: number for number, label in enumerate(categories)}
+    lowest, highest = min(code_map), max(code_map)
+    table = np.full(highest - lowest + 1, -1, dtype=np.int64)
+    for code, label in code_map.items():
+        table[code - lowest] = category_numbers[label]
+
+    values = pd.to_numeric(pd.Series(codes), errors='coerce').to_numpy(dtype=np.float64)
+    known = ~np.isnan(values) & (values >= lowest) & (values <= highest) & (values == np.round(values))
+    numbers = np.full(len(values), -1, dtype=np.int64)
+    numbers[known] = table[values[known].astype(np.int64) - lowest]
+    return pd.Categorical.from_codes(numbers, categories=categories)
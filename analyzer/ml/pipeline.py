@@ -0,0 +1,192 @@
+# analyzer/ml/pipeline.py
+
+"""
+Streaming ETL from the raw accident files to the cleaned dataset.
+
+merge_and_inspect.py used to load AccidentsBig, VehiclesBig and
+CasualtiesBig completely before grouping and merging them, and
+clean_and_prepare.py then re-read the merged file. This pipeline does both
+in one pass with bounded memory:
+
+1. VehiclesBig and CasualtiesBig are read in chunks and reduced to per-accident
+   partial sums (count, sum) that are combined as they come in, so memory
+   grows with the number of accidents, not the number of vehicles/casualties.
+2. AccidentsBig is read in chunks; each chunk is joined with those per-accident
+   aggregates, cleaned and labelled (vectorized code map lookups), and
+   appended to the outputs.
+
+Run from the project root: python -m analyzer.ml.pipeline --help
+"""
+
+import argparse
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+from analyzer.ml.code_maps import COLUMN_MAPS, decode
+
+
+CHUNK_SIZE = 200000
+
+# Per-accident aggregates: output column -> (source column, 'count' or 'mean').
+VEHICLE_AGGREGATES = {
+    'Num_Vehicles': ('Vehicle_Type', 'count'),
+    'Avg_Vehicle_Age': ('Age_of_Vehicle', 'mean'),
+    'Avg_Engine_CC': ('Engine_Capacity_(CC)', 'mean'),
+}
+CASUALTY_AGGREGATES = {
+    'Num_Casualties': ('Casualty_Severity', 'count'),
+}
+
+CLEAN_COLUMNS = [
+    'Accident_Index', 'Date', 'Time', 'latitude', 'longitude',
+    'Accident_Severity', 'Number_of_Vehicles', 'Number_of_Casualties',
+    'Road_Type', 'Weather_Conditions', 'Light_Conditions'
+]
+
+
+def read_chunks(path, chunksize=CHUNK_SIZE, offset=0, **kwargs):
+    """
+    CSV chunks of ``path`` (the raw files start with a UTF-8 BOM).
+
+    With ``offset`` only the rows from that byte on are read (it must be at
+    the start of a line); the header is still taken from the top of the file.
+    """
+    kwargs = {'chunksize': chunksize, 'low_memory': False, **kwargs}
+    if not offset:
+        yield from pd.read_csv(path, encoding='utf-8-sig', **kwargs)
+        return
+    columns = list(pd.read_csv(path, nrows=0, encoding='utf-8-sig').columns)
+    if os.path.getsize(path) <= offset:
+        return
+    with open(path, 'rb') as handle:
+        handle.seek(offset)
+        yield from pd.read_csv(handle, header=None, names=columns, encoding='utf-8', **kwargs)
+
+
+def aggregate_sources(aggregates):
+    """The raw columns ``aggregates`` are computed from."""
+    return sorted({source for source, _ in aggregates.values()})
+
+
+def accident_totals(path, sources, chunksize=CHUNK_SIZE, offset=0):
+    """
+    Per-accident count and sum of the ``sources`` columns of ``path`` (from
+    byte ``offset`` on), as 'column:count' and 'column:sum' columns.
+
+    Each chunk is reduced to per-accident counts and sums, which are added
+    to the running totals. Totals of two parts of a file can be combined the
+    same way with ``add(..., fill_value=0)``.
+    """
+    totals = pd.DataFrame(
+        columns=[f'{source}:{how}' for how in ('count', 'sum') for source in sources],
+        index=pd.Index([], name='Accident_Index'), dtype='float64',
+    )
+    for chunk in read_chunks(path, chunksize, offset, usecols=['Accident_Index', *sources]):
+        values = chunk[sources].apply(pd.to_numeric, errors='coerce')
+        grouped = values.groupby(chunk['Accident_Index'])
+        partial = pd.concat([grouped.count().add_suffix(':count'), grouped.sum().add_suffix(':sum')], axis=1)
+        totals = partial if totals.empty else totals.add(partial, fill_value=0)
+    return totals
+
+
+def aggregates_from_totals(totals, aggregates):
+    """One row per Accident_Index with the ``aggregates`` (see VEHICLE_AGGREGATES); means are taken here."""
+    result = pd.DataFrame(index=totals.index)
+    for name, (source, how) in aggregates.items():
+        if how == 'count':
+            result[name] = totals[f'{source}:count'].astype('int64')
+        else:
+            result[name] = totals[f'{source}:sum'] / totals[f'{source}:count'].replace(0, np.nan)
+    return result
+
+
+def aggregate_by_accident(path, aggregates, chunksize=CHUNK_SIZE):
+    """Streams ``path`` and returns one row per Accident_Index with the ``aggregates``."""
+    return aggregates_from_totals(accident_totals(path, aggregate_sources(aggregates), chunksize), aggregates)
+
+
+def clean_chunk(df):
+    """clean_and_prepare.py's cleaning for one chunk of merged accidents."""
+    df = df.dropna(axis=0, how='all')
+    # Older extracts only have the aggregated counts.
+    if 'Number_of_Vehicles' not in df.columns:
+        df = df.assign(Number_of_Vehicles=df['Num_Vehicles'])
+    if 'Number_of_Casualties' not in df.columns:
+        df = df.assign(Number_of_Casualties=df['Num_Casualties'])
+    df = df[CLEAN_COLUMNS].copy()
+
+    df['Date'] = pd.to_datetime(df['Date'], dayfirst=True, errors='coerce')
+    df = df.dropna(subset=['Date'])
+    for column, code_map in COLUMN_MAPS.items():
+        df[column] = decode(df[column].to_numpy(), code_map)
+    return df
+
+
+def per_accident_aggregates(vehicles_path, casualties_path, chunksize=CHUNK_SIZE, log=print):
+    """Vehicle and casualty aggregates per Accident_Index (see aggregate_by_accident)."""
+    vehicles = aggregate_by_accident(vehicles_path, VEHICLE_AGGREGATES, chunksize)
+    log(f"🔹 Vehicles aggregated for {len(vehicles)} accidents")
+    casualties = aggregate_by_accident(casualties_path, CASUALTY_AGGREGATES, chunksize)
+    log(f"🔹 Casualties aggregated for {len(casualties)} accidents")
+    return vehicles.join(casualties, how='outer')
+
+
+def process_accidents(chunks, per_accident, output_path=None, merged_path=None, log=print):
+    """
+    Joins each chunk of accidents with ``per_accident`` and appends the merged
+    and/or cleaned rows to ``merged_path``/``output_path``. Returns row counts.
+    """
+    counts = {'accidents': 0, 'merged': 0, 'cleaned': 0}
+    for chunk in chunks:
+        counts['accidents'] += len(chunk)
+        merged = chunk.join(per_accident, on='Accident_Index')
+        merged['Num_Casualties'] = merged['Num_Casualties'].fillna(0).astype(int)
+        merged['Num_Vehicles'] = merged['Num_Vehicles'].fillna(0).astype(int)
+        if merged_path:
+            merged.to_csv(merged_path, mode='a', header=not os.path.exists(merged_path), index=False)
+            counts['merged'] += len(merged)
+        if output_path:
+            cleaned = clean_chunk(merged)
+            cleaned.to_csv(output_path, mode='a', header=not os.path.exists(output_path), index=False)
+            counts['cleaned'] += len(cleaned)
+        log(f"🔹 {counts['accidents']} accidents processed")
+    return counts
+
+
+def run_pipeline(accidents_path, vehicles_path, casualties_path, output_path=None, merged_path=None,
+                 chunksize=CHUNK_SIZE, log=print):
+    """
+    Builds the cleaned dataset (``output_path``) and/or the merged raw
+    dataset (``merged_path``) from the three raw files. Returns row counts.
+    """
+    started = time.perf_counter()
+    per_accident = per_accident_aggregates(vehicles_path, casualties_path, chunksize, log)
+
+    outputs = [path for path in (output_path, merged_path) if path]
+    for path in outputs:
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        if os.path.exists(path):
+            os.remove(path)
+
+    counts = process_accidents(read_chunks(accidents_path, chunksize), per_accident, output_path, merged_path, log)
+    log(f"✅ Pipeline finished in {time.perf_counter() - started:.1f}s: {counts}")
+    return counts
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Build the cleaned accident dataset from the raw files.')
+    parser.add_argument('--accidents', default='data/raw/AccidentsBig.csv')
+    parser.add_argument('--vehicles', default='data/raw/VehiclesBig.csv')
+    parser.add_argument('--casualties', default='data/raw/CasualtiesBig.csv')
+    parser.add_argument('--output', default='data/cleaned_accidents.csv', help='Cleaned dataset.')
+    parser.add_argument('--merged', default=None, help='Also write the merged raw dataset here.')
+    parser.add_argument('--chunksize', type=int, default=CHUNK_SIZE)
+    args = parser.parse_args(argv)
+    run_pipeline(args.accidents, args.vehicles, args.casualties, args.output, args.merged, args.chunksize)
+
+
+if __name__ == '__main__':
+    main()
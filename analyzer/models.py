@@ -1,14 +1,74 @@
 from django.db import models
 
 class AccidentReport(models.Model):
-    latitude = models.FloatField()
-    longitude = models.FloatField()
+    """
+    One accident record, for the database storage mode (ACCIDENT_STORAGE =
+    'database'). Mirrors the dataset columns; see utils/report_queries.py.
+    """
+
+    accident_index = models.BigIntegerField(null=True, blank=True)
+    latitude = models.FloatField(null=True, blank=True)
+    longitude = models.FloatField(null=True, blank=True)
     timestamp = models.DateTimeField(auto_now_add=True)
 
+    date = models.DateField(null=True, blank=True)
+    time = models.CharField(max_length=5, null=True, blank=True)
     state = models.CharField(max_length=100, null=True, blank=True)
     district = models.CharField(max_length=100, null=True, blank=True)
-    severity = models.IntegerField(null=True, blank=True)
+    severity = models.CharField(max_length=50, null=True, blank=True)
+    number_of_vehicles = models.PositiveSmallIntegerField(null=True, blank=True)
+    number_of_casualties = models.PositiveSmallIntegerField(null=True, blank=True)
+    road_type = models.CharField(max_length=100, null=True, blank=True)
+    weather_conditions = models.CharField(max_length=100, null=True, blank=True)
+    light_conditions = models.CharField(max_length=100, null=True, blank=True)
     description = models.TextField(null=True, blank=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['state', 'district', 'date'], name='report_scope_date_idx'),
+            models.Index(fields=['severity'], name='report_severity_idx'),
+        ]
+
     def __str__(self):
         return f"Accident at ({self.latitude}, {self.longitude})"
+
+
+class BackgroundJob(models.Model):
+    """A queued unit of background work, e.g. retraining the hotspot model."""
+
+    STATUS_QUEUED = 'queued'
+    STATUS_RUNNING = 'running'
+    STATUS_DONE = 'done'
+    STATUS_FAILED = 'failed'
+    STATUS_CHOICES = [
+        (STATUS_QUEUED, 'Queued'),
+        (STATUS_RUNNING, 'Running'),
+        (STATUS_DONE, 'Done'),
+        (STATUS_FAILED, 'Failed'),
+    ]
+
+    name = models.CharField(max_length=100)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=STATUS_QUEUED)
+    # How many enqueue() calls were coalesced into this job.
+    requests = models.PositiveIntegerField(default=1)
+    # Keyword arguments for the handler, e.g. {'states': [...]}; the payloads
+    # of coalesced requests are merged. Null runs the job on everything.
+    payload = models.JSONField(null=True, blank=True)
+    run_after = models.DateTimeField()
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    result = models.TextField(null=True, blank=True)
+    error = models.TextField(null=True, blank=True)
+
+    class Meta:
+        indexes = [models.Index(fields=['status', 'run_after'])]
+        constraints = [
+            # At most one queued run per job; enqueue() coalesces into it.
+            models.UniqueConstraint(
+                fields=['name'], condition=models.Q(status='queued'), name='backgroundjob_one_queued_per_name'
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.name} #{self.pk} ({self.status})"
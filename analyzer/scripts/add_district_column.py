@@ -1,50 +1,52 @@
-import geopandas as gpd
+# Run from the project root: python -m analyzer.scripts.add_district_column [--help]
+
+import argparse
+
 import pandas as pd
-from shapely.geometry import Point
 
-print("🚀 Starting district assignment...")
+from analyzer.utils.geocoding import Geocoder
 
-# Step 1: Load accident CSV
-accident_csv = "data/cleaned_accidents.csv"
-df = pd.read_csv(accident_csv)
-print(f"✅ Loaded CSV with {len(df)} rows")
+COLUMNS_TO_SAVE = [
+    'Accident_Index', 'Date', 'Time', 'latitude', 'longitude',
+    'Accident_Severity', 'Number_of_Vehicles', 'Number_of_Casualties',
+    'Road_Type', 'Weather_Conditions', 'Light_Conditions',
+    'State', 'District'
+]
 
-# Step 2: Drop rows without lat/lon
-df = df.dropna(subset=["latitude", "longitude"])
-print(f"🧹 After dropping missing lat/lon: {len(df)} rows")
 
-# Step 3: Convert to GeoDataFrame
-geometry = [Point(xy) for xy in zip(df["longitude"], df["latitude"])]
-gdf = gpd.GeoDataFrame(df, geometry=geometry, crs="EPSG:4326")
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Add the state and district of each accident from its coordinates.')
+    parser.add_argument('--input', default='data/cleaned_accidents.csv')
+    parser.add_argument('--output', default='data/accidents_with_districts.csv')
+    parser.add_argument('--districts-shapefile', default='data/shapefiles/districts/2011_Dist.shp')
+    parser.add_argument('--states-shapefile', default='data/shapefiles/States/Admin2.shp')
+    args = parser.parse_args(argv)
 
-# Step 4: Load districts shapefile
-districts_shapefile = "data/shapefiles/districts/2011_Dist.shp"
-districts = gpd.read_file(districts_shapefile)
-print(f"🗺️ Districts shapefile loaded with {len(districts)} shapes")
+    print("🚀 Starting district assignment...")
 
-# Step 5: Ensure matching CRS
-districts = districts.to_crs(gdf.crs)
+    # Step 1: Load accident CSV
+    df = pd.read_csv(args.input)
+    print(f"✅ Loaded CSV with {len(df)} rows")
 
-# Step 6: Spatial join to find district for each accident
-joined = gpd.sjoin(gdf, districts, how="left", predicate="within")
-print("🔁 Spatial join complete")
+    # Step 2: Drop rows without lat/lon
+    df = df.dropna(subset=["latitude", "longitude"])
+    print(f"🧹 After dropping missing lat/lon: {len(df)} rows")
 
-# Optional: Rename to clean names
-joined = joined.rename(columns={
-    'ST_NM': 'State',
-    'DISTRICT': 'District'
-})
+    # Step 3: Load the district (and state) polygons into an STRtree index
+    geocoder = Geocoder(args.districts_shapefile, args.states_shapefile)
+    print(f"🗺️ Districts shapefile loaded with {len(geocoder.districts.geometries)} shapes")
 
-# Show final columns
-print(f"🧪 Final columns: {list(joined.columns)}")
+    # Step 4: Vectorized point-in-polygon lookup for every accident
+    joined = geocoder.assign(df)
+    print("🔁 Spatial join complete")
 
-# Step 7: Save selected columns to new CSV
-columns_to_save = [
-    'Accident_Index', 'Date', 'Time', 'latitude', 'longitude',
-    'Accident_Severity', 'Number_of_Vehicles', 'Number_of_Casualties',
-    'Road_Type', 'Weather_Conditions', 'Light_Conditions',
-    'State', 'District'
-]
-output_csv = "data/accidents_with_districts.csv"
-joined[columns_to_save].to_csv(output_csv, index=False)
-print(f"✅ Saved with district and state: {output_csv}")
+    # Show final columns
+    print(f"🧪 Final columns: {list(joined.columns)}")
+
+    # Step 5: Save selected columns to new CSV
+    joined[COLUMNS_TO_SAVE].to_csv(args.output, index=False)
+    print(f"✅ Saved with district and state: {args.output}")
+
+
+if __name__ == '__main__':
+    main()
@@ -1,56 +1,53 @@
-print("🚀 Script started: Mapping states using shapefile and cleaning empty rows...")
+# Run from the project root: python -m analyzer.scripts.map_states_shapefile [--help]
+
+import argparse
 
 import pandas as pd
-import geopandas as gpd
-from shapely.geometry import Point
 
-# Paths
-input_csv = "data/cleaned_accidents.csv"
-shapefile_path = "data/shapefiles/Admin2.shp"
-output_csv = "data/accidents_with_states.csv"
+from analyzer.utils.geocoding import PolygonIndex
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Add the state of each accident from the state shapefile.')
+    parser.add_argument('--input', default='data/cleaned_accidents.csv')
+    parser.add_argument('--shapefile', default='data/shapefiles/States/Admin2.shp')
+    parser.add_argument('--output', default='data/accidents_with_states.csv')
+    args = parser.parse_args(argv)
 
-# Load CSV
-df = pd.read_csv(input_csv)
+    print("🚀 Script started: Mapping states using shapefile and cleaning empty rows...")
 
-# Drop completely empty rows (all NaN or blank)
-df.dropna(how='all', inplace=True)
+    # Load CSV
+    df = pd.read_csv(args.input)
 
-# Drop rows with missing lat/lon
-df = df.dropna(subset=['latitude', 'longitude'])
+    # Drop completely empty rows (all NaN or blank)
+    df.dropna(how='all', inplace=True)
 
-# Remove rows where lat/lon are not valid numbers
-df = df[pd.to_numeric(df["latitude"], errors="coerce").notnull()]
-df = df[pd.to_numeric(df["longitude"], errors="coerce").notnull()]
+    # Drop rows with missing lat/lon
+    df = df.dropna(subset=['latitude', 'longitude'])
 
-# Convert lat/lon to float
-df["latitude"] = df["latitude"].astype(float)
-df["longitude"] = df["longitude"].astype(float)
+    # Remove rows where lat/lon are not valid numbers
+    df = df[pd.to_numeric(df["latitude"], errors="coerce").notnull()]
+    df = df[pd.to_numeric(df["longitude"], errors="coerce").notnull()]
 
-print(f"✔ Cleaned dataset: {len(df)} valid accident records")
+    # Convert lat/lon to float
+    df["latitude"] = df["latitude"].astype(float)
+    df["longitude"] = df["longitude"].astype(float)
 
-# Convert to GeoDataFrame
-geometry = [Point(xy) for xy in zip(df["longitude"], df["latitude"])]
-accidents_gdf = gpd.GeoDataFrame(df, geometry=geometry, crs="EPSG:4326")
+    print(f"✔ Cleaned dataset: {len(df)} valid accident records")
 
-# Load shapefile
-states_gdf = gpd.read_file(shapefile_path)
-states_gdf = states_gdf.to_crs("EPSG:4326")
+    # Load shapefile into an STRtree index of prepared polygons
+    states_index = PolygonIndex.from_shapefile(args.shapefile, ["ST_NM"])
 
-print(f"✔ Loaded shapefile with {len(states_gdf)} regions")
+    print(f"✔ Loaded shapefile with {len(states_index.geometries)} regions")
 
-# Spatial join
-accidents_with_state = gpd.sjoin(accidents_gdf, states_gdf, how="left", predicate="within")
+    # Vectorized point-in-polygon lookup
+    final_df = df.copy()
+    final_df["state"] = states_index.lookup(df["latitude"], df["longitude"])["ST_NM"].to_numpy()
 
-# Guess column for state
-possible_state_cols = ["st_name", "STATE_NAME", "NAME_1", "NAME_2", "admin"]
-for col in possible_state_cols:
-    if col in accidents_with_state.columns:
-        accidents_with_state.rename(columns={col: "state"}, inplace=True)
-        break
+    # Save result
+    final_df.to_csv(args.output, index=False)
+    print(f"✅ Saved cleaned and mapped data to: {args.output}")
 
-# Drop helper columns
-final_df = accidents_with_state.drop(columns=["geometry", "index_right"], errors="ignore")
 
-# Save result
-final_df.to_csv(output_csv, index=False)
-print(f"✅ Saved cleaned and mapped data to: {output_csv}")
+if __name__ == '__main__':
+    main()
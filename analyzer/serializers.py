@@ -1,7 +1,64 @@
 from rest_framework import serializers
 from .models import AccidentReport
+from .utils.points import POINTS_MAX_PAGE_SIZE, decode_cursor
+from .utils.spatial import SPATIAL_MAX_RADIUS_METRES, SPATIAL_MAX_RESULTS
 
 class AccidentReportSerializer(serializers.ModelSerializer):
     class Meta:
         model = AccidentReport
         fields = '__all__'
+
+
+class BboxField(serializers.CharField):
+    """A 'south,west,north,east' query parameter, as a tuple of floats."""
+
+    def to_internal_value(self, data):
+        value = super().to_internal_value(data)
+        try:
+            south, west, north, east = (float(part) for part in value.split(','))
+        except ValueError:
+            raise serializers.ValidationError('bbox must be south,west,north,east.')
+        return south, west, north, east
+
+
+class PointsQuerySerializer(serializers.Serializer):
+    """Query parameters of the district points API."""
+
+    bbox = BboxField(required=False)
+    cursor = serializers.CharField(required=False)
+    limit = serializers.IntegerField(required=False, min_value=1, max_value=POINTS_MAX_PAGE_SIZE)
+
+    def validate_cursor(self, value):
+        try:
+            return decode_cursor(value)
+        except ValueError:
+            raise serializers.ValidationError('Invalid cursor.')
+
+
+class SpatialQuerySerializer(serializers.Serializer):
+    """Query parameters shared by the spatial query APIs: the scope and page size."""
+
+    state = serializers.CharField(required=False)
+    district = serializers.CharField(required=False)
+    limit = serializers.IntegerField(required=False, min_value=1, max_value=SPATIAL_MAX_RESULTS)
+
+    def validate(self, data):
+        if data.get('district') and not data.get('state'):
+            raise serializers.ValidationError('district requires state.')
+        return data
+
+
+class BboxQuerySerializer(SpatialQuerySerializer):
+    bbox = BboxField()
+
+
+class RadiusQuerySerializer(SpatialQuerySerializer):
+    lat = serializers.FloatField(min_value=-90, max_value=90)
+    lon = serializers.FloatField(min_value=-180, max_value=180)
+    radius = serializers.FloatField(min_value=0, max_value=SPATIAL_MAX_RADIUS_METRES, help_text='metres')
+
+
+class NearestQuerySerializer(SpatialQuerySerializer):
+    lat = serializers.FloatField(min_value=-90, max_value=90)
+    lon = serializers.FloatField(min_value=-180, max_value=180)
+    k = serializers.IntegerField(min_value=1, max_value=SPATIAL_MAX_RESULTS)
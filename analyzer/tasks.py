@@ -0,0 +1,31 @@
+# analyzer/tasks.py
+
+"""
+Background job handlers.
+
+This module is imported from AnalyzerConfig.ready() so the handlers are
+registered with the job queue before any view enqueues work.
+"""
+
+from .utils import ingest
+from .utils.cluster_accidents import retrain_dbscan
+from .utils.jobs import register
+
+
+@register('retrain_dbscan')
+def retrain_dbscan_models(states=None):
+    """
+    Retrains the hotspot models of ``states`` (default: all); the run summary
+    becomes the job result.
+
+    The fits run in this process: the worker thread lives in the web server,
+    which must not fork a process pool. Full retrains with a pool are for the
+    retrain_clusters management command.
+    """
+    return retrain_dbscan(states=states, workers=1)['summary']
+
+
+@register('flush_ingest')
+def flush_ingest():
+    """Writes the logged submissions to the data partitions."""
+    return {'flushed': ingest.flush()}
@@ -0,0 +1,57 @@
+# analyzer/tests/helpers.py
+
+"""Small on-disk datasets for the tests."""
+
+import os
+import shutil
+import tempfile
+
+import pandas as pd
+
+from analyzer.utils.dataset_store import partition_name
+from analyzer.utils.schema import MASTER_COLUMN_ORDER
+
+
+def accident(index, state='Goa', district='North Goa', **values):
+    """One accident record as it is written to the partitions."""
+    record = {
+        'Accident_Index': float(index),
+        'Date': '2018-03-04',
+        'Time': '21:00',
+        'latitude': 15.5 + index * 1e-4,
+        'longitude': 73.9 + index * 1e-4,
+        'Accident_Severity': 'Minor injury',
+        'Number_of_Vehicles': 2.0,
+        'Number_of_Casualties': 1.0,
+        'Road_Type': 'Single carriageway',
+        'Weather_Conditions': 'Fine no high winds',
+        'Light_Conditions': 'Daylight',
+        'State': state,
+        'District': district,
+    }
+    record.update(values)
+    return record
+
+
+def write_partitions(data_dir, records):
+    """Writes ``records`` as state and district CSV partitions."""
+    df = pd.DataFrame(records)[MASTER_COLUMN_ORDER]
+    for state, rows in df.groupby('State'):
+        os.makedirs(os.path.join(data_dir, 'states'), exist_ok=True)
+        rows.to_csv(os.path.join(data_dir, 'states', f'{partition_name(state)}.csv'), index=False)
+    for (state, district), rows in df.groupby(['State', 'District']):
+        directory = os.path.join(data_dir, 'districts', partition_name(state))
+        os.makedirs(directory, exist_ok=True)
+        rows.to_csv(os.path.join(directory, f'{partition_name(district)}.csv'), index=False)
+
+
+class DataDirMixin:
+    """Gives each test a temporary DATA_DIR with a few accidents in Goa."""
+
+    records = [accident(index, district='North Goa' if index % 2 else 'South Goa') for index in range(1, 11)]
+
+    def setUp(self):
+        super().setUp()
+        self.data_dir = tempfile.mkdtemp(prefix='roadsafe-test-')
+        self.addCleanup(shutil.rmtree, self.data_dir, ignore_errors=True)
+        write_partitions(self.data_dir, self.records)
@@ -0,0 +1,72 @@
+# analyzer/tests/test_aggregates.py
+
+from unittest import mock
+
+import pandas as pd
+from django.test import SimpleTestCase
+
+from analyzer.utils import snapshots
+from analyzer.utils.aggregates import AggregateCache, Summary
+from analyzer.utils.dataset_store import DatasetStore
+from analyzer.utils.schema import MASTER_COLUMN_ORDER
+
+from .helpers import DataDirMixin, accident
+
+
+class AggregateCacheTests(DataDirMixin, SimpleTestCase):
+
+    records = [
+        *DataDirMixin.records,
+        accident(11, district='South Goa', Date='2018-05-20', Time='08:15', Accident_Severity='Fatal'),
+    ]
+
+    def setUp(self):
+        super().setUp()
+        patcher = mock.patch.object(snapshots, 'SHARED_DATASET', False)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.store = DatasetStore(self.data_dir)
+        self.aggregates = AggregateCache(self.store)
+
+    def test_counts_per_scope(self):
+        national = self.aggregates.summary()
+        self.assertEqual(national.total, 11)
+        self.assertEqual(national['states'], {'Goa': 11})
+        self.assertEqual(national['severity'], {'Minor injury': 10, 'Fatal': 1})
+        south = self.aggregates.summary('Goa', 'South_Goa')
+        self.assertEqual(south.total, 6)
+        self.assertEqual(south['time'], {'21:00': 5, '08:15': 1})
+        self.assertEqual(south.monthly(), {'2018-03': 5, '2018-04': 0, '2018-05': 1})
+        self.assertIsNone(self.aggregates.summary('Kerala'))
+        self.assertIsNone(self.aggregates.summary('Goa', 'Nowhere'))
+
+    def test_added_rows_match_a_rebuild(self):
+        self.aggregates.summary()
+        new_df = pd.DataFrame([
+            accident(12, state='Kerala', district='Kochi', Accident_Severity='Fatal'),
+            accident(13, Time='23:59'),
+        ])[MASTER_COLUMN_ORDER]
+        self.aggregates.add(new_df, self.store.append(new_df))
+
+        rebuilt = AggregateCache(self.store)
+        for scope in ((None, None), ('Goa', None), ('Kerala', 'Kochi'), ('Goa', 'North Goa')):
+            added, expected = self.aggregates.summary(*scope), rebuilt.summary(*scope)
+            self.assertEqual(added.total, expected.total, scope)
+            self.assertEqual(added.counts, expected.counts, scope)
+
+    def test_rows_added_out_of_step_are_picked_up_by_a_rebuild(self):
+        self.aggregates.summary()
+        new_df = pd.DataFrame([accident(12)])[MASTER_COLUMN_ORDER]
+        self.store.append(new_df)
+        version = self.store.append(pd.DataFrame([accident(13)])[MASTER_COLUMN_ORDER])
+        self.aggregates.add(new_df, version)
+        self.assertEqual(self.aggregates.summary().total, 13)
+
+
+class SummaryTests(SimpleTestCase):
+
+    def test_mode_breaks_ties_like_series_mode(self):
+        summary = Summary()
+        summary['road_type'].update({'Single carriageway': 2, 'Dual carriageway': 2, 'Slip road': 1})
+        self.assertEqual(summary.mode('road_type'), 'Dual carriageway')
+        self.assertEqual(summary.mode('weather'), 'N/A')
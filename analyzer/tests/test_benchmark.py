@@ -0,0 +1,28 @@
+# analyzer/tests/test_benchmark.py
+
+from django.test import SimpleTestCase
+
+from analyzer.utils.benchmark import compare
+
+
+def result(p50_ms=10.0, response_bytes=1000, peak_rss_mb=100.0):
+    metrics = {'p50_ms': p50_ms, 'p95_ms': 20.0, 'p99_ms': 30.0, 'response_bytes': response_bytes}
+    return {'10k': {'peak_rss_mb': peak_rss_mb, 'views': {'state_page': {'concurrency': {'4': metrics}}}}}
+
+
+class CompareTests(SimpleTestCase):
+
+    def test_within_tolerance_is_not_a_regression(self):
+        self.assertEqual(compare(result(p50_ms=12.0, response_bytes=1200), result(), 0.25), [])
+
+    def test_larger_responses_are_a_regression(self):
+        regressions = compare(result(response_bytes=2000), result(), 0.25)
+        self.assertEqual(len(regressions), 1)
+        self.assertIn('state_page c=4 response_bytes', regressions[0])
+
+    def test_slower_views_and_more_memory_are_regressions(self):
+        regressions = compare(result(p50_ms=20.0, peak_rss_mb=200.0), result(), 0.25)
+        self.assertEqual(len(regressions), 2)
+
+    def test_sizes_missing_from_the_baseline_are_not_compared(self):
+        self.assertEqual(compare(result(p50_ms=100.0), {}, 0.25), [])
@@ -0,0 +1,57 @@
+# analyzer/tests/test_catalog.py
+
+import os
+from unittest import mock
+
+from django.test import SimpleTestCase
+
+from analyzer.utils import snapshots
+from analyzer.utils.catalog import Catalog
+from analyzer.utils.dataset_store import DatasetStore
+
+from .helpers import DataDirMixin, accident, write_partitions
+
+
+class CatalogTests(DataDirMixin, SimpleTestCase):
+
+    def setUp(self):
+        super().setUp()
+        patcher = mock.patch.object(snapshots, 'SHARED_DATASET', False)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.catalog = Catalog(store=DatasetStore(self.data_dir), data_dir=self.data_dir)
+
+    def expire(self):
+        self.catalog._last_check = 0.0
+
+    def test_lists_the_partitions(self):
+        self.assertEqual(self.catalog.states(), ['Goa'])
+        self.assertEqual(self.catalog.districts('Goa'), ['North_Goa', 'South_Goa'])
+        self.assertEqual(self.catalog.districts('Kerala'), [])
+
+    def test_listing_is_scanned_once_until_a_directory_changes(self):
+        self.catalog.states()
+        with mock.patch.object(self.catalog, '_scan', wraps=self.catalog._scan) as scan:
+            self.expire()
+            self.catalog.districts_by_state()
+            scan.assert_not_called()
+            write_partitions(self.data_dir, [accident(11, state='Kerala', district='Kochi')])
+            # Directory mtimes have a coarse resolution on some file systems.
+            os.utime(os.path.join(self.data_dir, 'states'), ns=(0, 0))
+            self.expire()
+            self.assertEqual(self.catalog.districts_by_state(), {
+                'Goa': ['North_Goa', 'South_Goa'], 'Kerala': ['Kochi'],
+            })
+            scan.assert_called_once()
+
+    def test_details_of_a_district(self):
+        details = self.catalog.district('Goa', 'North Goa')
+        self.assertEqual(details['name'], 'North_Goa')
+        self.assertEqual(details['rows'], 5)
+        south, west, north, east = details['bbox']
+        self.assertAlmostEqual(south, 15.5001, places=4)
+        self.assertAlmostEqual(north, 15.5009, places=4)
+        self.assertIsNotNone(details['mtime'])
+        self.assertEqual(self.catalog.state('Goa')['rows'], 10)
+        self.assertIsNone(self.catalog.state('Kerala'))
+
@@ -0,0 +1,67 @@
+# analyzer/tests/test_columnar.py
+
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+import pandas as pd
+from django.test import SimpleTestCase
+
+from analyzer.utils import columnar
+from analyzer.utils.columnar import append_partition, fragments_dir, read_partition, write_feather
+from analyzer.utils.schema import MASTER_COLUMN_ORDER, coerce_types
+
+from .helpers import accident
+
+
+def frame(indexes):
+    return pd.DataFrame([accident(index) for index in indexes])[MASTER_COLUMN_ORDER]
+
+
+@unittest.skipUnless(columnar.columnar_available(), 'pyarrow is not installed')
+class FeatherAppendTests(SimpleTestCase):
+
+    def setUp(self):
+        directory = tempfile.mkdtemp(prefix='roadsafe-columnar-')
+        self.addCleanup(shutil.rmtree, directory, ignore_errors=True)
+        self.base_path = os.path.join(directory, 'North_Goa')
+        self.path = self.base_path + '.feather'
+        write_feather(coerce_types(frame(range(1, 6))), self.path)
+
+    def ids(self):
+        return read_partition(self.path)['Accident_Index'].tolist()
+
+    def test_appends_add_fragments_without_rewriting_the_file(self):
+        size = os.path.getsize(self.path)
+        append_partition(frame([6, 7]), self.base_path)
+        append_partition(frame([8]), self.base_path)
+        self.assertEqual(os.path.getsize(self.path), size)
+        self.assertEqual(sorted(os.listdir(fragments_dir(self.path))), ['000001.feather', '000002.feather'])
+        self.assertEqual(self.ids(), [float(index) for index in range(1, 9)])
+        self.assertIsInstance(read_partition(self.path)['State'].dtype, pd.CategoricalDtype)
+
+    def test_fragments_are_compacted(self):
+        with mock.patch.object(columnar, 'FEATHER_COMPACT_FRAGMENTS', 3):
+            for index in (6, 7, 8):
+                append_partition(frame([index]), self.base_path)
+        self.assertFalse(os.path.exists(fragments_dir(self.path)))
+        self.assertEqual(self.ids(), [float(index) for index in range(1, 9)])
+
+        # Appends after a compaction continue the fragment numbering.
+        append_partition(frame([9]), self.base_path)
+        self.assertEqual(os.listdir(fragments_dir(self.path)), ['000003.feather'])
+        self.assertEqual(len(self.ids()), 9)
+
+    def test_fragments_left_by_an_interrupted_compaction_are_ignored(self):
+        append_partition(frame([6]), self.base_path)
+        fragment = os.path.join(fragments_dir(self.path), '000001.feather')
+        saved = fragment + '.saved'
+        shutil.copy(fragment, saved)
+        with mock.patch.object(columnar, 'FEATHER_COMPACT_FRAGMENTS', 2):
+            append_partition(frame([7]), self.base_path)
+        # The compacted file was written but the fragment wasn't deleted.
+        os.makedirs(fragments_dir(self.path), exist_ok=True)
+        shutil.move(saved, fragment)
+        self.assertEqual(self.ids(), [float(index) for index in range(1, 8)])
@@ -0,0 +1,71 @@
+# analyzer/tests/test_conditional.py
+
+from types import SimpleNamespace
+from unittest import mock
+
+from django.contrib import messages
+from django.contrib.auth.models import AnonymousUser
+from django.contrib.messages.storage.cookie import CookieStorage
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase
+
+from analyzer.utils import conditional
+from analyzer.utils.conditional import dataset_conditional, query_scope
+from analyzer.utils.dataset_store import DatasetStore
+
+from .helpers import DataDirMixin
+
+
+@dataset_conditional(lambda request: (None, None), page=True)
+def page_view(request):
+    return HttpResponse('page')
+
+
+@dataset_conditional(query_scope)
+def data_view(request):
+    return HttpResponse('data')
+
+
+class DatasetConditionalTests(DataDirMixin, SimpleTestCase):
+
+    def setUp(self):
+        super().setUp()
+        store = DatasetStore(self.data_dir)
+        catalog = mock.Mock(**{'states.return_value': ['Goa']})
+        for name, value in (('get_store', store), ('get_catalog', catalog)):
+            patcher = mock.patch.object(conditional, name, return_value=value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.factory = RequestFactory()
+
+    def get(self, view, user=None, etag=None, path='/'):
+        headers = {'If-None-Match': etag} if etag else {}
+        request = self.factory.get(path, headers=headers)
+        request.user = user or AnonymousUser()
+        request._messages = CookieStorage(request)
+        return view(request)
+
+    def test_revalidation_with_a_matching_etag_is_not_modified(self):
+        response = self.get(data_view, path='/?state=Goa')
+        self.assertEqual(response.status_code, 200)
+        revalidated = self.get(data_view, etag=response['ETag'], path='/?state=Goa')
+        self.assertEqual(revalidated.status_code, 304)
+
+    def test_page_etag_depends_on_the_user(self):
+        anonymous = self.get(page_view)
+        user = SimpleNamespace(pk=1, is_authenticated=True)
+        logged_in = self.get(page_view, user=user, etag=anonymous['ETag'])
+        self.assertEqual(logged_in.status_code, 200)
+        self.assertNotEqual(logged_in['ETag'], anonymous['ETag'])
+        self.assertIn('Cookie', logged_in['Vary'])
+        self.assertFalse(logged_in.has_header('Last-Modified'))
+
+    def test_page_with_queued_messages_is_rendered_in_full(self):
+        first = self.get(page_view)
+        request = self.factory.get('/', headers={'If-None-Match': first['ETag']})
+        request.user = AnonymousUser()
+        request._messages = CookieStorage(request)
+        messages.success(request, 'Accident report submitted.')
+        response = page_view(request)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.content, b'page')
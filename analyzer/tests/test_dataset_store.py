@@ -0,0 +1,117 @@
+# analyzer/tests/test_dataset_store.py
+
+import os
+from unittest import mock
+
+import pandas as pd
+from django.test import SimpleTestCase
+
+from analyzer.utils import ingest, snapshots, wal
+from analyzer.utils.dataset_store import DatasetStore
+from analyzer.utils.schema import MASTER_COLUMN_ORDER
+
+from .helpers import DataDirMixin, accident, write_partitions
+
+
+def expire(store):
+    """Lets the next refresh() stat the files again."""
+    store._last_check = 0.0
+
+
+class DatasetStoreTests(DataDirMixin, SimpleTestCase):
+
+    def setUp(self):
+        super().setUp()
+        patcher = mock.patch.object(snapshots, 'SHARED_DATASET', False)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.store = DatasetStore(self.data_dir)
+
+    def test_scopes_are_looked_up_by_any_spelling(self):
+        self.assertEqual(len(self.store.frame()), 10)
+        self.assertEqual(len(self.store.state('Goa')), 10)
+        self.assertEqual(self.store.district('Goa', 'North Goa')['Accident_Index'].tolist(), [1, 3, 5, 7, 9])
+        self.assertEqual(len(self.store.district('Goa', 'South_Goa')), 5)
+        self.assertIsNone(self.store.state('Kerala'))
+        self.assertIsNone(self.store.district('Goa', 'Nowhere'))
+
+    def test_changed_files_are_reloaded(self):
+        self.store.frame()
+        version = self.store.version
+        write_partitions(self.data_dir, [*self.records, accident(11, state='Kerala', district='Kochi')])
+        # Files are only checked once per CHECK_INTERVAL.
+        self.assertEqual(self.store.version, version)
+        expire(self.store)
+        self.assertEqual(len(self.store.state('Kerala')), 1)
+        self.assertGreater(self.store.version, version)
+
+    def test_append_changes_only_the_digests_of_its_scopes(self):
+        north, south = self.store.digest('Goa', 'North Goa'), self.store.digest('Goa', 'South Goa')
+        self.store.append(pd.DataFrame([accident(11)])[MASTER_COLUMN_ORDER])
+        self.assertEqual(len(self.store.district('Goa', 'North Goa')), 6)
+        self.assertNotEqual(self.store.digest('Goa', 'North Goa'), north)
+        self.assertEqual(self.store.digest('Goa', 'South Goa'), south)
+
+
+class SharedSnapshotTests(DataDirMixin, SimpleTestCase):
+
+    def submit(self, store):
+        record, _ = ingest.submit(accident(0), data_dir=self.data_dir)
+        store.append(pd.DataFrame([record])[MASTER_COLUMN_ORDER])
+        return record
+
+    def setUp(self):
+        super().setUp()
+        # Ids continue after the ones in the partitions.
+        os.makedirs(wal.ingest_dir(self.data_dir), exist_ok=True)
+        with open(ingest._sequence_path(self.data_dir), 'w', encoding='utf-8') as handle:
+            handle.write('10')
+
+    def test_second_store_attaches_the_published_snapshot(self):
+        first, second = DatasetStore(self.data_dir), DatasetStore(self.data_dir)
+        self.assertEqual(len(first.frame()), 10)
+        self.assertEqual(len(second.frame()), 10)
+        self.assertEqual(second._snapshot_name, first._snapshot_name)
+        self.assertEqual(second.digest('Goa'), first.digest('Goa'))
+
+    def test_appended_rows_are_visible_from_a_second_store_without_republishing(self):
+        first, second = DatasetStore(self.data_dir), DatasetStore(self.data_dir)
+        first.frame()
+        second.frame()
+        published = first._snapshot_name
+
+        record = self.submit(first)
+        self.assertEqual(len(first.frame()), 11)
+        # A submission doesn't write a new snapshot...
+        self.assertEqual(first._snapshot_name, published)
+        # ...the other store adds the logged row on top of the one it maps.
+        expire(second)
+        self.assertIn(record['Accident_Index'], second.frame()['Accident_Index'].tolist())
+        self.assertEqual(second._snapshot_name, published)
+        self.assertEqual(second.digest('Goa', 'North Goa'), first.digest('Goa', 'North Goa'))
+
+    def test_flush_republishes_once_and_other_stores_map_it(self):
+        first, second = DatasetStore(self.data_dir), DatasetStore(self.data_dir)
+        first.frame()
+        second.frame()
+        record = self.submit(first)
+        self.submit(first)
+
+        self.assertEqual(ingest.flush(self.data_dir), 2)
+        first.touch([record['Accident_Index'], record['Accident_Index'] + 1])
+        self.assertNotEqual(first._snapshot_name, None)
+
+        expire(second)
+        self.assertEqual(len(second.frame()), 12)
+        self.assertEqual(second._snapshot_name, first._snapshot_name)
+
+    def test_touch_without_the_flushed_rows_leaves_the_reload_to_refresh(self):
+        first = DatasetStore(self.data_dir)
+        first.frame()
+        published = first._snapshot_name
+        ingest.submit(accident(0), data_dir=self.data_dir)
+        ingest.flush(self.data_dir)
+        first.touch([11.0])
+        self.assertEqual(first._snapshot_name, published)
+        expire(first)
+        self.assertEqual(len(first.frame()), 11)
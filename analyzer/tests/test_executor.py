@@ -0,0 +1,86 @@
+# analyzer/tests/test_executor.py
+
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase
+
+from analyzer.utils.executor import coalesce, offload
+
+
+class CoalesceTests(SimpleTestCase):
+
+    def run_concurrently(self, key, func, callers=4):
+        """Calls coalesce(key, func) from ``callers`` threads; ``func`` is expected to block."""
+        pool = ThreadPoolExecutor(max_workers=callers)
+        self.addCleanup(pool.shutdown)
+        futures = [pool.submit(coalesce, key, func) for _ in range(callers)]
+        # Let every caller join before the call finishes.
+        time.sleep(0.2)
+        return futures
+
+    def test_concurrent_callers_share_one_call(self):
+        release, calls = threading.Event(), []
+
+        def compute():
+            calls.append(1)
+            release.wait(5)
+            return 'result'
+
+        futures = self.run_concurrently(('test', 'share'), compute)
+        release.set()
+        self.assertEqual([future.result() for future in futures], ['result'] * 4)
+        self.assertEqual(calls, [1])
+        # The key is free again afterwards.
+        self.assertEqual(coalesce(('test', 'share'), lambda: 'again'), 'again')
+
+    def test_errors_reach_every_waiting_caller(self):
+        release = threading.Event()
+
+        def fail():
+            release.wait(5)
+            raise ValueError('broken')
+
+        futures = self.run_concurrently(('test', 'fail'), fail, callers=2)
+        release.set()
+        for future in futures:
+            with self.assertRaises(ValueError):
+                future.result()
+
+
+class OffloadTests(SimpleTestCase):
+
+    def setUp(self):
+        self.factory = RequestFactory()
+        self.calls = []
+        self.release = threading.Event()
+
+        @offload('data', share=True)
+        def view(request):
+            self.calls.append(request.headers.get('Cookie'))
+            self.release.wait(5)
+            return HttpResponse(f'response {len(self.calls)}')
+
+        self.view = view
+
+    def gather(self, *requests):
+        async def run():
+            tasks = [asyncio.ensure_future(self.view(request)) for request in requests]
+            # Let every request join before the computation finishes.
+            await asyncio.sleep(0.2)
+            self.release.set()
+            return await asyncio.gather(*tasks)
+        return asyncio.run(run())
+
+    def test_identical_requests_get_copies_of_one_response(self):
+        first, second = self.gather(self.factory.get('/points/'), self.factory.get('/points/'))
+        self.assertEqual(len(self.calls), 1)
+        self.assertEqual(first.content, second.content)
+        self.assertIsNot(first, second)
+
+    def test_requests_from_other_clients_are_not_shared(self):
+        self.gather(self.factory.get('/points/', HTTP_COOKIE='a=1'), self.factory.get('/points/', HTTP_COOKIE='a=2'))
+        self.assertEqual(sorted(self.calls), ['a=1', 'a=2'])
@@ -0,0 +1,57 @@
+# analyzer/tests/test_fragments.py
+
+from unittest import mock
+
+import pandas as pd
+from django.core.cache import caches
+from django.test import SimpleTestCase
+
+from analyzer.utils import fragments, snapshots
+from analyzer.utils.dataset_store import DatasetStore
+from analyzer.utils.fragments import cached_fragment, invalidate_fragments
+from analyzer.utils.schema import MASTER_COLUMN_ORDER
+
+from .helpers import DataDirMixin, accident
+
+
+class FragmentCacheTests(DataDirMixin, SimpleTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.store = DatasetStore(self.data_dir)
+        for module, name, value in (
+            (snapshots, 'SHARED_DATASET', False),
+            (fragments, 'get_store', mock.Mock(return_value=self.store)),
+        ):
+            patcher = mock.patch.object(module, name, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        caches[fragments.FRAGMENT_CACHE_ALIAS].clear()
+        self.addCleanup(caches[fragments.FRAGMENT_CACHE_ALIAS].clear)
+
+    def render(self, view, state=None, district=None, **params):
+        render = mock.Mock(return_value=f'<div>{view} {state} {district}</div>')
+        html = cached_fragment(view, render, state, district, **params)
+        return html, render.call_count
+
+    def test_fragments_are_rendered_once_per_scope_and_parameters(self):
+        self.assertEqual(self.render('state_map', 'Goa')[1], 1)
+        self.assertEqual(self.render('state_map', 'Goa')[1], 0)
+        self.assertEqual(self.render('state_map', 'Goa', zoom=8)[1], 1)
+        self.assertEqual(self.render('state_map', 'Kerala')[1], 1)
+
+    def test_new_rows_only_change_the_keys_of_their_scopes(self):
+        self.render('district_map', 'Goa', 'North Goa')
+        self.render('district_map', 'Goa', 'South Goa')
+        self.store.append(pd.DataFrame([accident(11)])[MASTER_COLUMN_ORDER])
+        self.assertEqual(self.render('district_map', 'Goa', 'North Goa')[1], 1)
+        self.assertEqual(self.render('district_map', 'Goa', 'South Goa')[1], 0)
+
+    def test_invalidation_drops_the_country_state_and_district(self):
+        for scope in ((None, None), ('Goa', None), ('Goa', 'North Goa'), ('Goa', 'South Goa')):
+            self.render('map', *scope)
+        invalidate_fragments('Goa', 'North Goa')
+        self.assertEqual(self.render('map')[1], 1)
+        self.assertEqual(self.render('map', 'Goa')[1], 1)
+        self.assertEqual(self.render('map', 'Goa', 'North Goa')[1], 1)
+        self.assertEqual(self.render('map', 'Goa', 'South Goa')[1], 0)
@@ -0,0 +1,107 @@
+# analyzer/tests/test_geocoding.py
+
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import unittest
+from unittest import mock
+
+import numpy as np
+import pandas as pd
+from django.conf import settings
+from django.test import SimpleTestCase
+
+from analyzer.utils import geocoding
+from analyzer.utils.geocoding import place_key
+
+from .helpers import accident
+
+
+class PlaceKeyTests(SimpleTestCase):
+
+    def test_spacing_case_and_punctuation_are_ignored(self):
+        self.assertEqual(place_key('North Goa'), place_key('north_goa'))
+        self.assertEqual(place_key('Jammu & Kashmir'), place_key('Jammu and Kashmir'))
+
+    def test_aliases_share_a_key(self):
+        self.assertEqual(place_key('Orissa'), place_key('Odisha'))
+        self.assertEqual(place_key('Arunanchal_Pradesh'), place_key('Arunachal Pradesh'))
+        self.assertNotEqual(place_key('North Goa'), place_key('South Goa'))
+
+
+class UnavailableGeocoderTests(SimpleTestCase):
+
+    def test_missing_dependencies_are_logged(self):
+        with mock.patch.object(geocoding, '_geocoder_loaded', False), \
+                mock.patch.object(geocoding, '_geocoder', None), \
+                mock.patch.object(geocoding, 'geocoding_available', return_value=False), \
+                self.assertLogs('analyzer.utils.geocoding', 'WARNING') as logs:
+            self.assertIsNone(geocoding.get_geocoder())
+        self.assertIn('unavailable', logs.output[0])
+
+
+@unittest.skipUnless(geocoding.shapely is not None, 'shapely is not installed')
+class MismatchTests(SimpleTestCase):
+
+    def setUp(self):
+        # North Goa above latitude 15.5, South Goa below it.
+        boxes = [geocoding.shapely.box(73.5, 15.5, 74.5, 16.0), geocoding.shapely.box(73.5, 15.0, 74.5, 15.5)]
+        places = pd.DataFrame({'ST_NM': ['Goa', 'Goa'], 'DISTRICT': ['North Goa', 'South Goa']})
+        self.geocoder = geocoding.Geocoder.__new__(geocoding.Geocoder)
+        self.geocoder.districts = geocoding.PolygonIndex(boxes, places)
+        self.geocoder.states = None
+
+    def test_matching_district_under_another_spelling(self):
+        self.assertIsNone(self.geocoder.mismatch(15.8, 74.0, 'goa', 'North_Goa'))
+
+    def test_point_near_the_border_matches_both_districts(self):
+        self.assertIsNone(self.geocoder.mismatch(15.505, 74.0, 'Goa', 'South Goa', distance_metres=1000))
+
+    def test_point_far_inside_another_district(self):
+        self.assertEqual(self.geocoder.mismatch(15.9, 74.0, 'Goa', 'South Goa'), ('Goa', 'North Goa'))
+
+
+class EnrichmentScriptTests(SimpleTestCase):
+    """The scripts run on their own, without Django settings."""
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp(prefix='roadsafe-geocode-')
+        self.addCleanup(shutil.rmtree, self.directory, ignore_errors=True)
+        self.input_path = os.path.join(self.directory, 'cleaned.csv')
+        pd.DataFrame([accident(1), accident(2, latitude=None)]).to_csv(self.input_path, index=False)
+        self.output_path = os.path.join(self.directory, 'out.csv')
+
+    def test_scripts_start_without_django_settings(self):
+        environment = {name: value for name, value in os.environ.items() if name != 'DJANGO_SETTINGS_MODULE'}
+        for module in ('analyzer.scripts.add_district_column', 'analyzer.scripts.map_states_shapefile'):
+            with self.subTest(module=module):
+                completed = subprocess.run(
+                    [sys.executable, '-m', module, '--help'],
+                    cwd=settings.BASE_DIR, env=environment, capture_output=True, text=True,
+                )
+                self.assertEqual(completed.returncode, 0, completed.stderr)
+
+    def test_add_district_column(self):
+        from analyzer.scripts import add_district_column
+
+        def assign(df):
+            return df.assign(State='Goa', District='North Goa')
+
+        geocoder = mock.Mock(**{'assign.side_effect': assign, 'districts.geometries': [None]})
+        with mock.patch.object(add_district_column, 'Geocoder', return_value=geocoder), mock.patch('builtins.print'):
+            add_district_column.main(['--input', self.input_path, '--output', self.output_path])
+        written = pd.read_csv(self.output_path)
+        self.assertEqual(list(written.columns), add_district_column.COLUMNS_TO_SAVE)
+        self.assertEqual(written['District'].tolist(), ['North Goa'])
+
+    def test_map_states_shapefile(self):
+        from analyzer.scripts import map_states_shapefile
+
+        index = mock.Mock(geometries=[None])
+        index.lookup.side_effect = lambda latitudes, longitudes: pd.DataFrame({'ST_NM': np.full(len(latitudes), 'Goa')})
+        with mock.patch.object(map_states_shapefile.PolygonIndex, 'from_shapefile', return_value=index), \
+                mock.patch('builtins.print'):
+            map_states_shapefile.main(['--input', self.input_path, '--output', self.output_path])
+        self.assertEqual(pd.read_csv(self.output_path)['state'].tolist(), ['Goa'])
@@ -0,0 +1,39 @@
+# analyzer/tests/test_heatmap_grid.py
+
+from unittest import mock
+
+from django.test import SimpleTestCase
+
+from analyzer.utils import heatmap_grid
+from analyzer.utils.dataset_store import DatasetStore
+from analyzer.utils.heatmap_grid import HeatGrid
+
+from .helpers import DataDirMixin
+
+
+class HeatGridTests(DataDirMixin, SimpleTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.grid = HeatGrid(DatasetStore(self.data_dir))
+
+    def test_spellings_of_a_scope_share_one_grid(self):
+        with mock.patch.object(heatmap_grid, 'bin_points', wraps=heatmap_grid.bin_points) as bin_points:
+            first = self.grid.grid(16, 'Goa', 'North Goa')
+            second = self.grid.grid(16, 'Goa', 'North_Goa')
+        self.assertIs(first, second)
+        bin_points.assert_called_once()
+        self.assertEqual(len(first[0]), 5)
+
+    def test_unknown_scopes_are_not_cached(self):
+        cell_lat, _, _ = self.grid.grid(10, 'Atlantis')
+        self.assertEqual(len(cell_lat), 0)
+        self.assertEqual(len(self.grid._cells), 0)
+
+    def test_least_recently_used_grids_are_evicted(self):
+        with mock.patch.object(heatmap_grid, 'CACHED_GRIDS', 2):
+            self.grid.grid(8, 'Goa')
+            self.grid.grid(9, 'Goa')
+            self.grid.grid(8, 'Goa')
+            self.grid.grid(10, 'Goa')
+        self.assertEqual([key[2] for key in self.grid._cells], [8, 10])
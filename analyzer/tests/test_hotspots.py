@@ -0,0 +1,134 @@
+# analyzer/tests/test_hotspots.py
+
+import os
+import shutil
+import tempfile
+import threading
+from unittest import mock
+
+import numpy as np
+import pandas as pd
+from django.test import SimpleTestCase, override_settings
+
+from analyzer import tasks
+from analyzer.utils import cluster_accidents, hotspots
+from analyzer.utils.dataset_store import DatasetStore
+from analyzer.utils.hotspots import HotspotIndex
+
+from .helpers import DataDirMixin
+
+
+class PublishedModelTests(DataDirMixin, SimpleTestCase):
+
+    def setUp(self):
+        super().setUp()
+        base_dir = tempfile.mkdtemp(prefix='roadsafe-models-')
+        self.addCleanup(shutil.rmtree, base_dir, ignore_errors=True)
+        settings_override = override_settings(BASE_DIR=base_dir)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+        self.store = DatasetStore(self.data_dir)
+        patcher = mock.patch.object(cluster_accidents, 'get_store', return_value=self.store)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.index = HotspotIndex(store=self.store, directory=f'{base_dir}/hotspot_labels')
+
+    def district(self):
+        return self.store.district('Goa', 'North Goa').dropna(subset=['latitude', 'longitude'])
+
+    def test_job_retrains_only_the_given_states_in_process(self):
+        with mock.patch.object(cluster_accidents, 'ProcessPoolExecutor') as pool:
+            summary = tasks.retrain_dbscan_models(states=['Goa'])
+        pool.assert_not_called()
+        self.assertEqual(summary['states'], 1)
+        self.assertEqual(summary['workers'], 1)
+        self.assertEqual(list(cluster_accidents.load_manifest()['states']), ['Goa'])
+
+    def test_district_labels_come_from_the_published_state_model(self):
+        cluster_accidents.retrain_dbscan(states=['Goa'], workers=1)
+        with mock.patch.object(hotspots, 'cluster_coordinates') as cluster:
+            labels = self.index.labels('Goa', 'North Goa', self.district())
+        cluster.assert_not_called()
+        # The ten accidents lie within a few hundred metres: one state hotspot.
+        np.testing.assert_array_equal(labels, np.zeros(5, dtype=np.int32))
+
+    def test_district_with_accidents_newer_than_the_model_is_clustered_on_its_own(self):
+        cluster_accidents.retrain_dbscan(states=['Goa'], workers=1)
+        df = self.district()
+        newer = df.iloc[[0]].assign(Accident_Index=99.0)
+        df = pd.concat([df, newer], ignore_index=True)
+        with mock.patch.object(hotspots, 'cluster_coordinates', wraps=hotspots.cluster_coordinates) as cluster:
+            labels = self.index.labels('Goa', 'North Goa', df)
+        cluster.assert_called_once()
+        self.assertEqual(len(labels), 6)
+
+    def test_a_new_version_is_picked_up(self):
+        cluster_accidents.retrain_dbscan(states=['Goa'], workers=1)
+        first = self.index.published_labels('Goa')
+        cluster_accidents.retrain_dbscan(states=['Goa'], workers=1, min_samples=50)
+        second = self.index.published_labels('Goa')
+        self.assertIsNot(first, second)
+        self.assertTrue((second == -1).all())
+
+    def test_concurrent_runs_save_distinct_versions(self):
+        saved = []
+        dump = cluster_accidents.atomic_dump
+
+        def slow_dump(value, path):
+            # Widen the window between choosing a version and writing it.
+            threading.Event().wait(0.05)
+            saved.append(os.path.basename(path))
+            dump(value, path)
+
+        with mock.patch.object(cluster_accidents, 'atomic_dump', slow_dump):
+            runs = [
+                threading.Thread(target=cluster_accidents.retrain_dbscan, kwargs={'states': ['Goa'], 'workers': 1})
+                for _ in range(3)
+            ]
+            for run in runs:
+                run.start()
+            for run in runs:
+                run.join()
+        self.assertEqual(sorted(saved), ['v0001.joblib', 'v0002.joblib', 'v0003.joblib'])
+        manifest = cluster_accidents.load_manifest()
+        self.assertEqual((manifest['runs'], manifest['states']['Goa']['version']), (3, 3))
+
+
+class DistrictLabelTests(DataDirMixin, SimpleTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.directory = tempfile.mkdtemp(prefix='roadsafe-labels-')
+        self.addCleanup(shutil.rmtree, self.directory, ignore_errors=True)
+        self.store = DatasetStore(self.data_dir)
+        patcher = mock.patch.object(HotspotIndex, 'published_labels', return_value=None)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def district(self, district):
+        return self.store.district('Goa', district).dropna(subset=['latitude', 'longitude'])
+
+    def test_labels_are_persisted_one_file_per_district(self):
+        index = HotspotIndex(store=self.store, directory=self.directory)
+        index.labels('Goa', 'North Goa', self.district('North Goa'))
+        index.labels('Goa', 'South Goa', self.district('South Goa'))
+        self.assertEqual(sorted(os.listdir(os.path.join(self.directory, 'Goa'))), ['North_Goa.joblib', 'South_Goa.joblib'])
+
+        # Another process reuses them without clustering.
+        other = HotspotIndex(store=self.store, directory=self.directory)
+        with mock.patch.object(hotspots, 'cluster_coordinates') as cluster:
+            other.labels('Goa', 'North Goa', self.district('North Goa'))
+        cluster.assert_not_called()
+
+    def test_changed_coordinates_recluster_only_that_district(self):
+        index = HotspotIndex(store=self.store, directory=self.directory)
+        index.labels('Goa', 'North Goa', self.district('North Goa'))
+        index.labels('Goa', 'South Goa', self.district('South Goa'))
+        south = os.path.getmtime(os.path.join(self.directory, 'Goa', 'South_Goa.joblib'))
+
+        moved = self.district('North Goa').assign(latitude=lambda df: df['latitude'] + 0.01)
+        with mock.patch.object(hotspots, 'cluster_coordinates', wraps=hotspots.cluster_coordinates) as cluster:
+            index.labels('Goa', 'North Goa', moved)
+        cluster.assert_called_once()
+        self.assertEqual(os.path.getmtime(os.path.join(self.directory, 'Goa', 'South_Goa.joblib')), south)
@@ -0,0 +1,90 @@
+# analyzer/tests/test_incremental.py
+
+import os
+from contextlib import contextmanager
+from io import StringIO
+from unittest import mock
+
+import pandas as pd
+from django.core.management import call_command
+from django.test import SimpleTestCase
+
+from analyzer.utils import incremental, ingest, wal
+from analyzer.utils.incremental import accident_stages
+from analyzer.utils.schema import MASTER_COLUMN_ORDER
+
+from .helpers import DataDirMixin, accident
+
+
+class PartitionRebuildTests(DataDirMixin, SimpleTestCase):
+
+    def setUp(self):
+        super().setUp()
+        os.makedirs(wal.ingest_dir(self.data_dir), exist_ok=True)
+        with open(ingest._sequence_path(self.data_dir), 'w', encoding='utf-8') as handle:
+            handle.write('10')
+        # The geocoded source file the partitions are built from.
+        pd.DataFrame(self.records)[MASTER_COLUMN_ORDER].to_csv(
+            os.path.join(self.data_dir, 'accidents_with_districts.csv'), index=False
+        )
+
+    def stage(self):
+        stages = {stage.name: stage for stage in accident_stages(self.data_dir, log=lambda message: None)}
+        return stages['partition']
+
+    def rebuild(self):
+        return self.stage().build()
+
+    def district_ids(self, district):
+        path = os.path.join(self.data_dir, 'districts', 'Goa', f'{district}.csv')
+        return pd.read_csv(path)['Accident_Index'].tolist()
+
+    def test_rebuild_keeps_flushed_submissions(self):
+        record, _ = ingest.submit(accident(0), data_dir=self.data_dir)
+        self.assertEqual(ingest.flush(self.data_dir), 1)
+        self.assertIn(record['Accident_Index'], self.district_ids('North_Goa'))
+
+        summary = self.rebuild()
+        self.assertEqual(summary['restored'], 1)
+        self.assertEqual(self.district_ids('North_Goa').count(record['Accident_Index']), 1)
+        states = pd.read_csv(os.path.join(self.data_dir, 'states', 'Goa.csv'))
+        self.assertEqual(len(states), 11)
+
+        # Restoring is idempotent.
+        self.assertEqual(self.rebuild()['restored'], 1)
+        self.assertEqual(len(self.district_ids('North_Goa')), 6)
+
+    def test_rebuild_without_submissions(self):
+        summary = self.rebuild()
+        self.assertEqual(summary['restored'], 0)
+        self.assertEqual(len(self.district_ids('South_Goa')), 5)
+
+    def test_partition_command_keeps_flushed_submissions(self):
+        record, _ = ingest.submit(accident(0), data_dir=self.data_dir)
+        ingest.flush(self.data_dir)
+        output = StringIO()
+        call_command(
+            'partition_dataset', '--input', os.path.join(self.data_dir, 'accidents_with_districts.csv'),
+            '--output', self.data_dir, stdout=output,
+        )
+        self.assertIn('Restored 1 submitted', output.getvalue())
+        self.assertEqual(self.district_ids('North_Goa').count(record['Accident_Index']), 1)
+
+    def test_appending_to_the_partitions_holds_the_ingest_lock(self):
+        events = []
+
+        @contextmanager
+        def lock(data_dir):
+            events.append('lock')
+            yield
+            events.append('unlock')
+
+        def append(chunks, data_dir, log):
+            events.append('append')
+            return ['Goa']
+
+        with mock.patch.object(incremental, 'ingest_lock', lock), \
+                mock.patch.object(incremental, 'append_to_partitions', append):
+            summary = self.stage().update({os.path.join(self.data_dir, 'accidents_with_districts.csv'): 0})
+        self.assertEqual(summary, {'states': ['Goa']})
+        self.assertEqual(events, ['lock', 'append', 'unlock'])
@@ -0,0 +1,70 @@
+# analyzer/tests/test_ingest.py
+
+import os
+from unittest import mock
+
+import pandas as pd
+from django.test import SimpleTestCase
+
+from analyzer.utils import ingest, wal
+from analyzer.utils.dataset_store import DatasetStore
+
+from .helpers import DataDirMixin, accident
+
+
+class FlushReplayTests(DataDirMixin, SimpleTestCase):
+    """A flush interrupted half-way is finished by the next one, writing every record once."""
+
+    def setUp(self):
+        super().setUp()
+        os.makedirs(wal.ingest_dir(self.data_dir), exist_ok=True)
+        with open(ingest._sequence_path(self.data_dir), 'w', encoding='utf-8') as handle:
+            handle.write('10')
+
+    def ids(self, *parts):
+        return pd.read_csv(os.path.join(self.data_dir, *parts))['Accident_Index'].tolist()
+
+    def interrupted_flush(self, writes=1):
+        """Runs a flush that dies after writing ``writes`` partitions."""
+        append_new = ingest._append_new
+        calls = []
+
+        def crash(df, base_path):
+            if len(calls) == writes:
+                raise RuntimeError('killed')
+            calls.append(base_path)
+            append_new(df, base_path)
+
+        with mock.patch.object(ingest, '_append_new', side_effect=crash):
+            with self.assertRaises(RuntimeError):
+                ingest.flush(self.data_dir)
+
+    def test_flush_after_a_crash_writes_each_record_once(self):
+        first, _ = ingest.submit(accident(0), data_dir=self.data_dir)
+        second, _ = ingest.submit(accident(0, district='South Goa'), data_dir=self.data_dir)
+        self.interrupted_flush()
+        self.assertEqual(wal.wal_files(self.data_dir), [wal.flushing_path(self.data_dir)])
+        # Submitted while the leftover log waits for the next flush.
+        third, _ = ingest.submit(accident(0), data_dir=self.data_dir)
+
+        self.assertEqual(ingest.flush(self.data_dir), 3)
+        self.assertEqual(wal.wal_files(self.data_dir), [])
+        submitted = [first['Accident_Index'], second['Accident_Index'], third['Accident_Index']]
+        north = self.ids('districts', 'Goa', 'North_Goa.csv')
+        south = self.ids('districts', 'Goa', 'South_Goa.csv')
+        states = self.ids('states', 'Goa.csv')
+        for index in submitted:
+            self.assertEqual((north + south).count(index), 1)
+            self.assertEqual(states.count(index), 1)
+        self.assertEqual(len(states), 13)
+
+    def test_store_counts_leftover_records_once(self):
+        kerala, _ = ingest.submit(accident(0, state='Kerala', district='Kochi'), data_dir=self.data_dir)
+        ingest.submit(accident(0), data_dir=self.data_dir)
+        # Both district partitions and the Kerala state partition get written.
+        self.interrupted_flush(writes=3)
+        self.assertIn(kerala['Accident_Index'], self.ids('states', 'Kerala.csv'))
+
+        df = DatasetStore(self.data_dir).frame()
+        self.assertEqual(len(df), 12)
+        self.assertTrue(df['Accident_Index'].is_unique)
@@ -0,0 +1,72 @@
+# analyzer/tests/test_instrumentation.py
+
+import time
+
+from asgiref.sync import async_to_sync
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase
+
+from analyzer import views
+from analyzer.middleware import TimingMiddleware
+from analyzer.utils import instrumentation
+from analyzer.utils.instrumentation import Histogram, span
+
+
+def slow_view(request):
+    for _ in range(2):
+        with span('csv_load'):
+            time.sleep(0.001)
+    with span('render map'):
+        pass
+    return HttpResponse('ok')
+
+
+async def async_view(request):
+    with span('aggregate'):
+        pass
+    return HttpResponse('ok')
+
+
+class TimingMiddlewareTests(SimpleTestCase):
+
+    def setUp(self):
+        self.factory = RequestFactory()
+
+    def test_spans_are_sent_in_server_timing(self):
+        response = TimingMiddleware(slow_view)(self.factory.get('/'))
+        entries = dict(entry.split(';', 1) for entry in response['Server-Timing'].split(', '))
+        self.assertEqual(list(entries), ['csv_load', 'render_map', 'total'])
+        self.assertIn('desc="2x"', entries['csv_load'])
+        self.assertGreaterEqual(float(entries['csv_load'].split('=')[1].split(';')[0]), 2.0)
+
+    def test_async_requests_keep_their_own_spans(self):
+        response = async_to_sync(TimingMiddleware(async_view))(self.factory.get('/'))
+        self.assertTrue(response['Server-Timing'].startswith('aggregate;dur='))
+        # Spans recorded outside a request only go to the metrics.
+        with span('outside'):
+            pass
+        self.assertIsNone(instrumentation._request_spans.get())
+
+    def test_requests_are_counted_per_view_and_status(self):
+        TimingMiddleware(slow_view)(self.factory.get('/'))
+        metrics = instrumentation.render_metrics()
+        self.assertIn('roadsafe_responses_total{view="unmatched",status="200"}', metrics)
+        self.assertIn('roadsafe_span_duration_seconds_count{span="csv_load"}', metrics)
+
+
+class MetricsTests(SimpleTestCase):
+
+    def test_histogram_buckets_are_cumulative(self):
+        histogram = Histogram('test_seconds', 'Test.', 'view', buckets=(0.1, 1.0))
+        for seconds in (0.05, 0.5, 0.5, 5.0):
+            histogram.observe('home', seconds)
+        lines = histogram.render()
+        self.assertIn('test_seconds_bucket{view="home",le="0.1"} 1', lines)
+        self.assertIn('test_seconds_bucket{view="home",le="1.0"} 3', lines)
+        self.assertIn('test_seconds_bucket{view="home",le="+Inf"} 4', lines)
+        self.assertIn('test_seconds_count{view="home"} 4', lines)
+
+    def test_metrics_are_only_served_to_local_clients(self):
+        factory = RequestFactory()
+        self.assertEqual(views.metrics(factory.get('/metrics/', REMOTE_ADDR='127.0.0.1')).status_code, 200)
+        self.assertEqual(views.metrics(factory.get('/metrics/', REMOTE_ADDR='203.0.113.5')).status_code, 403)
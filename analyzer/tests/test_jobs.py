@@ -0,0 +1,171 @@
+# analyzer/tests/test_jobs.py
+
+from datetime import timedelta
+from io import StringIO
+from unittest import mock
+
+from django.core.management import call_command
+from django.db import IntegrityError, OperationalError
+from django.test import TestCase
+from django.utils import timezone
+
+from analyzer.models import BackgroundJob
+from analyzer.utils import jobs
+
+
+@mock.patch.object(jobs, 'get_worker')
+class EnqueueTests(TestCase):
+    def setUp(self):
+        jobs.register('noop')(lambda: None)
+        self.addCleanup(jobs._handlers.pop, 'noop')
+
+    def test_requests_coalesce_into_the_queued_run(self, get_worker):
+        first = jobs.enqueue('noop', delay=10)
+        second = jobs.enqueue('noop', delay=20)
+        self.assertEqual(first.pk, second.pk)
+        self.assertEqual(second.requests, 2)
+        self.assertGreater(second.run_after, first.run_after)
+        self.assertEqual(BackgroundJob.objects.count(), 1)
+
+    def test_debounce_is_capped_from_the_first_request(self, get_worker):
+        job = jobs.enqueue('noop', delay=10)
+        created = job.created_at
+        with mock.patch.object(jobs, 'JOB_MAX_WAIT_SECONDS', 60):
+            for _ in range(3):
+                job = jobs.enqueue('noop', delay=3600)
+        self.assertEqual(job.requests, 4)
+        self.assertEqual(job.run_after, created + timedelta(seconds=60))
+
+    def test_without_debounce_the_start_is_kept(self, get_worker):
+        first = jobs.enqueue('noop', delay=10)
+        second = jobs.enqueue('noop', delay=100, debounce=False)
+        self.assertEqual(second.run_after, first.run_after)
+
+    def test_a_concurrent_insert_is_coalesced(self, get_worker):
+        jobs.enqueue('noop')
+        # The lookup misses the queued run another process has just inserted.
+        lookups = [BackgroundJob.objects.none(), BackgroundJob.objects.select_for_update()]
+        with mock.patch.object(BackgroundJob.objects, 'select_for_update', side_effect=lookups):
+            job = jobs.enqueue('noop')
+        self.assertEqual(job.requests, 2)
+        self.assertEqual(BackgroundJob.objects.filter(status=BackgroundJob.STATUS_QUEUED).count(), 1)
+
+    def test_a_locked_database_is_retried(self, get_worker):
+        enqueue_once = jobs._enqueue
+        calls = []
+
+        def locked_first(*args):
+            calls.append(args)
+            if len(calls) == 1:
+                raise OperationalError('database is locked')
+            return enqueue_once(*args)
+
+        with mock.patch.object(jobs, '_enqueue', side_effect=locked_first), \
+                mock.patch.object(jobs, 'ENQUEUE_RETRY_SECONDS', 0):
+            job = jobs.enqueue('noop')
+        self.assertEqual(len(calls), 2)
+        self.assertEqual(job.status, BackgroundJob.STATUS_QUEUED)
+
+    def test_only_one_queued_run_per_job(self, get_worker):
+        jobs.enqueue('noop')
+        with self.assertRaises(IntegrityError):
+            BackgroundJob.objects.create(name='noop', run_after=timezone.now())
+
+
+@mock.patch.object(jobs, 'get_worker')
+class WorkerTests(TestCase):
+    def setUp(self):
+        self.calls = []
+        jobs.register('noop')(lambda: self.calls.append(1) or {'ok': True})
+        self.addCleanup(jobs._handlers.pop, 'noop')
+
+    def test_runs_due_jobs(self, get_worker):
+        job = jobs.enqueue('noop', delay=0)
+        worker = jobs.JobWorker()
+        claimed = worker._claim_next()
+        self.assertEqual(claimed.pk, job.pk)
+        worker._run(claimed)
+        claimed.refresh_from_db()
+        self.assertEqual(claimed.status, BackgroundJob.STATUS_DONE)
+        self.assertEqual(jobs.job_status(claimed)['result'], {'ok': True})
+        self.assertIsNone(worker._claim_next())
+
+    def test_stale_running_job_is_queued_again(self, get_worker):
+        started = timezone.now() - timedelta(seconds=jobs.JOB_TIMEOUT_SECONDS + 60)
+        stale = BackgroundJob.objects.create(
+            name='noop', status=BackgroundJob.STATUS_RUNNING, run_after=started, started_at=started
+        )
+        with self.assertLogs('analyzer.utils.jobs', 'WARNING'):
+            claimed = jobs.JobWorker()._claim_next()
+        stale.refresh_from_db()
+        self.assertEqual(stale.status, BackgroundJob.STATUS_FAILED)
+        self.assertIn('presumed dead', stale.error)
+        self.assertIsNotNone(claimed)
+        self.assertNotEqual(claimed.pk, stale.pk)
+        self.assertEqual(claimed.status, BackgroundJob.STATUS_RUNNING)
+
+    def test_a_reclaimed_run_does_not_overwrite_its_failure(self, get_worker):
+        job = jobs.enqueue('noop', delay=0)
+        worker = jobs.JobWorker()
+        claimed = worker._claim_next()
+        # The run takes longer than JOB_TIMEOUT_SECONDS and is reclaimed meanwhile.
+        BackgroundJob.objects.filter(pk=job.pk).update(
+            started_at=timezone.now() - timedelta(seconds=jobs.JOB_TIMEOUT_SECONDS + 60)
+        )
+        claimed.refresh_from_db()
+        with self.assertLogs('analyzer.utils.jobs', 'WARNING'):
+            worker._reclaim_stale()
+            worker._run(claimed)
+        claimed.refresh_from_db()
+        self.assertEqual(claimed.status, BackgroundJob.STATUS_FAILED)
+        self.assertEqual(BackgroundJob.objects.filter(status=BackgroundJob.STATUS_QUEUED).count(), 1)
+
+
+class PayloadTests(TestCase):
+    def test_merge_takes_the_union(self):
+        self.assertEqual(
+            jobs.merge_payloads({'states': ['Goa']}, {'states': ['Kerala', 'Goa']}), {'states': ['Goa', 'Kerala']}
+        )
+
+    def test_a_request_without_payload_asks_for_everything(self):
+        self.assertIsNone(jobs.merge_payloads({'states': ['Goa']}, None))
+        self.assertIsNone(jobs.merge_payloads(None, {'states': ['Goa']}))
+
+    @mock.patch.object(jobs, 'get_worker')
+    def test_coalesced_payloads_reach_the_handler(self, get_worker):
+        received = []
+        jobs.register('scoped')(lambda states=None: received.append(states))
+        self.addCleanup(jobs._handlers.pop, 'scoped')
+        jobs.enqueue('scoped', delay=0, payload={'states': ['Goa']})
+        jobs.enqueue('scoped', delay=0, payload={'states': ['Kerala']})
+        worker = jobs.JobWorker()
+        worker._run(worker._claim_next())
+        self.assertEqual(received, [['Goa', 'Kerala']])
+
+
+@mock.patch.object(jobs, 'get_worker')
+class WorkerStartTests(TestCase):
+    def test_servers_start_the_worker(self, get_worker):
+        self.assertTrue(jobs.autostart_worker(['gunicorn', 'roadsafe_ai.wsgi']))
+        self.assertTrue(jobs.autostart_worker(['manage.py', 'runserver', '--noreload']))
+        with mock.patch.dict('os.environ', {'RUN_MAIN': 'true'}):
+            self.assertTrue(jobs.autostart_worker(['manage.py', 'runserver']))
+        self.assertEqual(get_worker.call_count, 3)
+
+    def test_other_commands_and_the_autoreloader_do_not(self, get_worker):
+        with mock.patch.dict('os.environ', {'RUN_MAIN': ''}):
+            self.assertFalse(jobs.autostart_worker(['manage.py', 'runserver']))
+        self.assertFalse(jobs.autostart_worker(['manage.py', 'migrate']))
+        with mock.patch.object(jobs, 'JOB_WORKER_AUTOSTART', False):
+            self.assertFalse(jobs.autostart_worker(['gunicorn', 'roadsafe_ai.wsgi']))
+        get_worker.assert_not_called()
+
+    def test_run_jobs_runs_the_due_jobs_of_other_processes(self, get_worker):
+        ran = []
+        jobs.register('noop')(lambda: ran.append(1))
+        self.addCleanup(jobs._handlers.pop, 'noop')
+        BackgroundJob.objects.create(name='noop', run_after=timezone.now())
+        output = StringIO()
+        call_command('run_jobs', '--once', stdout=output)
+        self.assertEqual(ran, [1])
+        self.assertIn('Ran 1', output.getvalue())
@@ -0,0 +1,61 @@
+# analyzer/tests/test_partitioner.py
+
+import hashlib
+import os
+import shutil
+import tempfile
+from unittest import mock
+
+import pandas as pd
+from django.test import SimpleTestCase
+
+from analyzer.utils import partitioner
+from analyzer.utils.partitioner import load_manifest, partition_dataset
+from analyzer.utils.schema import MASTER_COLUMN_ORDER
+
+from .helpers import accident
+
+
+class PartitionDatasetTests(SimpleTestCase):
+
+    records = [
+        *(accident(index, district='North Goa' if index % 2 else 'South Goa') for index in range(1, 21)),
+        accident(21, state='Delhi', district=None),
+        accident(22, state=None),
+        accident(23, latitude=None),
+    ]
+
+    def setUp(self):
+        self.data_dir = tempfile.mkdtemp(prefix='roadsafe-partition-')
+        self.addCleanup(shutil.rmtree, self.data_dir, ignore_errors=True)
+        self.input_path = os.path.join(self.data_dir, 'all_india.csv')
+        pd.DataFrame(self.records)[MASTER_COLUMN_ORDER].to_csv(self.input_path, index=False)
+
+    def partition(self, **kwargs):
+        return partition_dataset(self.input_path, self.data_dir, log=lambda message: None, **kwargs)
+
+    def ids(self, relative):
+        return pd.read_csv(os.path.join(self.data_dir, relative))['Accident_Index'].tolist()
+
+    def test_rows_go_to_their_state_and_district_in_order(self):
+        self.partition(chunksize=3, workers=4)
+        self.assertEqual(self.ids('states/Goa.csv'), list(range(1, 21)))
+        self.assertEqual(self.ids('districts/Goa/North_Goa.csv'), list(range(1, 21, 2)))
+        self.assertEqual(self.ids('districts/Goa/South_Goa.csv'), list(range(2, 21, 2)))
+        # Rows without a district stay in their state; rows without a state or coordinates are dropped.
+        self.assertEqual(self.ids('states/Delhi.csv'), [21])
+        self.assertFalse(os.path.exists(os.path.join(self.data_dir, 'districts', 'Delhi')))
+        self.assertFalse(os.path.exists(os.path.join(self.data_dir, '.partition-staging')))
+
+    def test_manifest_describes_the_written_files(self):
+        # Small buffers make each partition take several writes.
+        with mock.patch.object(partitioner, 'BUFFER_ROWS', 2):
+            manifest = self.partition(chunksize=4)
+        self.assertEqual(manifest, load_manifest(self.data_dir))
+        self.assertEqual((manifest['input_rows'], manifest['dropped_rows']), (23, 2))
+        for relative, entry in manifest['partitions'].items():
+            with open(os.path.join(self.data_dir, relative), 'rb') as handle:
+                data = handle.read()
+            self.assertEqual(entry['bytes'], len(data), relative)
+            self.assertEqual(entry['sha256'], hashlib.sha256(data).hexdigest(), relative)
+        self.assertEqual(manifest['partitions']['districts/Goa/North_Goa.csv']['rows'], 10)
@@ -0,0 +1,73 @@
+# analyzer/tests/test_pipeline.py
+
+import os
+import shutil
+import tempfile
+
+import numpy as np
+import pandas as pd
+from django.test import SimpleTestCase
+
+from analyzer.ml.code_maps import decode, road_type_map
+from analyzer.ml.pipeline import VEHICLE_AGGREGATES, aggregate_by_accident, run_pipeline
+
+
+class PipelineTests(SimpleTestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp(prefix='roadsafe-pipeline-')
+        self.addCleanup(shutil.rmtree, self.directory, ignore_errors=True)
+        rng = np.random.default_rng(0)
+        ids = [f'A{number:03d}' for number in range(40)]
+        self.vehicles = pd.DataFrame({
+            'Accident_Index': rng.choice(ids[:30], 120),
+            'Vehicle_Type': rng.integers(1, 10, 120),
+            'Age_of_Vehicle': np.where(rng.random(120) < 0.2, np.nan, rng.integers(1, 20, 120)),
+            'Engine_CC': rng.integers(800, 3000, 120),
+        }).rename(columns={'Engine_CC': 'Engine_Capacity_(CC)'})
+        self.casualties = pd.DataFrame({
+            'Accident_Index': rng.choice(ids[:20], 50),
+            'Casualty_Severity': rng.integers(1, 4, 50),
+        })
+        self.accidents = pd.DataFrame({
+            'Accident_Index': ids,
+            'Date': ['04/03/2018'] * 39 + ['not a date'],
+            'Time': ['21:00'] * 40,
+            'latitude': 15.5, 'longitude': 73.9,
+            'Accident_Severity': rng.integers(1, 4, 40),
+            'Road_Type': rng.choice([1, 6, 7, 42], 40),
+            'Weather_Conditions': 1, 'Light_Conditions': 1,
+        })
+        self.paths = {}
+        for name in ('accidents', 'vehicles', 'casualties'):
+            self.paths[name] = os.path.join(self.directory, f'{name}.csv')
+            # The raw files start with a UTF-8 BOM.
+            getattr(self, name).to_csv(self.paths[name], index=False, encoding='utf-8-sig')
+
+    def test_chunked_aggregates_match_a_full_groupby(self):
+        grouped = self.vehicles.groupby('Accident_Index')
+        expected = pd.DataFrame({
+            'Num_Vehicles': grouped['Vehicle_Type'].count(),
+            'Avg_Vehicle_Age': grouped['Age_of_Vehicle'].mean(),
+            'Avg_Engine_CC': grouped['Engine_Capacity_(CC)'].mean(),
+        })
+        for chunksize in (7, 1000):
+            result = aggregate_by_accident(self.paths['vehicles'], VEHICLE_AGGREGATES, chunksize)
+            pd.testing.assert_frame_equal(result.sort_index(), expected, check_names=False)
+
+    def test_cleaned_output_is_labelled_and_joined(self):
+        output = os.path.join(self.directory, 'cleaned.csv')
+        counts = run_pipeline(
+            self.paths['accidents'], self.paths['vehicles'], self.paths['casualties'],
+            output_path=output, chunksize=9, log=lambda message: None,
+        )
+        self.assertEqual(counts, {'accidents': 40, 'merged': 0, 'cleaned': 39})
+        cleaned = pd.read_csv(output, keep_default_na=False)
+        self.assertEqual(len(cleaned), 39)
+        vehicles = self.vehicles['Accident_Index'].value_counts()
+        self.assertEqual(
+            cleaned['Number_of_Vehicles'].tolist(), [int(vehicles.get(index, 0)) for index in cleaned['Accident_Index']]
+        )
+        # Unknown codes (42) become empty values.
+        expected = decode(self.accidents['Road_Type'][:39].to_numpy(), road_type_map).astype(object)
+        self.assertEqual(cleaned['Road_Type'].tolist(), [value if isinstance(value, str) else '' for value in expected])
@@ -0,0 +1,70 @@
+# analyzer/tests/test_points.py
+
+import json
+from unittest import mock
+
+import numpy as np
+from asgiref.sync import async_to_sync
+from django.test import RequestFactory, SimpleTestCase
+
+from analyzer import views
+from analyzer.serializers import PointsQuerySerializer
+from analyzer.utils import conditional
+from analyzer.utils.dataset_store import DatasetStore
+from analyzer.utils.points import DistrictPoints, decode_cursor, encode_cursor
+
+from .helpers import DataDirMixin
+
+
+class CursorTests(SimpleTestCase):
+
+    def test_cursor_round_trip(self):
+        self.assertEqual(decode_cursor(encode_cursor(42)), 42)
+
+    def test_negative_and_malformed_cursors_are_invalid(self):
+        for cursor in (encode_cursor(-1), 'LTE', 'not a cursor!', 'YWJj'):
+            with self.subTest(cursor=cursor):
+                with self.assertRaises(ValueError):
+                    decode_cursor(cursor)
+                self.assertFalse(PointsQuerySerializer(data={'cursor': cursor}).is_valid())
+
+
+class DistrictPointsViewTests(DataDirMixin, SimpleTestCase):
+
+    def setUp(self):
+        super().setUp()
+        store = DatasetStore(self.data_dir)
+        hotspots = mock.Mock(**{'labels.side_effect': lambda state, district, df: np.full(len(df), -1)})
+        points = DistrictPoints(store=store, hotspots=hotspots)
+        catalog = mock.Mock(**{'states.return_value': ['Goa']})
+        for module, name, value in (
+            (views, 'get_district_points', points),
+            (conditional, 'get_store', store),
+            (conditional, 'get_catalog', catalog),
+        ):
+            patcher = mock.patch.object(module, name, return_value=value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.factory = RequestFactory()
+
+    def get(self, **params):
+        request = self.factory.get('/api/state/Goa/district/North_Goa/points/', params)
+        response = async_to_sync(views.district_points)(request, 'Goa', 'North_Goa')
+        # The view hands out a plain copy of the rendered response.
+        return response.status_code, json.loads(response.content)
+
+    def test_pages_follow_the_cursor(self):
+        status, first = self.get(limit=3)
+        self.assertEqual(status, 200)
+        self.assertEqual((first['total'], first['count']), (5, 3))
+        _, second = self.get(limit=3, cursor=first['cursor'])
+        self.assertEqual(second['count'], 2)
+        self.assertIsNone(second['cursor'])
+
+    def test_negative_cursor_is_a_bad_request(self):
+        self.assertEqual(self.get(cursor=encode_cursor(-5))[0], 400)
+
+    def test_cursor_past_the_last_point_is_a_bad_request(self):
+        status, body = self.get(cursor=encode_cursor(1000))
+        self.assertEqual(status, 400)
+        self.assertIn('cursor', body)
@@ -0,0 +1,129 @@
+# analyzer/tests/test_report_queries.py
+
+from types import SimpleNamespace
+from unittest import mock
+
+import pandas as pd
+from django.contrib.messages.storage.cookie import CookieStorage
+from django.test import RequestFactory, TestCase
+
+from analyzer import views
+from analyzer.models import AccidentReport
+from analyzer.utils import ingest, report_queries
+from analyzer.utils.catalog import Catalog
+from analyzer.utils.dataset_store import DatasetStore
+from analyzer.utils.report_queries import import_frame
+from analyzer.utils.schema import MASTER_COLUMN_ORDER, coerce_types
+
+from .helpers import DataDirMixin, accident
+from .test_dataset_store import expire
+
+
+def frame(indexes, **values):
+    return coerce_types(pd.DataFrame([accident(index, **values) for index in indexes]))[MASTER_COLUMN_ORDER]
+
+
+class DatabaseStorageStoreTests(DataDirMixin, TestCase):
+    """The dataset store reads the AccidentReport table, not the partitions, in database mode."""
+
+    def setUp(self):
+        super().setUp()
+        patcher = mock.patch.object(report_queries, 'ACCIDENT_STORAGE', 'database')
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        import_frame(frame(range(101, 105)))
+
+    def test_store_loads_the_table(self):
+        store = DatasetStore(self.data_dir)
+        self.assertEqual(store.frame()['Accident_Index'].tolist(), [101, 102, 103, 104])
+        self.assertEqual(len(store.district('Goa', 'North Goa')), 4)
+
+    def test_inserted_rows_are_added_without_republishing(self):
+        store = DatasetStore(self.data_dir)
+        store.frame()
+        published = store._snapshot_name
+        import_frame(frame([105, 106], district='South Goa'))
+        expire(store)
+        self.assertEqual(len(store.frame()), 6)
+        self.assertEqual(len(store.district('Goa', 'South Goa')), 2)
+        self.assertEqual(store._snapshot_name, published)
+
+    def test_second_store_attaches_and_adds_the_delta(self):
+        first = DatasetStore(self.data_dir)
+        first.frame()
+        import_frame(frame([105]))
+        second = DatasetStore(self.data_dir)
+        self.assertEqual(len(second.frame()), 5)
+        self.assertEqual(second._snapshot_name, first._snapshot_name)
+
+    def test_appended_rows_are_not_added_twice(self):
+        store = DatasetStore(self.data_dir)
+        store.frame()
+        new_df = frame([105])
+        store.append(new_df)
+        import_frame(new_df)
+        expire(store)
+        self.assertEqual(store.frame()['Accident_Index'].tolist(), [101, 102, 103, 104, 105])
+
+    def test_deleted_rows_reload_the_table(self):
+        store = DatasetStore(self.data_dir)
+        store.frame()
+        AccidentReport.objects.filter(accident_index=101).delete()
+        expire(store)
+        self.assertEqual(store.frame()['Accident_Index'].tolist(), [102, 103, 104])
+
+    def test_catalog_lists_the_scopes_of_the_table(self):
+        catalog = Catalog(store=DatasetStore(self.data_dir), data_dir=self.data_dir)
+        self.assertEqual(catalog.districts_by_state(), {'Goa': ['North_Goa']})
+        self.assertEqual(catalog.district('Goa', 'North Goa')['rows'], 4)
+
+
+class DatabaseSubmissionTests(DataDirMixin, TestCase):
+    """In database mode a submission goes to the table only, not to the ingest log and partitions."""
+
+    form = {
+        'state': 'Goa', 'district': 'North Goa', 'latitude': '15.5', 'longitude': '73.8',
+        'date': '2024-03-01', 'time': '14:30', 'severity': 'Minor injury', 'road_type': 'Single carriageway',
+        'weather': 'Fine', 'num_vehicles': '2', 'num_casualties': '1', 'light_conditions': 'Daylight',
+    }
+
+    def setUp(self):
+        super().setUp()
+        patcher = mock.patch.object(report_queries, 'ACCIDENT_STORAGE', 'database')
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        import_frame(frame(range(101, 105)))
+        self.store = DatasetStore(self.data_dir)
+        catalog = mock.Mock(**{'districts_by_state.return_value': {'Goa': ['North_Goa']}})
+        for name, value in (
+            ('get_store', self.store), ('get_catalog', catalog), ('get_geocoder', None),
+            ('get_vocabulary', mock.Mock(**{'values.return_value': []})),
+        ):
+            patcher = mock.patch.object(views, name, return_value=value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def submit(self):
+        request = RequestFactory().post('/submit/', self.form)
+        request.user = SimpleNamespace(pk=1, is_authenticated=True)
+        request._messages = CookieStorage(request)
+        return views.submit_page(request)
+
+    @mock.patch.object(views.jobs, 'enqueue', return_value=SimpleNamespace(pk=1))
+    @mock.patch.object(ingest, 'flush')
+    @mock.patch.object(ingest, 'submit')
+    def test_submission_is_inserted_into_the_table_only(self, submit, flush, enqueue):
+        self.store.frame()
+        response = self.submit()
+        self.assertEqual(response.status_code, 302)
+        submit.assert_not_called()
+        flush.assert_not_called()
+        self.assertEqual([call.args[0] for call in enqueue.call_args_list], ['retrain_dbscan'])
+
+        report = AccidentReport.objects.get(accident_index=105)
+        self.assertEqual((report.district, report.time, report.number_of_vehicles), ('North Goa', '14:30', 2))
+        self.assertEqual(AccidentReport.objects.count(), 5)
+        # The store holds the row once, from the append and the table alike.
+        expire(self.store)
+        self.assertEqual(self.store.frame()['Accident_Index'].tolist(), [101, 102, 103, 104, 105])
+        self.assertEqual(report_queries.get_report_aggregates().summary('Goa').total, 5)
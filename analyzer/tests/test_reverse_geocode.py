@@ -0,0 +1,116 @@
+# analyzer/tests/test_reverse_geocode.py
+
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from unittest import mock
+
+import numpy as np
+import pandas as pd
+from django.conf import settings
+from django.test import SimpleTestCase
+
+from analyzer.utils import reverse_geocode
+from analyzer.utils.reverse_geocode import GeocodeCache
+
+
+class FakeGeocoder:
+    """North Goa above latitude 15.5, South Goa below it, nothing outside Goa's longitudes."""
+
+    assigned = []
+
+    def __init__(self, districts_path, states_path):
+        pass
+
+    def assign(self, df):
+        FakeGeocoder.assigned.extend(df['latitude'].tolist())
+        inside = df['longitude'].between(73.5, 74.5)
+        return pd.DataFrame({
+            'State': np.where(inside, 'Goa', None),
+            'District': np.where(inside, np.where(df['latitude'] >= 15.5, 'North Goa', 'South Goa'), None),
+        })
+
+
+class ReverseGeocodeTests(SimpleTestCase):
+
+    def setUp(self):
+        directory = tempfile.mkdtemp(prefix='roadsafe-geocode-')
+        self.addCleanup(shutil.rmtree, directory, ignore_errors=True)
+        self.cache_file = os.path.join(directory, 'cache.sqlite3')
+        FakeGeocoder.assigned = []
+        for name, value in (
+            ('geocoding_available', mock.Mock(return_value=True)),
+            ('Geocoder', FakeGeocoder),
+            # Threads share the patched geocoder; worker processes would not.
+            ('ProcessPoolExecutor', ThreadPoolExecutor),
+        ):
+            patcher = mock.patch.object(reverse_geocode, name, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def geocode(self, latitudes, longitudes):
+        return reverse_geocode.reverse_geocode(
+            latitudes, longitudes, districts_path='districts.shp', states_path='states.shp',
+            cache_file=self.cache_file, chunk_size=2,
+        )
+
+    def test_places_are_assigned_per_unique_coordinate(self):
+        result = self.geocode([15.7, 15.7, 15.2, None, 15.700001, 15.3], [73.9, 73.9, 73.9, 73.9, 73.9, 80.0])
+        self.assertEqual(result['District'].tolist(), ['North Goa', 'North Goa', 'South Goa', None, 'North Goa', None])
+        self.assertEqual(result['State'].tolist(), ['Goa', 'Goa', 'Goa', None, 'Goa', None])
+        # Duplicates and coordinates within 1e-5 degrees are geocoded once.
+        self.assertEqual(len(FakeGeocoder.assigned), 3)
+
+    def test_cached_coordinates_are_not_geocoded_again(self):
+        self.geocode([15.7, 15.2], [73.9, 73.9])
+        FakeGeocoder.assigned = []
+        result = self.geocode([15.2, 15.8], [73.9, 73.9])
+        self.assertEqual(result['District'].tolist(), ['South Goa', 'North Goa'])
+        self.assertEqual(FakeGeocoder.assigned, [15.8])
+
+
+class GeocodeCacheTests(SimpleTestCase):
+
+    def test_changed_shapefiles_clear_the_cache(self):
+        directory = tempfile.mkdtemp(prefix='roadsafe-geocode-')
+        self.addCleanup(shutil.rmtree, directory, ignore_errors=True)
+        path = os.path.join(directory, 'cache.sqlite3')
+        keys = np.array([1550000]), np.array([7390000])
+
+        cache = GeocodeCache(path, 'v1')
+        cache.put(*keys, np.array(['Goa'], dtype=object), np.array(['North Goa'], dtype=object))
+        cache.close()
+        cache = GeocodeCache(path, 'v1')
+        self.assertEqual(cache.get(*keys)[1].tolist(), ['North Goa'])
+        cache.close()
+        cache = GeocodeCache(path, 'v2')
+        self.assertFalse(cache.get(*keys)[2].any())
+        cache.close()
+
+
+class LatLonToStateScriptTests(SimpleTestCase):
+
+    def test_script_runs_without_django_settings(self):
+        environment = {name: value for name, value in os.environ.items() if name != 'DJANGO_SETTINGS_MODULE'}
+        completed = subprocess.run(
+            [sys.executable, '-m', 'geolocation.latlon_to_state', '--help'],
+            cwd=settings.BASE_DIR, env=environment, capture_output=True, text=True,
+        )
+        self.assertEqual(completed.returncode, 0, completed.stderr)
+
+    def test_states_are_added_to_the_given_files(self):
+        from geolocation import latlon_to_state
+
+        directory = tempfile.mkdtemp(prefix='roadsafe-geocode-')
+        self.addCleanup(shutil.rmtree, directory, ignore_errors=True)
+        input_path, output_path = os.path.join(directory, 'in.csv'), os.path.join(directory, 'out', 'states.csv')
+        pd.DataFrame({'latitude': [15.7, 28.6], 'longitude': [73.9, 77.2]}).to_csv(input_path, index=False)
+        places = pd.DataFrame({'State': ['Goa', None], 'District': ['North Goa', None]})
+        with mock.patch.object(latlon_to_state, 'reverse_geocode', return_value=places) as geocode, \
+                mock.patch('builtins.print'):
+            latlon_to_state.main(['--input', input_path, '--output', output_path, '--data-dir', directory])
+        self.assertEqual(geocode.call_args.kwargs['cache_file'], os.path.join(directory, '.cache', 'reverse_geocode.sqlite3'))
+        self.assertEqual(pd.read_csv(output_path)['State'].tolist(), ['Goa', 'Unknown'])
@@ -0,0 +1,84 @@
+# analyzer/tests/test_schema.py
+
+import io
+import os
+import shutil
+import tempfile
+import unittest
+
+import pandas as pd
+from django.test import SimpleTestCase
+
+from analyzer.utils import columnar
+from analyzer.utils.columnar import read_partition, write_feather
+from analyzer.utils.schema import CSV_DTYPES, MASTER_COLUMN_ORDER, coerce_types, concat, time_labels
+
+from .helpers import accident
+
+
+COMPACT_DTYPES = {
+    'Accident_Index': 'Int32',
+    'Date': 'datetime64[ns]',
+    'Time': 'Int16',
+    'latitude': 'float32',
+    'longitude': 'float32',
+    'Number_of_Vehicles': 'Int8',
+    'Number_of_Casualties': 'Int8',
+}
+
+
+def frame(records):
+    return pd.DataFrame(records)[MASTER_COLUMN_ORDER]
+
+
+class CoerceTypesTests(SimpleTestCase):
+
+    def assertCompact(self, df):
+        for column, dtype in COMPACT_DTYPES.items():
+            self.assertEqual(str(df[column].dtype), dtype, column)
+        for column in ('Accident_Severity', 'State', 'District'):
+            self.assertIsInstance(df[column].dtype, pd.CategoricalDtype, column)
+
+    def test_compact_types(self):
+        df = coerce_types(frame([accident(1), accident(2, Time='7:05')]))
+        self.assertCompact(df)
+        self.assertEqual(df['Accident_Index'].tolist(), [1, 2])
+        self.assertEqual(df['Time'].tolist(), [21 * 60, 7 * 60 + 5])
+        self.assertEqual(time_labels(df['Time']).tolist(), ['21:00', '07:05'])
+
+    def test_invalid_values_become_missing_and_large_values_widen(self):
+        df = coerce_types(frame([
+            accident(3_000_000_000, Time='25:00', Date='not a date', Number_of_Vehicles=300.0),
+        ]))
+        self.assertEqual(str(df['Accident_Index'].dtype), 'Int64')
+        self.assertEqual(str(df['Number_of_Vehicles'].dtype), 'Int16')
+        self.assertTrue(pd.isna(df['Time'].iloc[0]))
+        self.assertTrue(pd.isna(df['Date'].iloc[0]))
+
+    def test_csv_round_trip_keeps_values_and_types(self):
+        df = coerce_types(frame([accident(index) for index in range(1, 4)]))
+        text = df.assign(Time=time_labels(df['Time'])).to_csv(index=False)
+        reloaded = coerce_types(pd.read_csv(io.StringIO(text), dtype=CSV_DTYPES))
+        self.assertCompact(reloaded)
+        pd.testing.assert_frame_equal(reloaded[MASTER_COLUMN_ORDER], df, check_categorical=False)
+
+    def test_frames_share_categories(self):
+        first = coerce_types(frame([accident(1)]))
+        second = coerce_types(frame([accident(2, state='Kerala', district='Kochi')]))
+        combined = concat([first, second])
+        self.assertIsInstance(combined['District'].dtype, pd.CategoricalDtype)
+        self.assertEqual(combined['District'].tolist(), ['North Goa', 'Kochi'])
+        # The earlier frame's categories are a prefix of the shared ones.
+        categories = list(combined['State'].cat.categories)
+        self.assertEqual(categories[:len(first['State'].cat.categories)], list(first['State'].cat.categories))
+
+    @unittest.skipUnless(columnar.columnar_available(), 'pyarrow is not installed')
+    def test_feather_round_trip_keeps_values_and_types(self):
+        directory = tempfile.mkdtemp(prefix='roadsafe-schema-')
+        self.addCleanup(shutil.rmtree, directory, ignore_errors=True)
+        path = os.path.join(directory, 'Goa.feather')
+        df = coerce_types(frame([accident(index) for index in range(1, 4)]))
+        write_feather(df, path)
+        reloaded = coerce_types(read_partition(path))
+        self.assertCompact(reloaded)
+        pd.testing.assert_frame_equal(reloaded[MASTER_COLUMN_ORDER], df, check_categorical=False)
@@ -0,0 +1,94 @@
+# analyzer/tests/test_spatial.py
+
+from unittest import mock
+
+import numpy as np
+import pandas as pd
+from django.test import SimpleTestCase
+
+from analyzer.utils import snapshots
+from analyzer.utils.dataset_store import DatasetStore
+from analyzer.utils.hotspots import EARTH_RADIUS_METRES
+from analyzer.utils.spatial import SpatialIndex, SpatialIndexes
+
+from .helpers import DataDirMixin, accident
+
+
+def haversine(latitudes, longitudes, latitude, longitude):
+    """Great-circle distances in metres, computed directly."""
+    lat1, lon1, lat2, lon2 = map(np.radians, (latitudes, longitudes, latitude, longitude))
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_METRES * np.arcsin(np.sqrt(a))
+
+
+class SpatialIndexTests(SimpleTestCase):
+
+    def setUp(self):
+        rng = np.random.default_rng(0)
+        self.latitudes = 15 + rng.random(500)
+        self.longitudes = 73 + rng.random(500)
+        self.latitudes[7] = np.nan
+        self.index = SpatialIndex(np.arange(500), self.latitudes, self.longitudes)
+
+    def test_points_without_coordinates_are_left_out(self):
+        self.assertEqual(len(self.index), 499)
+
+    def test_bbox_matches_a_full_scan(self):
+        expected = np.flatnonzero(
+            (self.latitudes >= 15.2) & (self.latitudes <= 15.6) & (self.longitudes >= 73.1) & (self.longitudes <= 73.3)
+        )
+        self.assertEqual(sorted(self.index.bbox(15.2, 73.1, 15.6, 73.3)), expected.tolist())
+
+    def test_radius_and_nearest_match_a_full_scan(self):
+        distances = haversine(self.latitudes, self.longitudes, 15.5, 73.5)
+        positions, found = self.index.radius(15.5, 73.5, 20000)
+        self.assertEqual(sorted(positions), np.flatnonzero(distances <= 20000).tolist())
+        self.assertTrue(np.all(np.diff(found) >= 0))
+
+        positions, found = self.index.nearest(15.5, 73.5, 5)
+        self.assertEqual(positions.tolist(), np.argsort(np.nan_to_num(distances, nan=np.inf))[:5].tolist())
+        np.testing.assert_allclose(found, np.sort(distances[positions]), rtol=1e-6)
+
+
+class SpatialIndexesTests(DataDirMixin, SimpleTestCase):
+
+    records = [*DataDirMixin.records, accident(11, latitude=None, longitude=None)]
+
+    def setUp(self):
+        super().setUp()
+        patcher = mock.patch.object(snapshots, 'SHARED_DATASET', False)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.store = DatasetStore(self.data_dir)
+        self.indexes = SpatialIndexes(self.store)
+
+    def test_district_positions_refer_to_the_national_frame(self):
+        index = self.indexes.index('Goa', 'South Goa')
+        self.assertEqual(len(index), 5)
+        result = SpatialIndexes.results(index, index.bbox(15, 73, 16, 74), limit=2)
+        self.assertEqual((result['count'], result['returned']), (5, 2))
+        self.assertEqual(result['severity_counts'], {'Minor injury': 5})
+        self.assertEqual(result['points']['id'], [2, 4])
+        self.assertIsNone(self.indexes.index('Kerala'))
+
+    def test_indexes_are_reused_until_the_data_changes(self):
+        index = self.indexes.index('Goa')
+        self.assertIs(self.indexes.index('Goa'), index)
+        self.store.refresh(force=True)
+        self.assertIsNot(self.indexes.index('Goa'), index)
+
+    def test_a_refresh_during_the_build_does_not_mix_snapshots(self):
+        self.store.frame()
+        refresh = self.store.refresh
+        added = iter(range(100, 200))
+
+        def refresh_with_a_new_row(force=False):
+            # Another writer adds a South Goa row before every read.
+            self.store.append(pd.DataFrame([accident(next(added), district='South Goa')]))
+            return refresh(force)
+
+        with mock.patch.object(self.store, 'refresh', refresh_with_a_new_row):
+            index = self.indexes.index('Goa', 'South Goa')
+        self.assertTrue((index.positions < len(index.frame)).all())
+        self.assertEqual(SpatialIndexes.results(index, index.bbox(15, 73, 16, 74))['count'], len(index))
+        self.assertEqual(self.indexes._indexes[('Goa', 'South_Goa')][0], self.store.version)
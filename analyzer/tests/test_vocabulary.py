@@ -0,0 +1,51 @@
+# analyzer/tests/test_vocabulary.py
+
+import os
+from unittest import mock
+
+import pandas as pd
+from django.test import SimpleTestCase
+
+from analyzer.utils import snapshots
+from analyzer.utils.dataset_store import DatasetStore
+from analyzer.utils.schema import MASTER_COLUMN_ORDER
+from analyzer.utils.vocabulary import Vocabulary
+
+from .helpers import DataDirMixin, accident
+
+
+class VocabularyTests(DataDirMixin, SimpleTestCase):
+
+    records = [*DataDirMixin.records, accident(11, Road_Type='Cobbled lane')]
+
+    def setUp(self):
+        super().setUp()
+        patcher = mock.patch.object(snapshots, 'SHARED_DATASET', False)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.store = DatasetStore(self.data_dir)
+
+    def vocabulary(self):
+        return Vocabulary(data_dir=self.data_dir, store=self.store)
+
+    def test_values_include_the_code_maps_and_the_data(self):
+        road_types = self.vocabulary().values('Road_Type')
+        self.assertIn('Single carriageway', road_types)
+        self.assertIn('Cobbled lane', road_types)
+        self.assertEqual(road_types, sorted(road_types))
+        self.assertTrue(os.path.exists(os.path.join(self.data_dir, 'vocabulary.json')))
+
+    def test_persisted_vocabulary_is_read_without_the_dataset(self):
+        self.vocabulary().values('Road_Type')
+        with mock.patch.object(self.store, 'frame') as frame:
+            self.assertIn('Cobbled lane', self.vocabulary().values('Road_Type'))
+            frame.assert_not_called()
+
+    def test_added_values_reach_other_processes(self):
+        first, second = self.vocabulary(), self.vocabulary()
+        first.values('Weather_Conditions')
+        second.values('Weather_Conditions')
+        first.add(pd.DataFrame([accident(12, Weather_Conditions='Hail')])[MASTER_COLUMN_ORDER])
+        self.assertIn('Hail', first.values('Weather_Conditions'))
+        second._last_check = 0.0
+        self.assertIn('Hail', second.values('Weather_Conditions'))
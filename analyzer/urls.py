@@ -14,6 +14,23 @@ urlpatterns = [
     path('state/<str:state_name>/', views.state_page, name='state_detail'),
 
     path('submit/', views.submit_page, name='submit_page'),
+
+    # JSON heat cells for the dashboard/state map viewport
+    path('api/heatmap/', views.heatmap_cells, name='heatmap_cells'),
+
+    # Status of background jobs such as model retraining
+    path('api/jobs/<int:job_id>/', views.job_status, name='job_status'),
+
+    # Paginated, compact accident points for the district map
+    path('api/state/<str:state_name>/district/<str:district_name>/points/', views.district_points, name='district_points'),
+
+    # Spatial queries: accidents in a box, within a radius, or nearest to a point
+    path('api/spatial/bbox/', views.spatial_bbox, name='spatial_bbox'),
+    path('api/spatial/radius/', views.spatial_radius, name='spatial_radius'),
+    path('api/spatial/nearest/', views.spatial_nearest, name='spatial_nearest'),
+
+    # Prometheus metrics (request and span durations), local clients only
+    path('metrics/', views.metrics, name='metrics'),
      path('signup/', views.signup_view, name='signup'),
     path('login/', views.login_view, name='login'),
     path('logout/', views.logout_view, name='logout'),
@@ -0,0 +1,185 @@
+# analyzer/utils/aggregates.py
+
+"""
+Materialized chart counts for the dashboard, state and district pages.
+
+The counts only change when a record is submitted, so instead of running
+value_counts()/resample() over the rows on every page view they are computed
+once per dataset version, stored per (state, district) and rolled up to the
+state and national levels. New submissions are added incrementally.
+"""
+
+import threading
+from collections import Counter, defaultdict
+
+import pandas as pd
+
+from .dataset_store import get_store, partition_keys, partition_name
+from .schema import time_labels
+
+
+# Summary name -> dataset column it counts.
+COUNTED_COLUMNS = {
+    'severity': 'Accident_Severity',
+    'road_type': 'Road_Type',
+    'weather': 'Weather_Conditions',
+    'time': 'Time',
+    'states': 'State',
+    'districts': 'District',
+}
+
+
+class Summary:
+    """Counters for one national, state or district node."""
+
+    def __init__(self):
+        self.total = 0
+        self.counts = {name: Counter() for name in [*COUNTED_COLUMNS, 'months']}
+
+    def __getitem__(self, name):
+        return self.counts[name]
+
+    def monthly(self):
+        """Accidents per 'YYYY-MM', with empty months in between filled with 0."""
+        months = self.counts['months']
+        if not months:
+            return {}
+        periods = pd.period_range(min(months), max(months), freq='M')
+        return {str(period): months.get(str(period), 0) for period in periods}
+
+    def top(self, name, n=None):
+        """The n most common values of a counter, most common first."""
+        return dict(self.counts[name].most_common(n))
+
+    def mode(self, name, default='N/A'):
+        """Most common value; ties resolve to the smallest value like Series.mode()."""
+        counter = self.counts[name]
+        if not counter:
+            return default
+        highest = max(counter.values())
+        return min(value for value, count in counter.items() if count == highest)
+
+
+def _node_keys(state, district):
+    """The national, state and district node keys a record contributes to."""
+    state_key, district_key = partition_name(state), partition_name(district)
+    return [(None, None), (state_key, None), (state_key, district_key)]
+
+
+class AggregateCache:
+    """Summaries for every (state, district), kept in step with the dataset store."""
+
+    def __init__(self, store=None):
+        self.store = store or get_store()
+        self._lock = threading.Lock()
+        self._nodes = defaultdict(Summary)
+        self._version = None
+
+    def _rebuild(self, df):
+        """Computes every node's counters from the full frame."""
+        nodes = defaultdict(Summary)
+        if df is None or df.empty:
+            return nodes
+
+        values = {name: df[column] for name, column in COUNTED_COLUMNS.items()}
+        # Times are stored as minutes of the day; count them as 'HH:MM'.
+        values['time'] = time_labels(df['Time'])
+        values['months'] = df['Date'].dt.to_period('M')
+
+        national = nodes[(None, None)]
+        national.total = len(df)
+        for name, series in values.items():
+            for value, count in series.value_counts().items():
+                if count:
+                    national[name][str(value)] = int(count)
+
+        # One groupby per level and column; the results are small
+        # (groups x distinct values) no matter how many rows there are.
+        state_keys = partition_keys(df['State']).to_numpy()
+        district_keys = partition_keys(df['District']).to_numpy()
+        for keys in ([state_keys], [state_keys, district_keys]):
+            for group, size in pd.Series(state_keys).groupby(keys).size().items():
+                nodes[self._group_key(group)].total = int(size)
+            for name, series in values.items():
+                # size() over the observed combinations only; value_counts()
+                # would list every category of a categorical in every group.
+                counts = series.groupby([*keys, series], observed=True).size()
+                for index, count in counts.items():
+                    if count:
+                        nodes[self._group_key(index[:-1])][name][str(index[-1])] = int(count)
+        return nodes
+
+    @staticmethod
+    def _group_key(group):
+        """Turns a groupby key into a (state, district-or-None) node key."""
+        if not isinstance(group, tuple):
+            group = (group,)
+        return (group[0], group[1] if len(group) > 1 else None)
+
+    def _sync(self):
+        """Rebuilds the summaries if the dataset store moved to a new version."""
+        df = self.store.frame()
+        version = self.store.version
+        if self._version == version:
+            return
+        with self._lock:
+            if self._version != version:
+                self._nodes = self._rebuild(df)
+                self._version = version
+
+    def summary(self, state=None, district=None):
+        """
+        Counts for the whole country, a state, or one district of a state.
+
+        Returns None if the requested state/district has no records.
+        """
+        self._sync()
+        key = (partition_name(state) if state else None, partition_name(district) if district else None)
+        nodes = self._nodes
+        return nodes[key] if key in nodes else None
+
+    def add(self, new_df, store_version):
+        """
+        Adds freshly ingested rows to the counts.
+
+        ``store_version`` is the dataset store version that already contains
+        the rows; if the cache was not in step with the version before it, it
+        is rebuilt on the next read instead.
+        """
+        with self._lock:
+            if self._version != store_version - 1:
+                return
+            dates = pd.to_datetime(new_df['Date'], errors='coerce')
+            values = {name: new_df[column].tolist() for name, column in COUNTED_COLUMNS.items()}
+            values['time'] = time_labels(new_df['Time']).tolist()
+            for position, date in enumerate(dates):
+                for key in _node_keys(values['states'][position], values['districts'][position]):
+                    node = self._nodes[key]
+                    node.total += 1
+                    if not pd.isna(date):
+                        node['months'][str(date.to_period('M'))] += 1
+                    for name, column_values in values.items():
+                        if not pd.isna(column_values[position]):
+                            node[name][str(column_values[position])] += 1
+            self._version = store_version
+
+
+_aggregates = None
+_aggregates_lock = threading.Lock()
+
+
+def get_aggregates():
+    """
+    Returns the process-wide AggregateCache, creating it on first use, or the
+    SQL-backed equivalent in the database storage mode.
+    """
+    from .report_queries import database_storage, get_report_aggregates
+
+    if database_storage():
+        return get_report_aggregates()
+    global _aggregates
+    if _aggregates is None:
+        with _aggregates_lock:
+            if _aggregates is None:
+                _aggregates = AggregateCache()
+    return _aggregates
@@ -0,0 +1,221 @@
+# analyzer/utils/benchmark.py
+
+"""
+Benchmarks for the dashboard, state and district pages.
+
+Synthetic datasets in the all_india.csv schema (with their state and
+district partitions) are generated at a given number of rows. Each dataset
+is then served by a fresh process, so memory is measured per size: the
+views are driven through Django's test client by a growing number of
+concurrent clients, recording latency percentiles, response bytes and the
+process's peak RSS. Results can be stored as a baseline and later runs
+compared against it. See ``manage.py benchmark_views``.
+"""
+
+import json
+import os
+import re
+import resource
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from analyzer.ml.code_maps import (
+    accident_severity_map, light_conditions_map, road_type_map, weather_conditions_map,
+)
+
+from .dataset_store import partition_name
+from .partitioner import partition_dataset
+from .schema import MASTER_COLUMN_ORDER
+
+
+GENERATE_CHUNK_ROWS = 1000000
+BENCHMARK_STATES = 30
+BENCHMARK_DISTRICTS = 20
+# Metrics compared with the baseline, besides the peak RSS. The synthetic
+# datasets are seeded, so response bytes only grow when a page does.
+COMPARED_METRICS = ('p50_ms', 'p95_ms', 'p99_ms', 'response_bytes')
+
+
+def parse_size(text):
+    """'10k' -> 10000, '1M' -> 1000000."""
+    match = re.fullmatch(r'(\d+(?:\.\d+)?)([kKmM]?)', text.strip())
+    if not match:
+        raise ValueError(f"Not a dataset size: {text!r}")
+    number, unit = float(match.group(1)), match.group(2).lower()
+    return int(number * {'': 1, 'k': 1000, 'm': 1000000}[unit])
+
+
+def size_label(rows):
+    if rows >= 1000000 and rows % 1000000 == 0:
+        return f'{rows // 1000000}M'
+    if rows >= 1000 and rows % 1000 == 0:
+        return f'{rows // 1000}k'
+    return str(rows)
+
+
+def benchmark_state(number):
+    return f'Bench State {number:02d}'
+
+
+def benchmark_district(number):
+    return f'Bench District {number:02d}'
+
+
+def _chunk(start, rows, rng):
+    """``rows`` synthetic accidents with ids from ``start`` on."""
+    states = rng.integers(0, BENCHMARK_STATES, rows)
+    districts = rng.integers(0, BENCHMARK_DISTRICTS, rows)
+    # States on a 6 x 5 grid over India, districts on a 5 x 4 grid inside them.
+    latitudes = 9 + (states // 5) * 4 + (districts // 4) * 0.8 + rng.random(rows) * 0.8
+    longitudes = 70 + (states % 5) * 5 + (districts % 4) * 1.25 + rng.random(rows) * 1.25
+    days = rng.integers(0, 5 * 365, rows)
+    minutes = rng.integers(0, 24 * 60, rows)
+
+    def pick(code_map):
+        labels = np.array(sorted(set(code_map.values())), dtype=object)
+        return labels[rng.integers(0, len(labels), rows)]
+
+    return pd.DataFrame({
+        'Accident_Index': np.arange(start, start + rows),
+        'Date': (np.datetime64('2016-01-01') + days.astype('timedelta64[D]')).astype(str),
+        'Time': [f'{minute // 60:02d}:{minute % 60:02d}' for minute in minutes.tolist()],
+        'latitude': latitudes.round(6),
+        'longitude': longitudes.round(6),
+        'Accident_Severity': pick(accident_severity_map),
+        'Number_of_Vehicles': rng.integers(1, 5, rows),
+        'Number_of_Casualties': rng.integers(1, 4, rows),
+        'Road_Type': pick(road_type_map),
+        'Weather_Conditions': pick(weather_conditions_map),
+        'Light_Conditions': pick(light_conditions_map),
+        'State': np.array([benchmark_state(number + 1) for number in range(BENCHMARK_STATES)], dtype=object)[states],
+        'District': np.array(
+            [benchmark_district(number + 1) for number in range(BENCHMARK_DISTRICTS)], dtype=object
+        )[districts],
+    })[MASTER_COLUMN_ORDER]
+
+
+def generate_dataset(rows, data_dir, seed=0, log=print):
+    """
+    Writes ``rows`` synthetic accidents to ``data_dir``/all_india.csv and
+    partitions them into states/ and districts/. An existing dataset of the
+    same size is reused.
+    """
+    marker = os.path.join(data_dir, 'benchmark.json')
+    try:
+        with open(marker, encoding='utf-8') as handle:
+            if json.load(handle) == {'rows': rows, 'seed': seed}:
+                return data_dir
+    except (FileNotFoundError, json.JSONDecodeError):
+        pass
+
+    started = time.perf_counter()
+    os.makedirs(data_dir, exist_ok=True)
+    india_path = os.path.join(data_dir, 'all_india.csv')
+    rng = np.random.default_rng(seed)
+    for start in range(0, rows, GENERATE_CHUNK_ROWS):
+        chunk = _chunk(start + 1, min(GENERATE_CHUNK_ROWS, rows - start), rng)
+        chunk.to_csv(india_path, mode='w' if start == 0 else 'a', header=start == 0, index=False)
+    partition_dataset(india_path, data_dir, log=lambda message: None)
+    with open(marker, 'w', encoding='utf-8') as handle:
+        json.dump({'rows': rows, 'seed': seed}, handle)
+    log(f"🧪 Generated {size_label(rows)} rows in {time.perf_counter() - started:.1f}s")
+    return data_dir
+
+
+def benchmark_urls():
+    """View name -> URL benchmarked on the synthetic data."""
+    state, district = partition_name(benchmark_state(1)), partition_name(benchmark_district(1))
+    return {
+        'dashboard_page': '/',
+        'state_page': f'/state/{state}/',
+        'district_page': f'/state/{state}/district/{district}/',
+    }
+
+
+def peak_rss_mb():
+    """Peak resident set size of this process in MiB (ru_maxrss is in KiB on Linux)."""
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def measure(url, concurrency, requests):
+    """
+    Sends ``requests`` GETs for ``url`` from ``concurrency`` test clients at
+    once; returns latency percentiles, throughput and response bytes.
+    """
+    from django.test import Client
+
+    def client_run(count):
+        client = Client()
+        timings, sizes = [], []
+        for _ in range(count):
+            started = time.perf_counter()
+            response = client.get(url)
+            timings.append((time.perf_counter() - started) * 1000)
+            sizes.append(len(response.content))
+            if response.status_code != 200:
+                raise RuntimeError(f"GET {url} returned {response.status_code}")
+        return timings, sizes
+
+    shares = [requests // concurrency + (1 if index < requests % concurrency else 0) for index in range(concurrency)]
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        results = list(pool.map(client_run, [share for share in shares if share]))
+    wall = time.perf_counter() - started
+    timings = np.array([timing for result in results for timing in result[0]])
+    sizes = [size for result in results for size in result[1]]
+    return {
+        'requests': len(timings),
+        'p50_ms': round(float(np.percentile(timings, 50)), 2),
+        'p95_ms': round(float(np.percentile(timings, 95)), 2),
+        'p99_ms': round(float(np.percentile(timings, 99)), 2),
+        'requests_per_second': round(len(timings) / wall, 1),
+        'response_bytes': int(np.mean(sizes)),
+    }
+
+
+def run_views(concurrency_levels, requests):
+    """Benchmarks every view in this process (whose DATA_DIR is the dataset)."""
+    from django.test import Client
+
+    results = {}
+    for view, url in benchmark_urls().items():
+        # The first request loads the data and fills the caches.
+        started = time.perf_counter()
+        response = Client().get(url)
+        cold_ms = round((time.perf_counter() - started) * 1000, 2)
+        if response.status_code != 200:
+            raise RuntimeError(f"GET {url} returned {response.status_code}")
+        results[view] = {
+            'cold_ms': cold_ms,
+            'concurrency': {str(level): measure(url, level, requests) for level in concurrency_levels},
+        }
+    return {'views': results, 'peak_rss_mb': round(peak_rss_mb(), 1)}
+
+
+def compare(results, baseline, tolerance):
+    """
+    Regressions of ``results`` against ``baseline``: latencies, response
+    bytes or peak RSS more than ``tolerance`` (a fraction) above the
+    baseline. Sizes, views or concurrency levels missing from the baseline
+    are not compared.
+    """
+    regressions = []
+
+    def check(name, value, reference):
+        if reference and value > reference * (1 + tolerance):
+            regressions.append(f"{name}: {value} vs baseline {reference} (+{(value / reference - 1) * 100:.0f}%)")
+
+    for size, result in results.items():
+        reference = baseline.get(size)
+        if not reference:
+            continue
+        check(f"{size} peak_rss_mb", result['peak_rss_mb'], reference.get('peak_rss_mb'))
+        for view, view_result in result['views'].items():
+            for level, metrics in view_result['concurrency'].items():
+                reference_metrics = reference.get('views', {}).get(view, {}).get('concurrency', {}).get(level, {})
+                for metric in COMPARED_METRICS:
+                    check(f"{size} {view} c={level} {metric}", metrics[metric], reference_metrics.get(metric))
+    return regressions
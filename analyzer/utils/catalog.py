@@ -0,0 +1,194 @@
+# analyzer/utils/catalog.py
+
+"""
+In-memory catalog of the state and district partitions.
+
+The state list is rendered on every page (context processor) and the submit
+and district pages list the district directories as well; each of those used
+to be an ``os.listdir`` per request. The catalog lists the partitions once and
+only rescans when the modification time of one of the partition directories
+changes, which is checked at most once per CHECK_INTERVAL. Per-partition
+details (row count, bounding box, file mtime) are computed from the dataset
+store on first use and recomputed when the store version changes.
+
+In the database storage mode (see utils/report_queries.py) there are no
+partition directories to list; the catalog lists the states and districts
+of the rows the store holds and follows its version instead.
+"""
+
+import os
+import threading
+import time
+
+from django.conf import settings
+
+from .columnar import list_partitions, partition_file
+from .dataset_store import CHECK_INTERVAL, get_store, partition_keys, partition_name
+from .report_queries import database_storage
+
+
+def _mtime(path):
+    try:
+        return os.stat(path).st_mtime_ns
+    except FileNotFoundError:
+        return None
+
+
+class Catalog:
+    """Partition names per state and, on demand, their row counts and extents."""
+
+    def __init__(self, store=None, data_dir=None):
+        self.store = store or get_store()
+        self.data_dir = data_dir or self.store.data_dir
+        self._lock = threading.Lock()
+        # {state: [district, ...]} from the last scan and the directory mtimes it saw.
+        self._listing = {}
+        self._signature = None
+        self._last_check = 0.0
+        # {(state, district|None): info} for the store version it was built from.
+        self._details = {}
+        self._details_key = None
+
+    # --- Listing ---
+
+    def _directories(self):
+        """The directories whose mtime changes when a partition is added or removed."""
+        districts_path = os.path.join(self.data_dir, 'districts')
+        directories = [os.path.join(self.data_dir, 'states'), districts_path]
+        directories += [os.path.join(districts_path, state) for state in self._listing]
+        return directories
+
+    def _scan(self):
+        listing = {}
+        try:
+            states = list_partitions(os.path.join(self.data_dir, 'states'))
+        except FileNotFoundError:
+            states = []
+        for state in states:
+            try:
+                listing[state] = list_partitions(os.path.join(self.data_dir, 'districts', state))
+            except FileNotFoundError:
+                listing[state] = []
+        return listing
+
+    def _sync(self):
+        now = time.monotonic()
+        if self._signature is not None and now - self._last_check < CHECK_INTERVAL:
+            return
+        with self._lock:
+            self._last_check = now
+            if database_storage():
+                listing = self.store.scopes()
+                signature = ('database', self.store.version)
+                if signature != self._signature:
+                    self._listing, self._signature = listing, signature
+                    self._details_key = None
+                return
+            signature = tuple(_mtime(path) for path in self._directories())
+            if signature == self._signature:
+                return
+            self._listing = self._scan()
+            # Rescanning can add state directories to watch.
+            self._signature = tuple(_mtime(path) for path in self._directories())
+            self._details_key = None
+
+    def invalidate(self):
+        """Forces a rescan on next use, e.g. after this process wrote new partitions."""
+        with self._lock:
+            self._signature = None
+            self._details_key = None
+
+    def states(self):
+        """Sorted state partition names."""
+        self._sync()
+        return list(self._listing)
+
+    def districts(self, state):
+        """Sorted district partition names of a state (empty if unknown)."""
+        self._sync()
+        return list(self._listing.get(partition_name(state), []))
+
+    def districts_by_state(self):
+        self._sync()
+        return {state: list(districts) for state, districts in self._listing.items()}
+
+    # --- Details ---
+
+    def _build_details(self, df):
+        details = {}
+        if df is not None:
+            keys = df[['latitude', 'longitude']].assign(
+                state=partition_keys(df['State']),
+                district=partition_keys(df['District']),
+            )
+            aggregations = {
+                'rows': ('latitude', 'size'),
+                'south': ('latitude', 'min'), 'north': ('latitude', 'max'),
+                'west': ('longitude', 'min'), 'east': ('longitude', 'max'),
+            }
+            by_state = keys.groupby('state', sort=False).agg(**aggregations)
+            by_district = keys.groupby(['state', 'district'], sort=False).agg(**aggregations)
+            for key, row in by_state.iterrows():
+                details[(key, None)] = row
+            for key, row in by_district.iterrows():
+                details[key] = row
+
+        info = {}
+        for state, districts in self._listing.items():
+            state_base = os.path.join(self.data_dir, 'states', state)
+            info[(state, None)] = self._info(state, details.get((state, None)), state_base)
+            for district in districts:
+                district_base = os.path.join(self.data_dir, 'districts', state, district)
+                info[(state, district)] = self._info(district, details.get((state, district)), district_base)
+        return info
+
+    @staticmethod
+    def _info(name, row, base_path):
+        path = partition_file(base_path)
+        mtime = _mtime(path) if path else None
+        bbox = None
+        if row is not None and row['south'] == row['south']:  # NaN if no coordinates
+            bbox = [float(row['south']), float(row['west']), float(row['north']), float(row['east'])]
+        return {
+            'name': name,
+            'rows': int(row['rows']) if row is not None else 0,
+            'bbox': bbox,
+            'mtime': mtime / 1e9 if mtime is not None else None,
+        }
+
+    def _detail(self, key):
+        self._sync()
+        df = self.store.frame()
+        with self._lock:
+            details_key = (self._signature, self.store.version)
+            if details_key != self._details_key:
+                self._details = self._build_details(df)
+                self._details_key = details_key
+            return self._details.get(key)
+
+    def state(self, state):
+        """
+        {'name', 'rows', 'bbox', 'mtime'} of a state partition, or None.
+
+        ``bbox`` is [south, west, north, east] of its accidents (None without
+        coordinates); ``mtime`` is the partition file's, in epoch seconds.
+        """
+        return self._detail((partition_name(state), None))
+
+    def district(self, state, district):
+        """Same as state() for one district partition."""
+        return self._detail((partition_name(state), partition_name(district)))
+
+
+_catalog = None
+_catalog_lock = threading.Lock()
+
+
+def get_catalog():
+    """Returns the process-wide Catalog, creating it on first use."""
+    global _catalog
+    if _catalog is None:
+        with _catalog_lock:
+            if _catalog is None:
+                _catalog = Catalog()
+    return _catalog
@@ -0,0 +1,159 @@
+# analyzer/utils/cluster_accidents.py
+
+"""
+Offline retraining engine for the hotspot DBSCAN models.
+
+Instead of one national fit, the dataset is partitioned by state and one
+haversine DBSCAN model is fitted per state on a process pool, so the fits run
+on all cores at once. Each state's model is saved, with the ids of the
+accidents it was fitted on, as a new numbered version under
+``analyzer/models/states/<State>/`` and a manifest records the current
+version, timing and cluster statistics of every run. The district pages take
+their hotspot labels from the published models (see HotspotIndex).
+
+The process pool is for the management commands. The background job only
+retrains the states that received submissions and fits them in the worker's
+own process (``workers=1``), so no processes are forked from a web server.
+"""
+
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+from django.conf import settings
+
+from .atomic import atomic_dump, atomic_write_text
+from .dataset_store import get_store, partition_keys, partition_name
+from .locks import file_lock
+from .hotspots import (
+    HOTSPOT_EPS_METRES, HOTSPOT_MIN_SAMPLES, VERSION_PATTERN, build_model, load_manifest, manifest_path,
+    models_dir, to_radians,
+)
+
+
+# How many model versions to keep per state.
+KEEP_VERSIONS = getattr(settings, 'CLUSTER_KEEP_VERSIONS', 3)
+
+
+def _lock_path(directory):
+    """The lock serializing version numbering, pruning and the manifest of a models directory."""
+    return os.path.join(directory, '.lock')
+
+
+def _versions(state_dir):
+    try:
+        names = os.listdir(state_dir)
+    except FileNotFoundError:
+        return []
+    return sorted(int(match.group(1)) for match in map(VERSION_PATTERN.match, names) if match)
+
+
+def _fit_state(state, accidents, latitudes, longitudes, state_dir, eps_metres, min_samples):
+    """
+    Fits and saves one state's model, in a worker process or in-process.
+
+    Returns the state's stats for the run manifest.
+    """
+    started = time.perf_counter()
+    model = build_model(eps_metres, min_samples)
+    model.fit(to_radians(latitudes, longitudes))
+
+    # Concurrent runs (a command and the background job, or two workers) would
+    # otherwise pick the same next version and overwrite each other's model.
+    with file_lock(_lock_path(os.path.dirname(state_dir))):
+        existing = _versions(state_dir)
+        version = (existing[-1] + 1) if existing else 1
+        atomic_dump({'model': model, 'accidents': accidents}, os.path.join(state_dir, f'v{version:04d}.joblib'))
+        for old in existing[:max(len(existing) + 1 - KEEP_VERSIONS, 0)]:
+            try:
+                os.remove(os.path.join(state_dir, f'v{old:04d}.joblib'))
+            except FileNotFoundError:
+                pass
+
+    labels = model.labels_
+    return {
+        'state': state,
+        'version': version,
+        'points': int(len(labels)),
+        'clusters': int(labels.max()) + 1 if len(labels) else 0,
+        'noise': int((labels == -1).sum()),
+        'seconds': round(time.perf_counter() - started, 3),
+    }
+
+
+def retrain_dbscan(states=None, workers=None, eps_metres=None, min_samples=None):
+    """
+    Retrains the per-state DBSCAN models in parallel.
+
+    ``states`` limits the run to some states (partition names or display
+    names); by default every state is retrained. With ``workers=1`` the states
+    are fitted one after the other in this process. Returns the run summary
+    that is also written to the manifest.
+    """
+    started = time.perf_counter()
+    eps_metres = eps_metres or HOTSPOT_EPS_METRES
+    min_samples = min_samples or HOTSPOT_MIN_SAMPLES
+
+    df = get_store().frame()
+    partitions = []
+    if df is not None:
+        coords = df[['Accident_Index', 'State', 'latitude', 'longitude']].dropna(
+            subset=['State', 'latitude', 'longitude']
+        )
+        state_keys = partition_keys(coords['State'])
+        wanted = {partition_name(state) for state in states} if states else None
+        for state, rows in coords.groupby(state_keys.to_numpy(), sort=False):
+            if wanted is None or state in wanted:
+                partitions.append((
+                    state, rows['Accident_Index'].to_numpy(dtype=np.float64, na_value=np.nan),
+                    rows['latitude'].to_numpy(), rows['longitude'].to_numpy(),
+                ))
+    # Largest states first so the pool isn't left waiting on one big fit at the end.
+    partitions.sort(key=lambda partition: len(partition[1]), reverse=True)
+    fits = [
+        (state, accidents, latitudes, longitudes, os.path.join(models_dir(), state), eps_metres, min_samples)
+        for state, accidents, latitudes, longitudes in partitions
+    ]
+
+    workers = workers or os.cpu_count() or 1
+    if workers == 1:
+        results = [_fit_state(*fit) for fit in fits]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = [pool.submit(_fit_state, *fit) for fit in fits]
+            results = [future.result() for future in as_completed(futures)]
+    for result in results:
+        result['path'] = os.path.relpath(
+            os.path.join(models_dir(), result['state'], f"v{result['version']:04d}.joblib"), settings.BASE_DIR
+        )
+    results.sort(key=lambda result: result['state'])
+
+    # The manifest is read, updated and rewritten under the same lock, so
+    # concurrent runs don't drop each other's states.
+    with file_lock(_lock_path(models_dir())):
+        manifest = load_manifest()
+        manifest['runs'] = manifest.get('runs', 0) + 1
+        for result in results:
+            # Keep the entry of a newer version saved by a run that finished first.
+            published = manifest['states'].get(result['state'], {})
+            if result['version'] >= published.get('version', 0):
+                manifest['states'][result['state']] = result
+        fit_seconds = sum(result['seconds'] for result in results)
+        wall_seconds = time.perf_counter() - started
+        manifest['last_run'] = {
+            'run': manifest['runs'],
+            'finished_at': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'eps_metres': eps_metres,
+            'min_samples': min_samples,
+            'workers': workers,
+            'states': len(results),
+            'points': sum(result['points'] for result in results),
+            'clusters': sum(result['clusters'] for result in results),
+            'noise': sum(result['noise'] for result in results),
+            'fit_seconds': round(fit_seconds, 3),
+            'wall_seconds': round(wall_seconds, 3),
+        }
+        atomic_write_text(json.dumps(manifest, indent=2), manifest_path())
+    return {'summary': manifest['last_run'], 'states': results}
@@ -0,0 +1,193 @@
+# analyzer/utils/columnar.py
+
+"""
+Typed columnar storage (Arrow Feather) for the data partitions.
+
+Each partition under ``data/`` can be stored as ``<name>.feather`` next to
+(or instead of) ``<name>.csv``. Feather files keep the column types (float32
+coordinates, parsed dates, dictionary-encoded text), are uncompressed so they
+can be memory-mapped, and skip CSV parsing and type inference entirely.
+Readers prefer the Feather file of a partition when it exists.
+
+A Feather file can't be appended to, and rewriting it for every flushed
+batch of submissions made each append cost as much as the whole partition.
+Appended rows are now written as numbered fragments
+(``.<name>.fragments/000001.feather``) that are read together with the
+file. Once a partition has FEATHER_COMPACT_FRAGMENTS fragments they are
+compacted into the file. The file's metadata records the last fragment it
+contains, so a compaction interrupted before the fragments are deleted
+doesn't duplicate rows. Appending also touches the file, so readers that
+watch a partition's modification time see the new rows.
+
+pyarrow is optional: without it everything keeps using the CSV files.
+"""
+
+import os
+import tempfile
+
+import pandas as pd
+from django.conf import settings
+
+try:
+    import pyarrow as pa
+    import pyarrow.feather as feather
+except ImportError:  # pragma: no cover - depends on the environment
+    pa = feather = None
+
+
+PARTITION_EXTENSIONS = ('.feather', '.csv')
+
+# Fragments a Feather partition collects before they are compacted into it.
+FEATHER_COMPACT_FRAGMENTS = getattr(settings, 'FEATHER_COMPACT_FRAGMENTS', 16)
+
+# Schema metadata key: the sequence number of the last fragment in the file.
+COMPACTED_KEY = b'analyzer.compacted_through'
+
+
+def columnar_available():
+    return feather is not None
+
+
+def partition_file(base_path):
+    """
+    The file backing a partition, given its path without extension.
+
+    Prefers the Feather file when pyarrow is installed; returns None if the
+    partition has no file at all.
+    """
+    for extension in PARTITION_EXTENSIONS:
+        if extension == '.feather' and not columnar_available():
+            continue
+        path = base_path + extension
+        if os.path.exists(path):
+            return path
+    return None
+
+
+def list_partitions(directory):
+    """Sorted partition names (file names without extension) in a directory."""
+    names = set()
+    for name in os.listdir(directory):
+        base, extension = os.path.splitext(name)
+        if extension in PARTITION_EXTENSIONS and not base.startswith('.'):
+            names.add(base)
+    return sorted(names)
+
+
+def fragments_dir(feather_path):
+    """The directory holding the rows appended to a Feather partition."""
+    directory, name = os.path.split(feather_path)
+    return os.path.join(directory, f".{name[:-len('.feather')]}.fragments")
+
+
+def _fragments(feather_path):
+    """[(sequence, path)] of a Feather partition's fragment files, oldest first."""
+    directory = fragments_dir(feather_path)
+    try:
+        names = os.listdir(directory)
+    except FileNotFoundError:
+        return []
+    fragments = []
+    for name in names:
+        stem, extension = os.path.splitext(name)
+        if extension == '.feather' and stem.isdigit():
+            fragments.append((int(stem), os.path.join(directory, name)))
+    return sorted(fragments)
+
+
+def _schema(feather_path):
+    with pa.memory_map(feather_path) as source:
+        return pa.ipc.open_file(source).schema
+
+
+def _compacted_through(schema):
+    return int((schema.metadata or {}).get(COMPACTED_KEY, b'0'))
+
+
+def read_partition(path, **csv_kwargs):
+    """
+    Reads a Feather (memory-mapped) or CSV partition file into a DataFrame.
+
+    A Feather partition is read with its fragments. ``to_pandas()`` copies
+    the mapped columns into pandas blocks; that copy is accepted, since the
+    dataset store reads the partitions only when it (re)loads and then
+    shares one typed frame between the workers (see snapshots.py).
+    """
+    if path.endswith('.feather'):
+        table = feather.read_table(path, memory_map=True)
+        compacted = _compacted_through(table.schema)
+        frames = [table.to_pandas()] + [
+            feather.read_table(fragment, memory_map=True).to_pandas()
+            for sequence, fragment in _fragments(path) if sequence > compacted
+        ]
+        if len(frames) == 1:
+            return frames[0]
+        from .schema import concat
+        return concat(frames)
+    return pd.read_csv(path, **csv_kwargs)
+
+
+def _write_table(table, path):
+    directory = os.path.dirname(path)
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.tmp-', suffix='.feather')
+    os.close(fd)
+    try:
+        feather.write_feather(table, tmp_path, compression='uncompressed')
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def write_feather(df, path):
+    """
+    Writes ``df``, the whole partition, as an uncompressed Feather file,
+    atomically, and removes the fragments it supersedes.
+    """
+    fragments = _fragments(path)
+    table = pa.Table.from_pandas(df.reset_index(drop=True), preserve_index=False)
+    metadata = dict(table.schema.metadata or {})
+    metadata[COMPACTED_KEY] = str(fragments[-1][0] if fragments else 0).encode()
+    _write_table(table.replace_schema_metadata(metadata), path)
+    for _, fragment in fragments:
+        os.remove(fragment)
+    if fragments:
+        try:
+            os.rmdir(fragments_dir(path))
+        except OSError:
+            pass
+
+
+def append_partition(new_df, base_path):
+    """
+    Appends rows to every file of a partition.
+
+    The CSV (if any) is appended to in place; the Feather file (if any) gets
+    a new fragment, or is compacted with its fragments and the new rows once
+    it has FEATHER_COMPACT_FRAGMENTS of them. If the partition has no file
+    yet a CSV with a header is created.
+    """
+    from .schema import coerce_types, concat
+
+    csv_path, feather_path = base_path + '.csv', base_path + '.feather'
+    os.makedirs(os.path.dirname(base_path), exist_ok=True)
+    wrote = False
+    if columnar_available() and os.path.exists(feather_path):
+        schema = _schema(feather_path)
+        compacted = _compacted_through(schema)
+        fragments = _fragments(feather_path)
+        new_rows = coerce_types(new_df.copy())[list(schema.names)]
+        if sum(sequence > compacted for sequence, _ in fragments) + 1 >= FEATHER_COMPACT_FRAGMENTS:
+            write_feather(coerce_types(concat([read_partition(feather_path), new_rows])), feather_path)
+        else:
+            sequence = max([compacted, *(sequence for sequence, _ in fragments)]) + 1
+            _write_table(
+                pa.Table.from_pandas(new_rows.reset_index(drop=True), preserve_index=False),
+                os.path.join(fragments_dir(feather_path), f'{sequence:06d}.feather'),
+            )
+            os.utime(feather_path)
+        wrote = True
+    if os.path.exists(csv_path) or not wrote:
+        new_df.to_csv(csv_path, mode='a', header=not os.path.exists(csv_path), index=False)
@@ -0,0 +1,98 @@
+# analyzer/utils/conditional.py
+
+"""
+Conditional GET (ETag / Last-Modified) for the pages and data endpoints.
+
+Every navigation used to re-download the full dashboard, map and data
+payloads. Views decorated with ``dataset_conditional`` send an ETag built
+from the data version of the scope they show (the dataset store's per
+country/state/district digest, which changes only when that scope gets new
+rows) and the scope's modification time, with ``Cache-Control: no-cache`` so
+clients revalidate. A repeat request with a matching If-None-Match or
+If-Modified-Since gets an empty ``304 Not Modified`` without the view
+running.
+
+Pages also show who is logged in and the flash messages, so their ETag
+includes the user, they vary on Cookie, and they only use the ETag (a
+modification time can't tell one user's page from another's). A page
+request with messages waiting to be shown skips the conditional and is
+rendered in full.
+"""
+
+import hashlib
+import json
+from datetime import datetime, timezone
+from functools import wraps
+
+from django.conf import settings
+from django.utils.cache import patch_cache_control, patch_vary_headers
+from django.views.decorators.http import condition
+
+from .catalog import get_catalog
+from .dataset_store import get_store
+
+
+# Change to invalidate every ETag, e.g. when templates change on deploy.
+RESPONSE_ETAG_SALT = getattr(settings, 'RESPONSE_ETAG_SALT', '')
+
+
+def dataset_conditional(scope, page=False):
+    """
+    Decorator adding ETag/Last-Modified validators and 304 responses to a view.
+
+    ``scope(request, *args, **kwargs)`` returns the (state, district) the
+    response depends on; (None, None) for the whole country. Pages
+    (``page=True``) also depend on the list of states in the navigation,
+    the user and the queued messages.
+    """
+    def _scope(request, args, kwargs):
+        state, district = scope(request, *args, **kwargs)
+        return state or None, (district or None) if state else None
+
+    def etag(request, *args, **kwargs):
+        state, district = _scope(request, args, kwargs)
+        parts = [
+            RESPONSE_ETAG_SALT, request.path, request.GET.urlencode(), request.META.get('HTTP_ACCEPT', ''),
+            get_store().digest(state, district),
+        ]
+        if page:
+            user = getattr(request, 'user', None)
+            parts.append(get_catalog().states())
+            parts.append(user.pk if user is not None and user.is_authenticated else None)
+        return hashlib.sha1(json.dumps(parts, default=str).encode('utf-8')).hexdigest()
+
+    def last_modified(request, *args, **kwargs):
+        timestamp = get_store().last_modified(*_scope(request, args, kwargs))
+        return None if timestamp is None else datetime.fromtimestamp(timestamp, tz=timezone.utc)
+
+    def decorator(view):
+        conditional_view = condition(etag_func=etag, last_modified_func=None if page else last_modified)(view)
+
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if page and _has_messages(request):
+                response = view(request, *args, **kwargs)
+            else:
+                response = conditional_view(request, *args, **kwargs)
+            if request.method in ('GET', 'HEAD'):
+                patch_cache_control(response, no_cache=True)
+                patch_vary_headers(response, ['Accept', 'Cookie'] if page else ['Accept'])
+            return response
+        return wrapper
+    return decorator
+
+
+def _has_messages(request):
+    """Whether messages are waiting to be shown (without marking them as shown)."""
+    storage = getattr(request, '_messages', None)
+    return storage is not None and len(storage) > 0
+
+
+def query_scope(request, *args, **kwargs):
+    """Scope given by the state/district query parameters."""
+    return request.GET.get('state'), request.GET.get('district')
+
+
+def url_scope(request, state_name=None, district_name=None, **kwargs):
+    """Scope given by the state_name/district_name URL arguments."""
+    return state_name, district_name
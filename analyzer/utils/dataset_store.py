@@ -0,0 +1,529 @@
+# analyzer/utils/dataset_store.py
+
+"""
+Process-wide, already-typed copy of the accident dataset.
+
+The views used to re-parse a CSV and re-run the numeric/date coercion on every
+request. The store parses the national dataset once, keeps it typed in memory
+and serves state and district slices from that single frame. It reloads itself
+when the source files change on disk.
+
+With SHARED_DATASET (the default) the rows of the partition files are
+published as a memory-mapped snapshot (see utils/snapshots.py): worker
+processes map the snapshot of the current files instead of each parsing and
+holding their own copy. Submitted rows that are still in the ingest log are
+a per-process delta on top of the snapshot: each process adds the logged
+rows it doesn't hold yet, and the process that flushes the log to the
+partitions republishes the snapshot once per flush. The trade-off is that
+between a submission and the next flush every process holds a private copy
+of the frame (snapshot plus delta) instead of the shared one; flushes are
+batched (see utils/ingest.py), so this lasts seconds, and a submission costs
+no snapshot I/O.
+
+In the database storage mode (ACCIDENT_STORAGE = 'database', see
+utils/report_queries.py) the store loads the AccidentReport table instead of
+the partition files, so every view serves the same rows as the SQL chart
+counts. Rows inserted after a load are the delta: each process adds the rows
+with higher ids than the ones it holds, and the snapshot is republished on
+flush as in the file mode. Deleted rows make it reload the table.
+"""
+
+import os
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+from django.conf import settings
+
+from . import snapshots, wal
+from .columnar import list_partitions, partition_file, read_partition
+from .instrumentation import span
+from .schema import CSV_DTYPES, MASTER_COLUMN_ORDER, coerce_types, concat
+
+
+# How often (in seconds) the store is allowed to stat() its source files.
+CHECK_INTERVAL = 1.0
+
+
+def partition_name(name):
+    """Returns the file-system name used for a state/district partition."""
+    return str(name).strip().replace(' ', '_').replace('/', '_')
+
+
+def partition_keys(series):
+    """
+    partition_name() of every value as a Series ('nan' for missing values),
+    computed once per distinct value; the text columns are categoricals.
+    """
+    codes, uniques = pd.factorize(series)
+    names = np.array([partition_name(value) for value in uniques] + ['nan'], dtype=object)
+    return pd.Series(names[codes], index=series.index)
+
+
+def _database_storage():
+    """Whether the AccidentReport table is the source of the dataset (see the module docstring)."""
+    # Imported here: report_queries imports this module.
+    from .report_queries import database_storage
+
+    return database_storage()
+
+
+def value_counts(series):
+    """value_counts() without the zero rows categoricals report for unused categories."""
+    counts = series.value_counts()
+    return counts[counts > 0]
+
+
+class DatasetStore:
+    """
+    Holds the typed national DataFrame and its state/district indexes.
+
+    Frames handed out by ``frame()`` are shared between requests and must be
+    treated as read-only; ``state()`` and ``district()`` return fresh copies.
+    """
+
+    def __init__(self, data_dir=None):
+        self.data_dir = data_dir or settings.DATA_DIR
+        self.version = 0
+        self._lock = threading.RLock()
+        # (frame, state rows, district rows) is swapped as one tuple so a
+        # reader never pairs a new frame with stale row indexes.
+        self._snapshot = (None, {}, {})
+        self._signature = None
+        self._last_check = 0.0
+        # (version, {scope: (rows, sum of row hashes, modified)}), built on first use.
+        self._digests = None
+        # Name of the shared snapshot the frame is mapped from (see utils/snapshots.py).
+        self._snapshot_name = None
+
+    # --- Source files ---
+
+    def _source_files(self):
+        """The national dataset if present, otherwise every state partition."""
+        india_path = partition_file(os.path.join(self.data_dir, 'all_india'))
+        if india_path:
+            return [india_path]
+        states_path = os.path.join(self.data_dir, 'states')
+        try:
+            names = list_partitions(states_path)
+        except FileNotFoundError:
+            return []
+        return [partition_file(os.path.join(states_path, name)) for name in names]
+
+    def _read_signature(self, paths, pending=True):
+        """(path, mtime, size) of every source file and (with ``pending``) unflushed ingest log."""
+        signature = []
+        for path in [*paths, *(wal.wal_files(self.data_dir) if pending else [])]:
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                continue
+            signature.append((path, stat.st_mtime_ns, stat.st_size))
+        return tuple(signature)
+
+    # --- Loading ---
+
+    def _load(self, paths, pending=True):
+        """The typed rows of ``paths`` and (with ``pending``) of the ingest log."""
+        frames = []
+        with span('csv_load'):
+            for path in paths:
+                try:
+                    frames.append(read_partition(path, dtype=CSV_DTYPES, on_bad_lines='skip'))
+                except (FileNotFoundError, pd.errors.EmptyDataError):
+                    continue
+        if not frames:
+            return None
+        with span('coerce'):
+            df = coerce_types(concat(frames))
+
+        # Submitted records that are still in the ingest log; an interrupted
+        # flush may already have written some of them to the partitions.
+        records = [record for path in wal.wal_files(self.data_dir) for record in wal.read_records(path)]
+        if pending and records:
+            pending = coerce_types(pd.DataFrame(records))
+            pending = pending[~pending['Accident_Index'].isin(df['Accident_Index'])]
+            df = coerce_types(concat([df[MASTER_COLUMN_ORDER], pending[MASTER_COLUMN_ORDER]]))
+        return df[MASTER_COLUMN_ORDER].reset_index(drop=True)
+
+    def _build_indexes(self, df):
+        """Maps partition names to the row positions of each state/district."""
+        state_keys = partition_keys(df['State'])
+        district_keys = partition_keys(df['District'])
+        state_rows = state_keys.groupby(state_keys, sort=False).indices
+        district_rows = pd.Series(np.arange(len(df))).groupby(
+            [state_keys.to_numpy(), district_keys.to_numpy()], sort=False
+        ).indices
+        return state_rows, district_rows
+
+    def refresh(self, force=False):
+        """Reloads the dataset if any source file changed since the last load."""
+        now = time.monotonic()
+        if not force and self._signature is not None and now - self._last_check < CHECK_INTERVAL:
+            return
+        with self._lock:
+            self._last_check = now
+            if _database_storage():
+                self._refresh_database(force)
+                return
+            paths = self._source_files()
+            signature = self._read_signature(paths)
+            if not force and signature == self._signature:
+                return
+            if snapshots.SHARED_DATASET:
+                self._refresh_shared(paths, signature, force)
+                return
+            df = self._load(paths)
+            if df is not None:
+                self._snapshot = (df, *self._build_indexes(df))
+            else:
+                self._snapshot = (None, {}, {})
+            self._signature = signature
+            self.version += 1
+
+    # --- Shared snapshots ---
+
+    def _snapshot_dir(self):
+        return snapshots.snapshot_dir(self.data_dir)
+
+    def _use_snapshot(self, meta):
+        df, state_rows, district_rows, digests = snapshots.attach(meta)
+        self._snapshot = (df, state_rows, district_rows)
+        self._signature = tuple(tuple(entry) for entry in meta['signature'])
+        self._snapshot_name = meta['name']
+        self.version += 1
+        self._digests = (self.version, digests)
+
+    def _attach_current(self, base_signature):
+        """
+        Maps the current snapshot if it was published from partition files
+        with ``base_signature`` (a no-op if it is already mapped).
+        """
+        meta = snapshots.read_current(self._snapshot_dir())
+        if meta is None or meta['signature'] != snapshots.signature_key(base_signature):
+            return False
+        if meta['name'] == self._snapshot_name:
+            return True
+        try:
+            self._use_snapshot(meta)
+        except FileNotFoundError:
+            # Removed by a newer publish since current.json was read.
+            return False
+        return True
+
+    def _publish(self, df, state_rows, district_rows, base_signature, digests=None):
+        """Publishes ``df`` as the current snapshot and maps it. Call under the publish lock."""
+        self._signature = base_signature
+        if digests is None:
+            digests = self._build_digests(df, state_rows, district_rows)
+        meta = snapshots.publish(self._snapshot_dir(), df, state_rows, district_rows, digests, base_signature)
+        self._use_snapshot(meta)
+
+    def _refresh_shared(self, paths, signature, force):
+        """
+        Maps the snapshot of the current partition files (loading and
+        publishing it first if no process has done so yet), then adds the
+        rows of the ingest log it doesn't hold.
+        """
+        base_signature = self._read_signature(paths, pending=False)
+        if force or not self._attach_current(base_signature):
+            with snapshots.publish_lock(self._snapshot_dir()):
+                # Another process may have published while this one waited.
+                if force or not self._attach_current(base_signature):
+                    df = self._load(paths, pending=False)
+                    if df is None:
+                        self._snapshot = (None, {}, {})
+                        self._snapshot_name = None
+                        self.version += 1
+                    else:
+                        self._publish(df, *self._build_indexes(df), base_signature)
+        self._apply_pending()
+        self._signature = signature
+
+    # --- Database storage mode ---
+
+    def _refresh_database(self, force):
+        """
+        Brings the frame up to date with the AccidentReport table: maps the
+        published snapshot of it or loads and publishes it, then adds the
+        rows inserted since.
+        """
+        from .report_queries import load_frame, signature_latest, table_signature
+
+        signature = (table_signature(),)
+        if not force and signature == self._signature:
+            return
+        if not force and self._extend_from_database(signature):
+            return
+        if snapshots.SHARED_DATASET:
+            with snapshots.publish_lock(self._snapshot_dir()):
+                meta = snapshots.read_current(self._snapshot_dir())
+                if not force and meta is not None and meta['name'] != self._snapshot_name and \
+                        signature_latest(meta['signature'][0]) is not None:
+                    try:
+                        self._use_snapshot(meta)
+                    except FileNotFoundError:
+                        pass
+                    else:
+                        if self._extend_from_database(signature):
+                            return
+                df = load_frame()
+                if df is not None:
+                    self._publish(df, *self._build_indexes(df), signature)
+                    self._signature = signature
+                    return
+        else:
+            df = load_frame()
+        self._signature = signature
+        self._snapshot = (df, *self._build_indexes(df)) if df is not None else (None, {}, {})
+        self._snapshot_name = None
+        self.version += 1
+
+    def _extend_from_database(self, signature):
+        """
+        Adds the rows inserted since the frame was loaded. False if the table
+        changed otherwise (rows deleted) and has to be reloaded.
+        """
+        from .report_queries import load_frame, signature_latest
+
+        if self._snapshot[0] is None or not self._signature:
+            return False
+        held_latest, latest = signature_latest(self._signature[0]), signature_latest(signature[0])
+        if held_latest is None or latest < held_latest:
+            return False
+        new_df = load_frame(after=held_latest, through=latest)
+        new_rows = 0 if new_df is None else len(new_df)
+        if self._signature[0][2] + new_rows != signature[0][2]:
+            return False
+        if new_rows:
+            # Rows this process appended itself are already in the frame.
+            new_df = new_df[~new_df['Accident_Index'].isin(self._snapshot[0]['Accident_Index'])]
+            if not new_df.empty:
+                self._add_rows(new_df)
+        self._signature = signature
+        return True
+
+    def _apply_pending(self):
+        """Adds the logged (unflushed) submissions the frame doesn't hold yet."""
+        records = [record for path in wal.wal_files(self.data_dir) for record in wal.read_records(path)]
+        if not records:
+            return
+        pending = coerce_types(pd.DataFrame(records))[MASTER_COLUMN_ORDER]
+        df = self._snapshot[0]
+        if df is None:
+            pending = pending.reset_index(drop=True)
+            self._snapshot = (pending, *self._build_indexes(pending))
+            self.version += 1
+            return
+        pending = pending[~pending['Accident_Index'].isin(df['Accident_Index'])]
+        if not pending.empty:
+            self._add_rows(pending)
+
+    def _add_rows(self, new_df):
+        """Adds typed rows to the frame, its indexes and digests (a new version)."""
+        df, state_rows, district_rows = self._snapshot
+        combined = concat([df, new_df])
+
+        state_rows, district_rows = dict(state_rows), dict(district_rows)
+        empty = np.array([], dtype=np.intp)
+        for offset, (state, district) in enumerate(zip(new_df['State'], new_df['District'])):
+            position = len(df) + offset
+            state_key, district_key = partition_name(state), partition_name(district)
+            state_rows[state_key] = np.append(state_rows.get(state_key, empty), position)
+            district_rows[(state_key, district_key)] = np.append(
+                district_rows.get((state_key, district_key), empty), position
+            )
+
+        if self._digests is not None and self._digests[0] == self.version:
+            digests = dict(self._digests[1])
+            hashes = pd.util.hash_pandas_object(combined.iloc[len(df):], index=False).to_numpy()
+            now = time.time()
+            for row_hash, state, district in zip(hashes.tolist(), new_df['State'], new_df['District']):
+                state_key = partition_name(state)
+                for scope in (None, state_key, (state_key, partition_name(district))):
+                    rows, total, _ = digests.get(scope, (0, 0, now))
+                    digests[scope] = (rows + 1, (total + row_hash) % 2 ** 64, now)
+            self._digests = (self.version + 1, digests)
+
+        self._snapshot = (combined, state_rows, district_rows)
+        self.version += 1
+
+    def append(self, new_df):
+        """
+        Adds rows that were just written to the source files or the ingest
+        log, without a reload.
+
+        The new file signature is recorded so the next refresh() does not
+        re-parse the files. Returns the new store version.
+        """
+        with self._lock:
+            if self._snapshot[0] is None:
+                self.refresh(force=True)
+                return self.version
+            self._add_rows(coerce_types(new_df.copy())[MASTER_COLUMN_ORDER])
+            if not _database_storage():
+                self._signature = self._read_signature(self._source_files())
+            return self.version
+
+    def touch(self, flushed_ids=None):
+        """
+        Records the current file signature without reloading.
+
+        For writers in this process whose rows the store already holds;
+        ``flushed_ids`` are the Accident_Index values just moved from the
+        ingest log to the partitions. With SHARED_DATASET the frame is
+        republished as the snapshot of the new partition files, so the other
+        workers map it instead of re-parsing them. If the store doesn't hold
+        all flushed rows, the next refresh() reloads instead.
+        """
+        with self._lock:
+            if _database_storage():
+                self._touch_database()
+                return
+            signature = self._read_signature(self._source_files())
+            df, state_rows, district_rows = self._snapshot
+            if flushed_ids is not None and (df is None or not self._holds(df, flushed_ids)):
+                return
+            if snapshots.SHARED_DATASET and df is not None:
+                digests = self._digests[1] if self._digests and self._digests[0] == self.version else None
+                with snapshots.publish_lock(self._snapshot_dir()):
+                    self._publish(
+                        df, state_rows, district_rows,
+                        self._read_signature(self._source_files(), pending=False), digests,
+                    )
+            self._signature = signature
+
+    def _touch_database(self):
+        """Republishes the frame, for the rows of the table it was last synced with."""
+        df, state_rows, district_rows = self._snapshot
+        if not snapshots.SHARED_DATASET or df is None or not self._signature:
+            return
+        from .report_queries import signature_latest
+
+        if signature_latest(self._signature[0]) is None:
+            return
+        digests = self._digests[1] if self._digests and self._digests[0] == self.version else None
+        with snapshots.publish_lock(self._snapshot_dir()):
+            self._publish(df, state_rows, district_rows, self._signature, digests)
+
+    @staticmethod
+    def _holds(df, ids):
+        held = df['Accident_Index'].to_numpy(dtype='float64', na_value=np.nan)
+        return bool(np.isin(np.asarray(ids, dtype='float64'), held).all())
+
+    # --- Content digests ---
+
+    def _build_digests(self, df, state_rows, district_rows):
+        """
+        Row count, (order independent) sum of the row hashes and modification
+        time of every scope. Scopes loaded from the files get the newest file mtime.
+        """
+        modified = max((mtime for _, mtime, _ in self._signature or ()), default=time.time_ns()) / 1e9
+        hashes = pd.util.hash_pandas_object(df, index=False).to_numpy()
+        digests = {None: (len(hashes), int(hashes.sum()), modified)}
+        for scope_rows in (state_rows, district_rows):
+            for scope, rows in scope_rows.items():
+                digests[scope] = (len(rows), int(hashes[rows].sum()), modified)
+        return digests
+
+    def _scope_digest(self, state_name, district_name):
+        self.refresh()
+        with self._lock:
+            df, state_rows, district_rows = self._snapshot
+            if df is None:
+                return None
+            if self._digests is None or self._digests[0] != self.version:
+                self._digests = (self.version, self._build_digests(df, state_rows, district_rows))
+            if district_name:
+                scope = (partition_name(state_name), partition_name(district_name))
+            else:
+                scope = partition_name(state_name) if state_name else None
+            return self._digests[1].get(scope)
+
+    def digest(self, state_name=None, district_name=None):
+        """
+        A token that changes whenever the rows of the country, a state or a
+        district change (None if the scope has no data).
+
+        Unlike ``version`` it only changes for the scopes that got new rows,
+        and it is the same in every process that loaded the same data.
+        """
+        found = self._scope_digest(state_name, district_name)
+        return None if found is None else f'{found[0]}-{found[1]:016x}'
+
+    def last_modified(self, state_name=None, district_name=None):
+        """When the rows of a scope last changed (a Unix timestamp), or None if it has no data."""
+        found = self._scope_digest(state_name, district_name)
+        return None if found is None else found[2]
+
+    # --- Accessors ---
+
+    def frame(self):
+        """The full, typed national DataFrame (or None if there is no data)."""
+        self.refresh()
+        return self._snapshot[0]
+
+    def scopes(self):
+        """{state: [district, ...]} partition names of the rows held, sorted (missing names left out)."""
+        self.refresh()
+        _, state_rows, district_rows = self._snapshot
+        listing = {state: [] for state in sorted(state_rows) if state != 'nan'}
+        for state, district in district_rows:
+            if state in listing and district != 'nan':
+                listing[state].append(district)
+        return {state: sorted(districts) for state, districts in listing.items()}
+
+    def scope(self, state_name=None, district_name=None):
+        """
+        (version, frame, rows) of the country, a state or a district, read
+        from one snapshot; rows is None if the scope has no data.
+
+        frame() followed by state()/district() can straddle a refresh, so
+        callers that keep row positions into the frame take both from here.
+        """
+        self.refresh()
+        with self._lock:
+            version = self.version
+            df, state_rows, district_rows = self._snapshot
+        if df is None:
+            return version, None, None
+        if district_name:
+            rows = district_rows.get((partition_name(state_name), partition_name(district_name)))
+        elif state_name:
+            rows = state_rows.get(partition_name(state_name))
+        else:
+            return version, df, df
+        return version, df, None if rows is None else df.take(rows)
+
+    def state(self, state_name):
+        """All rows for one state, or None if the state has no data."""
+        self.refresh()
+        df, state_rows, _ = self._snapshot
+        rows = state_rows.get(partition_name(state_name))
+        if rows is None:
+            return None
+        return df.take(rows)
+
+    def district(self, state_name, district_name):
+        """All rows for one district, or None if the district has no data."""
+        self.refresh()
+        df, _, district_rows = self._snapshot
+        rows = district_rows.get((partition_name(state_name), partition_name(district_name)))
+        if rows is None:
+            return None
+        return df.take(rows)
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_store():
+    """Returns the process-wide DatasetStore, creating it on first use."""
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = DatasetStore()
+    return _store
@@ -0,0 +1,189 @@
+# analyzer/utils/executor.py
+
+"""
+Bounded worker pools and request coalescing for the async views.
+
+Every view used to be synchronous. Under ASGI Django runs all synchronous
+views of a process in one shared thread, so a single slow district
+clustering or map render held up every other request; under WSGI it tied
+up a worker thread. The analyzer's read views are now ``async`` and run
+their pandas/sklearn/folium work in one of two bounded thread pools
+(``offload(pool)``):
+
+* ``pages`` (PAGE_WORKERS threads) for the dashboard, state and district pages;
+* ``data`` (DATA_WORKERS threads) for the JSON endpoints (heat cells,
+  district points, spatial queries).
+
+Slow pages can occupy at most PAGE_WORKERS threads and never delay the data
+endpoints or the event loop.
+
+Identical concurrent requests share one computation at two levels:
+
+* ``offload(pool, share=True)`` (the data endpoints): a GET arriving while
+  the same URL is being computed for a client with the same Accept, Cookie
+  and conditional request headers waits, without holding a pool thread, and
+  gets a copy of that response;
+* ``coalesce(key, func)``: the first caller runs ``func()`` and callers
+  arriving with the same key while it runs wait for its result. The
+  expensive cacheable steps (map fragments, hotspot clustering, prepared
+  district points, spatial indexes) use it, so e.g. concurrent page views
+  of the same state render its map once. It works the same from the pools
+  and from WSGI threads.
+"""
+
+import asyncio
+import contextvars
+import os
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from functools import wraps
+
+from django.conf import settings
+from django.db import close_old_connections
+from django.http import HttpResponse
+
+from . import instrumentation
+
+
+# Threads running the page views (aggregation, map rendering, templates).
+PAGE_WORKERS = getattr(settings, 'PAGE_WORKERS', min(4, os.cpu_count() or 1))
+# Threads running the JSON data endpoints.
+DATA_WORKERS = getattr(settings, 'DATA_WORKERS', min(8, (os.cpu_count() or 1) + 4))
+
+POOL_SIZES = {'pages': PAGE_WORKERS, 'data': DATA_WORKERS}
+
+# Request headers a shared response must have been computed for.
+SHARED_RESPONSE_HEADERS = ('Accept', 'Cookie', 'If-None-Match', 'If-Modified-Since')
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def get_pool(name):
+    """Returns the process-wide pool ``name``, creating it on first use."""
+    pool = _pools.get(name)
+    if pool is None:
+        with _pools_lock:
+            pool = _pools.get(name)
+            if pool is None:
+                pool = _pools[name] = ThreadPoolExecutor(
+                    max_workers=POOL_SIZES[name], thread_name_prefix=f'analyzer-{name}'
+                )
+    return pool
+
+
+def _call(submitted, func, args, kwargs):
+    """Runs ``func`` in a pool thread with the caller's request context."""
+    instrumentation.record('queue', time.perf_counter() - submitted)
+    # Django only closes the connections of the thread a request ran in;
+    # pool threads handle their own like a request thread would.
+    close_old_connections()
+    try:
+        with instrumentation.follow_profiler():
+            return func(*args, **kwargs)
+    finally:
+        close_old_connections()
+
+
+async def run(pool, func, *args, **kwargs):
+    """Awaits ``func(*args, **kwargs)`` run in the pool ``pool``."""
+    context = contextvars.copy_context()
+    future = get_pool(pool).submit(context.run, _call, time.perf_counter(), func, args, kwargs)
+    return await asyncio.wrap_future(future)
+
+
+def _render_view(view, request, *args, **kwargs):
+    response = view(request, *args, **kwargs)
+    # Template and DRF responses render lazily; do it here rather than in the
+    # thread Django shares between synchronous code.
+    if callable(getattr(response, 'render', None)):
+        response = response.render()
+    return response
+
+
+def _copy_response(response):
+    copy = HttpResponse(
+        response.content, status=response.status_code, reason=response.reason_phrase, headers=dict(response.items())
+    )
+    copy.cookies.update(response.cookies)
+    return copy
+
+
+def offload(pool, share=False):
+    """
+    Turns a synchronous view into an async one that runs in the pool ``pool``.
+
+    With ``share``, identical concurrent GET/HEAD requests get copies of one
+    response (see the module docstring); only for views that return complete,
+    non-streaming responses.
+    """
+    def decorator(view):
+        @wraps(view)
+        async def wrapper(request, *args, **kwargs):
+            if not share or request.method not in ('GET', 'HEAD'):
+                return await run(pool, _render_view, view, request, *args, **kwargs)
+            key = (
+                'response', id(view), request.method, request.get_full_path(),
+                *(request.headers.get(name) for name in SHARED_RESPONSE_HEADERS),
+            )
+            future, leader = _join(key)
+            if leader:
+                # Shielded: the waiting requests need the result even if this
+                # client disconnects.
+                response = await asyncio.shield(
+                    run(pool, _settle, key, future, lambda: _render_view(view, request, *args, **kwargs))
+                )
+            else:
+                with instrumentation.span('coalesced'):
+                    response = await asyncio.wrap_future(future)
+            return _copy_response(response)
+        return wrapper
+    return decorator
+
+
+# --- Coalescing ---
+
+# key -> Future of the call in progress
+_calls = {}
+_calls_lock = threading.Lock()
+
+
+def _join(key):
+    """(future of the call in progress for ``key``, whether the caller has to make it)."""
+    with _calls_lock:
+        future = _calls.get(key)
+        if future is not None:
+            return future, False
+        future = _calls[key] = Future()
+        return future, True
+
+
+def _settle(key, future, func):
+    """Makes the call for ``key`` and hands its outcome to the waiting callers."""
+    try:
+        result = func()
+    except BaseException as error:
+        future.set_exception(error)
+        raise
+    else:
+        future.set_result(result)
+        return result
+    finally:
+        with _calls_lock:
+            del _calls[key]
+
+
+def coalesce(key, func):
+    """
+    ``func()``, shared with the concurrent calls that use the same ``key``.
+
+    The key must identify the result completely, including the data version
+    it is computed from. Exceptions are raised in every waiting caller.
+    """
+    future, leader = _join(key)
+    if leader:
+        return _settle(key, future, func)
+    with instrumentation.span('coalesced'):
+        return future.result()
@@ -0,0 +1,83 @@
+# analyzer/utils/fragments.py
+
+"""
+Cache of rendered page fragments (the folium map HTML).
+
+The dashboard and state pages used to build a folium map and call
+``_repr_html_()`` on every request, producing the same large HTML string
+as long as the data didn't change. Rendered fragments are now kept in
+Django's cache, keyed by (view, state, district, parameters, data version).
+The data version is the dataset store's digest of the scope, so a
+submission only changes the keys of the national map and the maps of its own
+state and district. The entries of those scopes are also deleted right away
+so they don't linger until the cache evicts them. Concurrent requests that
+miss the same fragment render it once (see utils/executor.py).
+
+The ``fragments`` cache in settings.CACHES is a local-memory LRU cache; any
+Django cache backend works, and the keys are the same in every process.
+"""
+
+import hashlib
+import json
+
+from django.conf import settings
+from django.core.cache import caches
+
+from .dataset_store import get_store, partition_name
+from .executor import coalesce
+
+
+# Django cache alias for the fragments (falls back to 'default').
+FRAGMENT_CACHE_ALIAS = getattr(settings, 'FRAGMENT_CACHE_ALIAS', 'fragments')
+# Most keys remembered per scope for invalidation.
+SCOPE_KEYS = 64
+
+
+def _cache():
+    return caches[FRAGMENT_CACHE_ALIAS if FRAGMENT_CACHE_ALIAS in settings.CACHES else 'default']
+
+
+def _scope(state=None, district=None):
+    return ':'.join(partition_name(name) for name in (state, district) if name) or '*'
+
+
+def fragment_key(view, state=None, district=None, **params):
+    """Cache key of a fragment for the current data of its scope."""
+    version = get_store().digest(state, district)
+    raw = json.dumps([view, _scope(state, district), version, sorted(params.items())], default=str)
+    return f'fragment:{view}:{hashlib.sha1(raw.encode("utf-8")).hexdigest()}'
+
+
+def cached_fragment(view, render, state=None, district=None, **params):
+    """
+    The fragment of ``view`` for the scope and ``params``, calling
+    ``render()`` to build it if it isn't cached for the current data.
+    """
+    cache = _cache()
+    key = fragment_key(view, state, district, **params)
+    html = cache.get(key)
+    if html is None:
+        html = coalesce(key, lambda: _render(cache, key, render, _scope(state, district)))
+    return html
+
+
+def _render(cache, key, render, scope):
+    html = render()
+    cache.set(key, html, None)
+    index_key = f'fragment-keys:{scope}'
+    keys = [known for known in cache.get(index_key, []) if known != key][-(SCOPE_KEYS - 1):]
+    cache.set(index_key, [*keys, key], None)
+    return html
+
+
+def invalidate_fragments(state=None, district=None):
+    """Deletes the cached fragments of the country, ``state`` and ``district``."""
+    cache = _cache()
+    scopes = {'*'}
+    if state:
+        scopes.add(_scope(state))
+        if district:
+            scopes.add(_scope(state, district))
+    index_keys = [f'fragment-keys:{scope}' for scope in scopes]
+    keys = [key for keys in cache.get_many(index_keys).values() for key in keys]
+    cache.delete_many([*keys, *index_keys])
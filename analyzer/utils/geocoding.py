@@ -0,0 +1,232 @@
+# analyzer/utils/geocoding.py
+
+"""
+Point-in-polygon lookup of the state and district of coordinates.
+
+The enrichment scripts used to build one shapely Point per row in a Python
+loop before a geopandas spatial join. Here points are created in one
+vectorized call and matched against the district (``2011_Dist``) and state
+(``Admin2``) polygons through an STRtree, with the polygons prepared once and
+kept in memory. The same index serves batch enrichment of whole frames and
+single lookups at submission time.
+
+Submitted names are compared through ``place_key()``, which ignores case,
+spacing and punctuation and maps known alternative spellings (PLACE_ALIASES)
+to one name, and a district counts as matching if its polygon is within
+GEOCODER_BORDER_METRES of the point, so reports near a border or with
+another spelling aren't flagged.
+
+shapely 2 and geopandas are optional: without them (or without the
+shapefiles) ``get_geocoder()`` returns None, logs why, and callers skip
+geocoding.
+"""
+
+import logging
+import os
+import re
+import threading
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+from django.conf import settings
+
+try:
+    import geopandas as gpd
+    import shapely
+    from shapely.strtree import STRtree
+except ImportError:  # pragma: no cover - depends on the environment
+    gpd = shapely = STRtree = None
+
+
+logger = logging.getLogger(__name__)
+
+# Settings, read when used rather than at import: the enrichment scripts
+# import this module without configuring Django.
+#
+# Submitted coordinates this close to the chosen district's polygon match it
+# (GEOCODER_BORDER_METRES).
+DEFAULT_BORDER_METRES = 2000
+# Other spellings of state/district names -> the spelling they stand for
+# (PLACE_ALIASES).
+DEFAULT_PLACE_ALIASES = {
+    'Arunanchal Pradesh': 'Arunachal Pradesh',
+    'Orissa': 'Odisha',
+    'Pondicherry': 'Puducherry',
+    'Uttaranchal': 'Uttarakhand',
+    'NCT of Delhi': 'Delhi',
+    'Andaman and Nicobar': 'Andaman and Nicobar Islands',
+    'Dadra and Nagar Haveli': 'Dadara and Nagar Havelli',
+    'Gurgaon': 'Gurugram',
+    'Bangalore': 'Bengaluru Urban',
+    'Bangalore Urban': 'Bengaluru Urban',
+    'Bangalore Rural': 'Bengaluru Rural',
+    'Mysore': 'Mysuru',
+    'Allahabad': 'Prayagraj',
+}
+
+METRES_PER_DEGREE = 111320.0
+
+
+def _compact(name):
+    return re.sub(r'[^0-9a-z]', '', str(name).casefold().replace('&', 'and'))
+
+
+def border_metres():
+    return getattr(settings, 'GEOCODER_BORDER_METRES', DEFAULT_BORDER_METRES)
+
+
+@lru_cache(maxsize=1)
+def _alias_keys():
+    aliases = getattr(settings, 'PLACE_ALIASES', DEFAULT_PLACE_ALIASES)
+    return {_compact(alias): _compact(name) for alias, name in aliases.items()}
+
+
+def place_key(name):
+    """Comparison key of a state or district name (case, spacing, punctuation and aliases ignored)."""
+    key = _compact(name)
+    return _alias_keys().get(key, key)
+
+
+def geocoding_available():
+    return gpd is not None
+
+
+def districts_shapefile():
+    return os.path.join(settings.DATA_DIR, 'shapefiles', 'districts', '2011_Dist.shp')
+
+
+def states_shapefile():
+    return os.path.join(settings.DATA_DIR, 'shapefiles', 'States', 'Admin2.shp')
+
+
+class PolygonIndex:
+    """STRtree over prepared polygons, returning the attributes of the polygon containing each point."""
+
+    def __init__(self, geometries, attributes):
+        self.geometries = np.asarray(geometries)
+        shapely.prepare(self.geometries)
+        self.tree = STRtree(self.geometries)
+        self.attributes = attributes.reset_index(drop=True)
+
+    @classmethod
+    def from_shapefile(cls, path, columns):
+        """Reads ``columns`` and the polygons of a shapefile (in WGS84)."""
+        frame = gpd.read_file(path).to_crs('EPSG:4326')
+        return cls(frame.geometry.to_numpy(), frame[columns].astype(str))
+
+    def match(self, latitudes, longitudes):
+        """
+        Polygon number per point (-1 if it is in no polygon).
+
+        Points on a shared border get the lowest numbered polygon containing them.
+        """
+        points = shapely.points(np.asarray(longitudes, dtype=np.float64), np.asarray(latitudes, dtype=np.float64))
+        point_ids, polygon_ids = self.tree.query(points, predicate='intersects')
+        matched = np.full(len(points), len(self.geometries), dtype=np.int64)
+        np.minimum.at(matched, point_ids, polygon_ids)
+        matched[matched == len(self.geometries)] = -1
+        return matched
+
+    def lookup(self, latitudes, longitudes):
+        """The attributes of the containing polygon per point (NaN if none)."""
+        return self.attributes.reindex(self.match(latitudes, longitudes)).reset_index(drop=True)
+
+    def lookup_near(self, latitude, longitude, distance_metres):
+        """The attributes of the polygons within ``distance_metres`` of one point, nearest first."""
+        point = shapely.points(longitude, latitude)
+        # Degrees of longitude shrink with the latitude; err on the wide side.
+        distance = distance_metres / (METRES_PER_DEGREE * max(np.cos(np.radians(latitude)), 0.1))
+        polygon_ids = self.tree.query(point, predicate='dwithin', distance=distance)
+        order = np.argsort(shapely.distance(self.geometries[polygon_ids], point), kind='stable')
+        return [self.attributes.iloc[int(polygon_id)].to_dict() for polygon_id in polygon_ids[order]]
+
+    def lookup_one(self, latitude, longitude):
+        """The attributes of the polygon containing one point as a dict, or None."""
+        polygon_ids = self.tree.query(shapely.points(longitude, latitude), predicate='intersects')
+        if len(polygon_ids) == 0:
+            return None
+        return self.attributes.iloc[int(polygon_ids.min())].to_dict()
+
+
+class Geocoder:
+    """State and district lookup from the district polygons, with the state polygons as a fallback."""
+
+    def __init__(self, districts_path=None, states_path=None):
+        self.districts = PolygonIndex.from_shapefile(districts_path or districts_shapefile(), ['ST_NM', 'DISTRICT'])
+        states_path = states_path or states_shapefile()
+        self.states = PolygonIndex.from_shapefile(states_path, ['ST_NM']) if os.path.exists(states_path) else None
+
+    def assign(self, df, latitude='latitude', longitude='longitude'):
+        """
+        Sets the 'State' and 'District' columns of ``df`` from its coordinates.
+
+        Rows outside every district get the state of the state polygon they
+        are in (and no district); rows without coordinates get neither.
+        """
+        latitudes = pd.to_numeric(df[latitude], errors='coerce').to_numpy(dtype=np.float64)
+        longitudes = pd.to_numeric(df[longitude], errors='coerce').to_numpy(dtype=np.float64)
+        found = self.districts.lookup(latitudes, longitudes)
+        states = found['ST_NM'].to_numpy(dtype=object)
+        if self.states is not None:
+            missing = pd.isna(states)
+            if missing.any():
+                states[missing] = self.states.lookup(latitudes[missing], longitudes[missing])['ST_NM'].to_numpy(dtype=object)
+        df['State'] = states
+        df['District'] = found['DISTRICT'].to_numpy(dtype=object)
+        return df
+
+    def locate(self, latitude, longitude):
+        """(state, district) of one point; either can be None."""
+        found = self.districts.lookup_one(latitude, longitude)
+        if found is not None:
+            return found['ST_NM'], found['DISTRICT']
+        if self.states is not None:
+            found = self.states.lookup_one(latitude, longitude)
+            if found is not None:
+                return found['ST_NM'], None
+        return None, None
+
+    def mismatch(self, latitude, longitude, state, district, distance_metres=None):
+        """
+        None if the point is in (or within ``distance_metres`` of) the given
+        district, or can't be placed at all; otherwise the (state, district)
+        it is in.
+        """
+        distance_metres = border_metres() if distance_metres is None else distance_metres
+        wanted = (place_key(state), place_key(district))
+        nearby = self.districts.lookup_near(latitude, longitude, distance_metres)
+        if any((place_key(found['ST_NM']), place_key(found['DISTRICT'])) == wanted for found in nearby):
+            return None
+        located = self.locate(latitude, longitude)
+        if located == (None, None):
+            return None
+        if located[1] is None and place_key(located[0]) == wanted[0]:
+            # Inside the state but outside every district polygon.
+            return None
+        return located
+
+
+_geocoder = None
+_geocoder_loaded = False
+_geocoder_lock = threading.Lock()
+
+
+def get_geocoder():
+    """
+    Returns the process-wide Geocoder, loading the shapefiles on first use.
+
+    Returns None if shapely/geopandas or the district shapefile are missing.
+    """
+    global _geocoder, _geocoder_loaded
+    if not _geocoder_loaded:
+        with _geocoder_lock:
+            if not _geocoder_loaded:
+                if not geocoding_available():
+                    logger.warning("Geocoding is unavailable: shapely/geopandas are not installed")
+                elif not os.path.exists(districts_shapefile()):
+                    logger.warning("Geocoding is unavailable: no district shapefile at %s", districts_shapefile())
+                else:
+                    _geocoder = Geocoder()
+                _geocoder_loaded = True
+    return _geocoder
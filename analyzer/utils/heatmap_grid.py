@@ -0,0 +1,185 @@
+# analyzer/utils/heatmap_grid.py
+
+"""
+Server-side heatmap binning.
+
+Instead of inlining every accident coordinate into the folium HTML, points
+are binned into a grid whose cell size follows the map zoom (roughly 8 screen
+pixels per cell). The cells for a zoom level are computed once per dataset
+version and the map only fetches the cells inside its current viewport. The
+most recently used grids are kept; concurrent requests for a grid that isn't
+binned yet share one computation.
+"""
+
+import threading
+from collections import OrderedDict
+
+import numpy as np
+from branca.element import MacroElement
+from jinja2 import Template
+
+from .dataset_store import get_store, partition_name
+from .executor import coalesce
+
+
+MIN_ZOOM = 3
+MAX_ZOOM = 16
+
+# Cells per 256px map tile, i.e. one cell is ~8 pixels wide on screen.
+CELLS_PER_TILE = 32
+
+# Cell weights are scaled against this percentile of the cell counts so a few
+# very dense cells don't wash out the rest of the map.
+WEIGHT_PERCENTILE = 99
+
+# Binned (state, district, zoom) grids kept in memory, national grids included.
+CACHED_GRIDS = 128
+
+
+def clamp_zoom(zoom):
+    """Restricts a requested zoom level to the range the grid supports."""
+    return max(MIN_ZOOM, min(MAX_ZOOM, int(zoom)))
+
+
+def cell_size(zoom):
+    """Width of a grid cell in degrees at the given zoom level."""
+    return 360.0 / (2 ** clamp_zoom(zoom)) / CELLS_PER_TILE
+
+
+def bin_points(latitudes, longitudes, size):
+    """
+    Bins coordinates into square cells of ``size`` degrees.
+
+    Returns (cell_lat, cell_lon, weight) arrays sorted by latitude, where the
+    cell coordinates are cell centres and weights are scaled to (0, 1].
+    """
+    latitudes = np.asarray(latitudes, dtype=np.float64)
+    longitudes = np.asarray(longitudes, dtype=np.float64)
+    valid = ~(np.isnan(latitudes) | np.isnan(longitudes))
+    latitudes, longitudes = latitudes[valid], longitudes[valid]
+    if len(latitudes) == 0:
+        empty = np.array([], dtype=np.float64)
+        return empty, empty, empty
+
+    rows = np.floor(latitudes / size).astype(np.int64)
+    cols = np.floor(longitudes / size).astype(np.int64)
+    cells, counts = np.unique(np.stack([rows, cols], axis=1), axis=0, return_counts=True)
+
+    cell_lat = (cells[:, 0] + 0.5) * size
+    cell_lon = (cells[:, 1] + 0.5) * size
+    scale = max(np.percentile(counts, WEIGHT_PERCENTILE), 1.0)
+    weight = np.minimum(counts / scale, 1.0)
+
+    order = np.argsort(cell_lat, kind='stable')
+    return cell_lat[order], cell_lon[order], weight[order]
+
+
+class HeatGrid:
+    """Binned heat cells per (state, district, zoom), cached per dataset version."""
+
+    def __init__(self, store=None):
+        self.store = store or get_store()
+        self._lock = threading.Lock()
+        self._cells = OrderedDict()
+
+    def _frame(self, state, district):
+        if state and district:
+            return self.store.district(state, district)
+        if state:
+            return self.store.state(state)
+        return self.store.frame()
+
+    def grid(self, zoom, state=None, district=None):
+        """The sorted (cell_lat, cell_lon, weight) arrays for one scope and zoom."""
+        zoom = clamp_zoom(zoom)
+        district = district if state else None
+        # The version is read first: cells binned from a newer frame are
+        # merely recomputed, while newer version numbers on older cells
+        # would be served until the next change.
+        self.store.refresh()
+        version = self.store.version
+        df = self._frame(state, district)
+        if df is None:
+            # Unknown scopes aren't cached, so arbitrary names can't fill the cache.
+            return bin_points([], [], cell_size(zoom))
+        key = (partition_name(state) if state else None, partition_name(district) if district else None, zoom)
+        with self._lock:
+            cached = self._cells.get(key)
+            if cached is not None and cached[0] == version:
+                self._cells.move_to_end(key)
+                return cached[1]
+        return coalesce(('heat', id(self), key, version), lambda: self._bin(df, key, version))
+
+    def _bin(self, df, key, version):
+        cells = bin_points(df['latitude'], df['longitude'], cell_size(key[2]))
+        with self._lock:
+            self._cells[key] = (version, cells)
+            self._cells.move_to_end(key)
+            while len(self._cells) > CACHED_GRIDS:
+                self._cells.popitem(last=False)
+        return cells
+
+    def cells(self, zoom, bbox=None, state=None, district=None):
+        """
+        Heat cells as [lat, lon, weight] lists, limited to ``bbox`` if given.
+
+        ``bbox`` is (south, west, north, east) in degrees.
+        """
+        cell_lat, cell_lon, weight = self.grid(zoom, state, district)
+        if bbox is not None:
+            south, west, north, east = bbox
+            # Latitudes are sorted, so the rows in range are one contiguous slice.
+            start = np.searchsorted(cell_lat, south, side='left')
+            stop = np.searchsorted(cell_lat, north, side='right')
+            cell_lat, cell_lon, weight = cell_lat[start:stop], cell_lon[start:stop], weight[start:stop]
+            in_view = (cell_lon >= west) & (cell_lon <= east)
+            cell_lat, cell_lon, weight = cell_lat[in_view], cell_lon[in_view], weight[in_view]
+        return np.column_stack([cell_lat.round(5), cell_lon.round(5), weight.round(3)]).tolist()
+
+
+class HeatCellLoader(MacroElement):
+    """
+    Folium element that refreshes a HeatMap layer from the heat cell endpoint
+    whenever the map is panned or zoomed.
+    """
+
+    _template = Template(
+        """
+        {% macro script(this, kwargs) %}
+            (function() {
+                var map = {{ this.map_name }};
+                var heat = {{ this.heat_name }};
+                var url = {{ this.url|tojson }};
+                map.on('moveend', function() {
+                    var b = map.getBounds();
+                    var query = 'zoom=' + map.getZoom() + '&bbox=' +
+                        [b.getSouth(), b.getWest(), b.getNorth(), b.getEast()].join(',');
+                    fetch(url + (url.indexOf('?') === -1 ? '?' : '&') + query)
+                        .then(function(response) { return response.json(); })
+                        .then(function(data) { heat.setLatLngs(data.cells); });
+                });
+            })();
+        {% endmacro %}
+        """
+    )
+
+    def __init__(self, folium_map, heatmap, url):
+        super().__init__()
+        self._name = 'HeatCellLoader'
+        self.map_name = folium_map.get_name()
+        self.heat_name = heatmap.get_name()
+        self.url = url
+
+
+_grid = None
+_grid_lock = threading.Lock()
+
+
+def get_heat_grid():
+    """Returns the process-wide HeatGrid, creating it on first use."""
+    global _grid
+    if _grid is None:
+        with _grid_lock:
+            if _grid is None:
+                _grid = HeatGrid()
+    return _grid
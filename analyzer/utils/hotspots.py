@@ -0,0 +1,219 @@
+# analyzer/utils/hotspots.py
+
+"""
+Per-district hotspot labels.
+
+The district page used to refit DBSCAN on every view (with a freshly fitted
+StandardScaler, so eps had no physical meaning). DBSCAN now uses haversine
+distance on a BallTree, so eps is in metres. A district's labels are taken
+from its state's published model (trained offline, see cluster_accidents.py)
+when that model covers all of the district's accidents. Otherwise, e.g. for
+a district with submissions newer than the model, the district is clustered
+on its own the next time its points are requested, and the labels are
+persisted next to the other models, one file per district, until its
+coordinates change.
+"""
+
+import hashlib
+import json
+import os
+import re
+import threading
+
+import joblib
+import numpy as np
+import pandas as pd
+from django.conf import settings
+from sklearn.cluster import DBSCAN
+
+from .atomic import atomic_dump
+from .dataset_store import get_store, partition_name
+from .executor import coalesce
+from .instrumentation import span
+
+
+EARTH_RADIUS_METRES = 6371008.8
+
+# Accidents closer than this (in metres) are neighbours for DBSCAN.
+HOTSPOT_EPS_METRES = getattr(settings, 'HOTSPOT_EPS_METRES', 500)
+# Minimum accidents within eps for a point to form a hotspot.
+HOTSPOT_MIN_SAMPLES = getattr(settings, 'HOTSPOT_MIN_SAMPLES', 5)
+
+
+VERSION_PATTERN = re.compile(r'^v(\d+)\.joblib$')
+
+
+def labels_dir():
+    return os.path.join(settings.BASE_DIR, 'analyzer', 'models', 'hotspot_labels')
+
+
+def models_dir():
+    """Where the per-state models are published."""
+    return os.path.join(settings.BASE_DIR, 'analyzer', 'models', 'states')
+
+
+def manifest_path():
+    return os.path.join(models_dir(), 'manifest.json')
+
+
+def load_manifest():
+    """The manifest of the last run, or an empty one if nothing was trained yet."""
+    try:
+        with open(manifest_path(), encoding='utf-8') as handle:
+            return json.load(handle)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {'runs': 0, 'states': {}}
+
+
+def build_model(eps_metres=None, min_samples=None):
+    """An unfitted haversine DBSCAN; fit it on radians(lat, lon)."""
+    eps_metres = eps_metres or HOTSPOT_EPS_METRES
+    min_samples = min_samples or HOTSPOT_MIN_SAMPLES
+    return DBSCAN(
+        eps=eps_metres / EARTH_RADIUS_METRES,
+        min_samples=min_samples,
+        metric='haversine',
+        algorithm='ball_tree',
+    )
+
+
+def to_radians(latitudes, longitudes):
+    return np.radians(np.column_stack([latitudes, longitudes]).astype(np.float64))
+
+
+def cluster_coordinates(latitudes, longitudes, eps_metres=None, min_samples=None):
+    """
+    Runs DBSCAN with haversine distance on (lat, lon) degrees.
+
+    Returns one label per point; -1 marks points that are not in a hotspot.
+    """
+    coords = to_radians(latitudes, longitudes)
+    if len(coords) == 0:
+        return np.array([], dtype=np.int32)
+    with span('dbscan'):
+        return build_model(eps_metres, min_samples).fit_predict(coords).astype(np.int32)
+
+
+def coordinates_signature(latitudes, longitudes):
+    """Fingerprint of a district's coordinates, used to detect changes."""
+    digest = hashlib.sha1()
+    digest.update(np.ascontiguousarray(latitudes, dtype=np.float32).tobytes())
+    digest.update(np.ascontiguousarray(longitudes, dtype=np.float32).tobytes())
+    return f'{len(latitudes)}:{digest.hexdigest()}:{HOTSPOT_EPS_METRES}:{HOTSPOT_MIN_SAMPLES}'
+
+
+class HotspotIndex:
+    """Hotspot labels for every district, persisted to ``hotspot_labels/<State>/<District>.joblib``."""
+
+    def __init__(self, store=None, directory=None):
+        self.store = store or get_store()
+        self.directory = directory or labels_dir()
+        self._lock = threading.Lock()
+        # (state, district) -> {'signature', 'labels'}, or None if not clustered yet
+        self._labels = {}
+        # (manifest mtime, manifest) and state -> (model path, labels by accident id)
+        self._manifest = None
+        self._published = {}
+
+    def _path(self, key):
+        state, district = key
+        return os.path.join(self.directory, state, f'{district}.joblib')
+
+    def _cached(self, key):
+        """The district's persisted labels, loaded on first use."""
+        with self._lock:
+            if key in self._labels:
+                return self._labels[key]
+        try:
+            entry = joblib.load(self._path(key))
+        except (FileNotFoundError, EOFError, ValueError):
+            entry = None
+        with self._lock:
+            return self._labels.setdefault(key, entry)
+
+    def labels(self, state, district, df):
+        """
+        Hotspot labels for ``df``, the district's rows with valid coordinates.
+
+        The labels come from the state's published model if it was fitted on
+        all of these accidents. Otherwise cached district labels are reused
+        as long as the district's coordinates are unchanged, or only this
+        district is re-clustered. Clustering doesn't hold up other districts,
+        and concurrent requests for the same district share one run.
+        """
+        key = (partition_name(state), partition_name(district))
+        published = self.published_labels(key[0])
+        if published is not None:
+            labels = published.reindex(df['Accident_Index'].to_numpy(dtype=np.float64, na_value=np.nan))
+            if len(labels) and not labels.isna().any():
+                return labels.to_numpy(dtype=np.int32)
+
+        latitudes = df['latitude'].to_numpy()
+        longitudes = df['longitude'].to_numpy()
+        signature = coordinates_signature(latitudes, longitudes)
+        cached = self._cached(key)
+        if cached is not None and cached['signature'] == signature:
+            return cached['labels']
+        return coalesce(
+            ('hotspots', id(self), key, signature), lambda: self._cluster(key, signature, latitudes, longitudes)
+        )
+
+    def published_labels(self, state):
+        """
+        Labels of the state's published model by accident id, or None.
+
+        ``state`` is a partition name. The manifest is re-read when it
+        changes, and a model file is loaded once per version.
+        """
+        try:
+            modified = os.stat(manifest_path()).st_mtime_ns
+        except FileNotFoundError:
+            return None
+        with self._lock:
+            if self._manifest is None or self._manifest[0] != modified:
+                self._manifest = (modified, load_manifest())
+            entry = self._manifest[1].get('states', {}).get(state)
+            cached = self._published.get(state)
+        if entry is None:
+            return None
+        path = os.path.join(settings.BASE_DIR, entry['path'])
+        if cached is not None and cached[0] == path:
+            return cached[1]
+        labels = coalesce(('published', id(self), path), lambda: self._load_published(path))
+        with self._lock:
+            self._published[state] = (path, labels)
+        return labels
+
+    @staticmethod
+    def _load_published(path):
+        try:
+            artifact = joblib.load(path)
+        except (FileNotFoundError, EOFError, ValueError):
+            return None
+        # Models saved before the accident ids were kept can't be mapped to rows.
+        if not isinstance(artifact, dict):
+            return None
+        labels = pd.Series(artifact['model'].labels_.astype(np.int32), index=artifact['accidents'])
+        return labels[~labels.index.duplicated(keep=False) & labels.index.notna()]
+
+    def _cluster(self, key, signature, latitudes, longitudes):
+        labels = cluster_coordinates(latitudes, longitudes)
+        entry = {'signature': signature, 'labels': labels}
+        atomic_dump(entry, self._path(key))
+        with self._lock:
+            self._labels[key] = entry
+        return labels
+
+
+_hotspots = None
+_hotspots_lock = threading.Lock()
+
+
+def get_hotspots():
+    """Returns the process-wide HotspotIndex, creating it on first use."""
+    global _hotspots
+    if _hotspots is None:
+        with _hotspots_lock:
+            if _hotspots is None:
+                _hotspots = HotspotIndex()
+    return _hotspots
@@ -0,0 +1,344 @@
+# analyzer/utils/incremental.py
+
+"""
+Incremental, dependency-tracked refresh of the derived data.
+
+A new raw drop used to mean rerunning the whole chain: merge/clean,
+geocode, partition and retrain, each over the full dataset. Here every stage
+declares its input and output files, and a state file
+(``DATA_DIR/.pipeline/state.json``) records the content hash of each of
+them after the stage last ran. On the next run a stage is
+
+* skipped if its inputs hash the same and its outputs are untouched;
+* updated if its inputs only grew (the recorded content is still a prefix
+  of the file): only the appended rows are read and processed, and the
+  results are appended to the outputs, so the stage's output grows by a
+  delta that the next stage picks up the same way;
+* rebuilt otherwise (edited or replaced inputs, outputs changed or missing,
+  or ``force``).
+
+Hashing still reads every input once; the expensive work (parsing,
+geocoding, partitioning, clustering) is proportional to the new rows.
+"""
+
+import hashlib
+import json
+import os
+import time
+
+import joblib
+import numpy as np
+import pandas as pd
+from django.conf import settings
+
+from analyzer.ml.pipeline import (
+    CASUALTY_AGGREGATES, CHUNK_SIZE, VEHICLE_AGGREGATES, accident_totals, aggregate_sources,
+    aggregates_from_totals, process_accidents, read_chunks,
+)
+
+from .atomic import atomic_dump, atomic_write_text
+from .cluster_accidents import retrain_dbscan
+from .dataset_store import get_store
+from .ingest import ingest_lock, swap_partitions
+from .partitioner import append_to_partitions, manifest_path, partition_dataset
+from .reverse_geocode import reverse_geocode
+from .schema import MASTER_COLUMN_ORDER
+
+
+HASH_BLOCK_SIZE = 1 << 20
+
+STAGE_FULL = 'full'
+STAGE_UPDATE = 'update'
+STAGE_SKIP = 'skip'
+
+
+class RebuildRequired(Exception):
+    """Raised by a stage's update when the new rows can't be processed on their own."""
+
+
+def pipeline_dir(data_dir=None):
+    return os.path.join(data_dir or settings.DATA_DIR, '.pipeline')
+
+
+def fingerprint(path, previous=None):
+    """
+    The content fingerprint of ``path`` ({'size', 'mtime_ns', 'sha256'}, or
+    None if it doesn't exist) and how it changed since ``previous``: None
+    (same content), 'appended' (``previous`` is a prefix ending in a
+    newline) or 'changed'.
+
+    A file whose size and mtime match ``previous`` isn't hashed again.
+    """
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return None, 'changed' if previous else None
+    if previous and (stat.st_size, stat.st_mtime_ns) == (previous['size'], previous['mtime_ns']):
+        return previous, None
+
+    boundary = previous['size'] if previous and stat.st_size > previous['size'] else None
+    digest = hashlib.sha256()
+    prefix_digest = None
+    with open(path, 'rb') as handle:
+        done = 0
+        while True:
+            size = HASH_BLOCK_SIZE if boundary is None or done >= boundary else min(HASH_BLOCK_SIZE, boundary - done)
+            block = handle.read(size)
+            if not block:
+                break
+            digest.update(block)
+            done += len(block)
+            if done == boundary and block.endswith(b'\n'):
+                prefix_digest = digest.hexdigest()
+
+    current = {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns, 'sha256': digest.hexdigest()}
+    if previous is None:
+        return current, 'changed'
+    if current['sha256'] == previous['sha256']:
+        return current, None
+    if prefix_digest == previous['sha256']:
+        return current, 'appended'
+    return current, 'changed'
+
+
+class Stage:
+    """
+    One step of the pipeline.
+
+    ``build()`` rebuilds the outputs from scratch. ``update(offsets)``, if
+    given, processes only the rows appended to the inputs; ``offsets`` maps
+    each appended input to the byte offset its new rows start at. Both
+    return a JSON-friendly summary.
+    """
+
+    def __init__(self, name, inputs, outputs, build, update=None):
+        self.name = name
+        self.inputs = inputs
+        self.outputs = outputs
+        self.build = build
+        self.update = update
+
+
+def _load_state(path):
+    try:
+        with open(path, encoding='utf-8') as handle:
+            return json.load(handle)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {'stages': {}}
+
+
+def plan_stage(stage, record, force=False):
+    """(mode, input fingerprints, appended offsets) of ``stage`` given its last ``record``."""
+    fingerprints, offsets, changed = {}, {}, False
+    for path in stage.inputs:
+        previous = record['inputs'].get(path) if record else None
+        current, change = fingerprint(path, previous)
+        if current is None:
+            raise FileNotFoundError(f"Input of stage '{stage.name}' not found: {path}")
+        fingerprints[path] = current
+        if change == 'appended':
+            offsets[path] = previous['size']
+        elif change:
+            changed = True
+
+    outputs_intact = record is not None and all(
+        path in record['outputs'] and fingerprint(path, record['outputs'][path])[1] is None
+        for path in stage.outputs
+    )
+    if force or changed or not outputs_intact:
+        return STAGE_FULL, fingerprints, {}
+    if not offsets:
+        return STAGE_SKIP, fingerprints, {}
+    return (STAGE_UPDATE if stage.update else STAGE_FULL), fingerprints, offsets
+
+
+def run_stages(stages, state_path, force=False, dry_run=False, log=print):
+    """
+    Runs the ``stages`` in order, skipping or updating the ones whose inputs
+    didn't change or only grew. The state is saved after every stage, so an
+    interrupted run resumes at the stage it stopped in. Returns a summary per
+    stage.
+    """
+    state = _load_state(state_path)
+    summary = []
+    for stage in stages:
+        record = state['stages'].get(stage.name)
+        mode, fingerprints, offsets = plan_stage(stage, record, force)
+        if dry_run or mode == STAGE_SKIP:
+            if mode == STAGE_SKIP and not dry_run and record['inputs'] != fingerprints:
+                # Same content with a new mtime: remember it so it isn't hashed again.
+                record['inputs'] = fingerprints
+                atomic_write_text(json.dumps(state, indent=2), state_path)
+            log(f"{'🔍' if dry_run else '⏭️'} {stage.name}: {mode}")
+            summary.append({'stage': stage.name, 'mode': mode})
+            continue
+
+        started = time.perf_counter()
+        log(f"🚀 {stage.name}: {mode}" + (f" ({len(offsets)} appended input(s))" if offsets else ''))
+        result = None
+        if mode == STAGE_UPDATE:
+            try:
+                result = stage.update(offsets)
+            except RebuildRequired as error:
+                log(f"⚠️ {stage.name}: {error}; rebuilding")
+                mode = STAGE_FULL
+        if mode == STAGE_FULL:
+            result = stage.build()
+
+        seconds = round(time.perf_counter() - started, 3)
+        state['stages'][stage.name] = {
+            'inputs': fingerprints,
+            'outputs': {path: fingerprint(path)[0] for path in stage.outputs},
+            'mode': mode,
+            'finished_at': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'seconds': seconds,
+            'result': result,
+        }
+        atomic_write_text(json.dumps(state, indent=2), state_path)
+        log(f"✅ {stage.name}: {mode} in {seconds:.2f}s")
+        summary.append({'stage': stage.name, 'mode': mode, 'seconds': seconds, 'result': result})
+    return summary
+
+
+# --- The accident data pipeline ---
+
+def _remove(path):
+    if os.path.exists(path):
+        os.remove(path)
+
+
+def _geocode(chunks, output_path, workers):
+    """Adds State and District to each chunk of cleaned accidents and appends it to ``output_path``."""
+    rows = 0
+    for chunk in chunks:
+        chunk = chunk.dropna(subset=['latitude', 'longitude'])
+        places = reverse_geocode(chunk['latitude'], chunk['longitude'], workers=workers)
+        chunk['State'] = places['State'].to_numpy()
+        chunk['District'] = places['District'].to_numpy()
+        chunk[MASTER_COLUMN_ORDER].to_csv(output_path, mode='a', header=not os.path.exists(output_path), index=False)
+        rows += len(chunk)
+    return rows
+
+
+def accident_stages(data_dir=None, raw_dir=None, chunksize=CHUNK_SIZE, workers=None, log=print):
+    """
+    The stages from the raw files to the retrained hotspot models:
+
+    clean (AccidentsBig/VehiclesBig/CasualtiesBig -> cleaned_accidents.csv),
+    geocode (-> accidents_with_districts.csv), partition (-> states/ and
+    districts/) and train (per-state DBSCAN models of the changed states).
+    """
+    data_dir = data_dir or settings.DATA_DIR
+    raw_dir = raw_dir or os.path.join(data_dir, 'raw')
+    accidents = os.path.join(raw_dir, 'AccidentsBig.csv')
+    vehicles = os.path.join(raw_dir, 'VehiclesBig.csv')
+    casualties = os.path.join(raw_dir, 'CasualtiesBig.csv')
+    cleaned = os.path.join(data_dir, 'cleaned_accidents.csv')
+    geocoded = os.path.join(data_dir, 'accidents_with_districts.csv')
+    # Running vehicle/casualty totals and the accidents processed so far.
+    totals_path = os.path.join(pipeline_dir(data_dir), 'clean_totals.joblib')
+
+    def clean(chunks, vehicle_totals, casualty_totals, processed):
+        per_accident = aggregates_from_totals(vehicle_totals, VEHICLE_AGGREGATES).join(
+            aggregates_from_totals(casualty_totals, CASUALTY_AGGREGATES), how='outer'
+        )
+        ids = [processed]
+
+        def tracked():
+            for chunk in chunks:
+                ids.append(chunk['Accident_Index'].to_numpy())
+                yield chunk
+
+        counts = process_accidents(tracked(), per_accident, output_path=cleaned, log=log)
+        atomic_dump(
+            {'vehicles': vehicle_totals, 'casualties': casualty_totals, 'accidents': np.concatenate(ids)}, totals_path
+        )
+        return counts
+
+    def build_clean():
+        _remove(cleaned)
+        return clean(
+            read_chunks(accidents, chunksize),
+            accident_totals(vehicles, aggregate_sources(VEHICLE_AGGREGATES), chunksize),
+            accident_totals(casualties, aggregate_sources(CASUALTY_AGGREGATES), chunksize),
+            np.array([], dtype=object),
+        )
+
+    def update_clean(offsets):
+        try:
+            cached = joblib.load(totals_path)
+        except FileNotFoundError:
+            raise RebuildRequired('no cached vehicle/casualty totals')
+        processed = pd.Index(cached['accidents'])
+        vehicle_totals, casualty_totals = cached['vehicles'], cached['casualties']
+        for path, aggregates, key in ((vehicles, VEHICLE_AGGREGATES, 'vehicles'),
+                                      (casualties, CASUALTY_AGGREGATES, 'casualties')):
+            if path not in offsets:
+                continue
+            new_totals = accident_totals(path, aggregate_sources(aggregates), chunksize, offsets[path])
+            # Rows already written would need their aggregates recomputed.
+            if new_totals.index.isin(processed).any():
+                raise RebuildRequired(f'new {key} belong to accidents that were already processed')
+            if key == 'vehicles':
+                vehicle_totals = vehicle_totals.add(new_totals, fill_value=0)
+            else:
+                casualty_totals = casualty_totals.add(new_totals, fill_value=0)
+        chunks = read_chunks(accidents, chunksize, offsets[accidents]) if accidents in offsets else []
+        return clean(chunks, vehicle_totals, casualty_totals, cached['accidents'])
+
+    def build_geocode():
+        _remove(geocoded)
+        return {'rows': _geocode(read_chunks(cleaned, chunksize), geocoded, workers)}
+
+    def update_geocode(offsets):
+        return {'rows': _geocode(read_chunks(cleaned, chunksize, offsets[cleaned]), geocoded, workers)}
+
+    def build_partitions():
+        restored = []
+        manifest = partition_dataset(
+            geocoded, data_dir, chunksize=chunksize, workers=workers, log=log,
+            swap_lock=swap_partitions(data_dir, restored),
+        )
+        if restored and restored[0]:
+            log(f"✅ Restored {restored[0]} submitted accidents to the rebuilt partitions")
+        return {
+            'rows': manifest['input_rows'] - manifest['dropped_rows'],
+            'partitions': len(manifest['partitions']),
+            'restored': restored[0] if restored else 0,
+        }
+
+    def update_partitions(offsets):
+        # Flushes append to the same partition files and rewrite their manifest.
+        with ingest_lock(data_dir):
+            states = append_to_partitions(
+                read_chunks(geocoded, chunksize, offsets[geocoded], dtype=str), data_dir, log
+            )
+        return {'states': states}
+
+    def train(states=None):
+        # The hotspot models are trained from the dataset store's frame.
+        if os.path.abspath(data_dir) != os.path.abspath(settings.DATA_DIR):
+            log("⚠️ train: the data directory isn't DATA_DIR; skipping")
+            return None
+        get_store().refresh(force=True)
+        return retrain_dbscan(states=states, workers=workers)['summary']
+
+    def update_train(offsets):
+        states = set()
+        for chunk in read_chunks(geocoded, chunksize, offsets[geocoded], usecols=['State'], dtype=str):
+            states.update(chunk['State'].dropna().unique())
+        return train(sorted(states)) if states else None
+
+    return [
+        Stage('clean', [accidents, vehicles, casualties], [cleaned], build_clean, update_clean),
+        Stage('geocode', [cleaned], [geocoded], build_geocode, update_geocode),
+        Stage('partition', [geocoded], [manifest_path(data_dir)], build_partitions, update_partitions),
+        Stage('train', [geocoded], [], train, update_train),
+    ]
+
+
+def refresh(data_dir=None, raw_dir=None, force=False, dry_run=False, chunksize=CHUNK_SIZE, workers=None, log=print):
+    """Brings the derived data up to date with the raw files; see run_stages()."""
+    data_dir = data_dir or settings.DATA_DIR
+    stages = accident_stages(data_dir, raw_dir, chunksize, workers, log)
+    return run_stages(stages, os.path.join(pipeline_dir(data_dir), 'state.json'), force, dry_run, log)
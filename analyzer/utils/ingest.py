@@ -0,0 +1,218 @@
+# analyzer/utils/ingest.py
+
+"""
+Transactional ingest for submitted accident records.
+
+A submission used to read the whole Accident_Index column to pick the next
+id and then append to three CSVs without any locking, so concurrent
+submissions could get the same id or interleave partial rows. Now:
+
+1. Under an inter-process lock the next id is taken from a persistent
+   sequence and the record is appended (fsync'ed) to the write-ahead log.
+   This is O(1) in the dataset size.
+2. Flushes move the logged records to the district, state and national
+   partitions in batches, one append per partition. A flush that is
+   interrupted can simply be run again: rows whose id is already in a
+   partition are skipped.
+
+Until they are flushed, logged records are served from the WAL by the
+dataset store. Flushed records are also archived, and restore_submissions()
+puts them back after the partitions are rebuilt from the source files.
+"""
+
+import os
+from contextlib import contextmanager
+
+import pandas as pd
+from django.conf import settings
+
+from . import wal
+from .catalog import get_catalog
+from .columnar import append_partition, partition_file, read_partition
+from .dataset_store import get_store, partition_name
+from .schema import MASTER_COLUMN_ORDER
+from .locks import file_lock
+
+
+# Flush as soon as this many records are waiting in the log.
+INGEST_FLUSH_BATCH_SIZE = getattr(settings, 'INGEST_FLUSH_BATCH_SIZE', 100)
+# Otherwise flush this many seconds after the first unflushed submission.
+INGEST_FLUSH_SECONDS = getattr(settings, 'INGEST_FLUSH_SECONDS', 10)
+
+
+def _lock_path(data_dir):
+    return os.path.join(wal.ingest_dir(data_dir), 'ingest.lock')
+
+
+def ingest_lock(data_dir=None):
+    """The inter-process lock held while records are logged or flushed."""
+    return file_lock(_lock_path(data_dir or settings.DATA_DIR))
+
+
+def _sequence_path(data_dir):
+    return os.path.join(wal.ingest_dir(data_dir), 'sequence')
+
+
+def _last_index(data_dir):
+    """
+    Highest Accident_Index handed out so far.
+
+    Comes from the sequence file and the log (in case a crash happened before
+    the sequence was advanced), or from the dataset if there is no sequence yet.
+    """
+    logged = [
+        int(record['Accident_Index'])
+        for path in wal.wal_files(data_dir)
+        for record in wal.read_records(path)
+    ]
+    try:
+        with open(_sequence_path(data_dir), encoding='utf-8') as handle:
+            return max([int(handle.read().strip()), *logged])
+    except (FileNotFoundError, ValueError):
+        pass
+    df = get_store().frame()
+    try:
+        return max([int(df['Accident_Index'].max()), *logged])
+    except (TypeError, ValueError):
+        return max(logged, default=0)
+
+
+def submit(record, data_dir=None):
+    """
+    Assigns the next Accident_Index to ``record`` and logs it durably.
+
+    Returns (record, pending) where ``record`` has its id filled in and
+    ``pending`` is the number of records now waiting to be flushed.
+    """
+    data_dir = data_dir or settings.DATA_DIR
+    with file_lock(_lock_path(data_dir)):
+        new_index = _last_index(data_dir) + 1
+        record = dict(record, Accident_Index=float(new_index))
+        wal.append_record(wal.wal_path(data_dir), record)
+        # The sequence is advanced after the record is durable; if we crash in
+        # between, _last_index() still sees the id in the log.
+        with open(_sequence_path(data_dir), 'w', encoding='utf-8') as handle:
+            handle.write(str(new_index))
+        pending = sum(len(wal.read_records(path)) for path in wal.wal_files(data_dir))
+    return record, pending
+
+
+def _partition_max_index(base_path):
+    """Highest Accident_Index already stored in a partition (0 if empty)."""
+    path = partition_file(base_path)
+    if path is None:
+        return 0
+    if path.endswith('.csv'):
+        # Only the tail of the file matters since ids only grow.
+        with open(path, 'rb') as handle:
+            handle.seek(0, os.SEEK_END)
+            handle.seek(max(handle.tell() - 4096, 0))
+            lines = handle.read().decode('utf-8', errors='ignore').splitlines()[1:]
+        indexes = pd.to_numeric(pd.Series([line.split(',', 1)[0] for line in lines]), errors='coerce')
+        return 0 if indexes.dropna().empty else int(indexes.max())
+    indexes = read_partition(path)['Accident_Index']
+    return 0 if indexes.dropna().empty else int(indexes.max())
+
+
+def _append_new(df, base_path):
+    """Appends the rows of ``df`` that are not in the partition yet."""
+    df = df[df['Accident_Index'] > _partition_max_index(base_path)]
+    if not df.empty:
+        append_partition(df, base_path)
+
+
+def flush(data_dir=None):
+    """
+    Writes all logged records to their partitions and clears the log.
+
+    Returns the number of records flushed.
+    """
+    data_dir = data_dir or settings.DATA_DIR
+    flushing = wal.flushing_path(data_dir)
+    with file_lock(_lock_path(data_dir)):
+        # Leftovers of an interrupted flush are merged with the current log.
+        records = wal.read_records(flushing) + wal.read_records(wal.wal_path(data_dir))
+        if not records:
+            return 0
+        if os.path.exists(wal.wal_path(data_dir)):
+            if os.path.exists(flushing):
+                for record in wal.read_records(wal.wal_path(data_dir)):
+                    wal.append_record(flushing, record)
+                os.remove(wal.wal_path(data_dir))
+            else:
+                os.replace(wal.wal_path(data_dir), flushing)
+
+        df = pd.DataFrame(records)[MASTER_COLUMN_ORDER]
+        for (state, district), rows in df.groupby(['State', 'District'], sort=False):
+            _append_new(rows, os.path.join(data_dir, 'districts', partition_name(state), partition_name(district)))
+        for state, rows in df.groupby('State', sort=False):
+            _append_new(rows, os.path.join(data_dir, 'states', partition_name(state)))
+        # Without a national file the dataset store reads the state partitions.
+        india_base_path = os.path.join(data_dir, 'all_india')
+        if partition_file(india_base_path):
+            _append_new(df, india_base_path)
+
+        # An interrupted flush may archive a record twice; restoring skips
+        # the ids already present.
+        for record in records:
+            wal.append_record(wal.submitted_path(data_dir), record)
+        os.remove(flushing)
+
+    # This process already holds the rows in memory; don't re-parse the files.
+    if data_dir == get_store().data_dir:
+        get_store().touch(df['Accident_Index'])
+        get_catalog().invalidate()
+    return len(records)
+
+
+def _append_missing(df, base_path):
+    """Appends the rows of ``df`` whose ids are not in the partition; returns how many."""
+    path = partition_file(base_path)
+    if path is not None:
+        present = pd.to_numeric(read_partition(path, usecols=['Accident_Index'])['Accident_Index'], errors='coerce')
+        df = df[~df['Accident_Index'].isin(present)]
+    if not df.empty:
+        append_partition(df, base_path)
+    return len(df)
+
+
+def restore_submissions(data_dir=None):
+    """
+    Appends the flushed submissions missing from the partitions, e.g. after
+    the partitions were rebuilt from the source files.
+
+    Call with ingest_lock() held. Returns the number of records restored.
+    """
+    data_dir = data_dir or settings.DATA_DIR
+    records = {record['Accident_Index']: record for record in wal.read_records(wal.submitted_path(data_dir))}
+    if not records:
+        return 0
+    df = pd.DataFrame(list(records.values()))[MASTER_COLUMN_ORDER]
+    restored = 0
+    for (state, district), rows in df.groupby(['State', 'District'], sort=False):
+        restored += _append_missing(
+            rows, os.path.join(data_dir, 'districts', partition_name(state), partition_name(district))
+        )
+    for state, rows in df.groupby('State', sort=False):
+        _append_missing(rows, os.path.join(data_dir, 'states', partition_name(state)))
+    india_base_path = os.path.join(data_dir, 'all_india')
+    if partition_file(india_base_path):
+        _append_missing(df, india_base_path)
+    return restored
+
+
+@contextmanager
+def swap_partitions(data_dir=None, restored=None):
+    """
+    Held while rebuilt partitions are moved into place (the ``swap_lock`` of
+    partition_dataset()).
+
+    Submissions wait under the ingest lock, and the flushed ones, which
+    aren't in the source files, are put back before they resume. The number
+    restored is appended to ``restored`` if given.
+    """
+    with ingest_lock(data_dir):
+        yield
+        count = restore_submissions(data_dir)
+        if restored is not None:
+            restored.append(count)
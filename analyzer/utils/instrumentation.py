@@ -0,0 +1,243 @@
+# analyzer/utils/instrumentation.py
+
+"""
+Request timing, metrics and an opt-in sampling profiler.
+
+Code marks its phases with ``span('name')`` (CSV loading, type coercion,
+aggregation, map rendering, DBSCAN, template rendering...). Inside a request
+the spans are collected per request and sent back in a ``Server-Timing``
+header by ``analyzer.middleware.TimingMiddleware``; every span and request
+duration also goes into process-wide histograms that the metrics endpoint
+exposes in the Prometheus text format.
+
+With PROFILE_REQUESTS enabled, requests carrying ``?profile=1`` (or a
+PROFILE_SAMPLE_RATE fraction of all requests) are sampled by a thread that
+records the request thread's stack every PROFILE_INTERVAL_MS. The folded
+stacks (one ``frame;frame;frame count`` line per stack, the input format of
+flame graph tools) are written to DATA_DIR/.profiles/. Work an async view
+hands to the executor pools (see utils/executor.py) is followed into the
+pool thread.
+"""
+
+import os
+import re
+import sys
+import threading
+import time
+from bisect import bisect_left
+from collections import Counter, defaultdict
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+
+
+# Profile requests that ask for it with ?profile=1 (off by default).
+PROFILE_REQUESTS = getattr(settings, 'PROFILE_REQUESTS', False)
+# Also profile this fraction of all requests (needs PROFILE_REQUESTS).
+PROFILE_SAMPLE_RATE = getattr(settings, 'PROFILE_SAMPLE_RATE', 0.0)
+# Milliseconds between stack samples.
+PROFILE_INTERVAL_MS = getattr(settings, 'PROFILE_INTERVAL_MS', 5)
+# Clients allowed to read the metrics endpoint.
+METRICS_ALLOWED_IPS = getattr(settings, 'METRICS_ALLOWED_IPS', ('127.0.0.1', '::1'))
+
+# Histogram bucket upper bounds in seconds.
+DURATION_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Spans of the current request: name -> [total seconds, count].
+_request_spans = ContextVar('request_spans', default=None)
+# SamplingProfiler of the current request, if it is profiled.
+_request_profiler = ContextVar('request_profiler', default=None)
+
+
+class Histogram:
+    """A Prometheus-style histogram with one series per label value."""
+
+    def __init__(self, name, help_text, label, buckets=DURATION_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.label = label
+        self.buckets = buckets
+        self._lock = threading.Lock()
+        # label value -> [bucket counts..., +Inf count], sum
+        self._counts = defaultdict(lambda: [0] * (len(buckets) + 1))
+        self._sums = defaultdict(float)
+
+    def observe(self, label_value, seconds):
+        with self._lock:
+            self._counts[label_value][bisect_left(self.buckets, seconds)] += 1
+            self._sums[label_value] += seconds
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.help_text}', f'# TYPE {self.name} histogram']
+        with self._lock:
+            series = sorted((value, list(counts), self._sums[value]) for value, counts in self._counts.items())
+        for value, counts, total in series:
+            label = f'{self.label}="{_escape(value)}"'
+            cumulative = 0
+            for bound, count in zip([*map(str, self.buckets), '+Inf'], counts):
+                cumulative += count
+                lines.append(f'{self.name}_bucket{{{label},le="{bound}"}} {cumulative}')
+            lines.append(f'{self.name}_sum{{{label}}} {total:.6f}')
+            lines.append(f'{self.name}_count{{{label}}} {cumulative}')
+        return lines
+
+
+class Counters:
+    """A Prometheus counter with (view, status) labels."""
+
+    def __init__(self, name, help_text):
+        self.name = name
+        self.help_text = help_text
+        self._lock = threading.Lock()
+        self._counts = Counter()
+
+    def increment(self, view, status):
+        with self._lock:
+            self._counts[(view, status)] += 1
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.help_text}', f'# TYPE {self.name} counter']
+        with self._lock:
+            counts = sorted(self._counts.items())
+        for (view, status), count in counts:
+            lines.append(f'{self.name}{{view="{_escape(view)}",status="{status}"}} {count}')
+        return lines
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+REQUEST_DURATION = Histogram(
+    'roadsafe_request_duration_seconds', 'Time spent handling requests, by view.', 'view'
+)
+SPAN_DURATION = Histogram(
+    'roadsafe_span_duration_seconds', 'Time spent in instrumented phases (spans), by span.', 'span'
+)
+RESPONSES = Counters('roadsafe_responses_total', 'Responses sent, by view and status code.')
+
+
+def record(name, seconds):
+    """Records ``seconds`` spent in the phase ``name`` of the current request (if any) and in the metrics."""
+    SPAN_DURATION.observe(name, seconds)
+    spans = _request_spans.get()
+    if spans is not None:
+        totals = spans.setdefault(name, [0.0, 0])
+        totals[0] += seconds
+        totals[1] += 1
+
+
+@contextmanager
+def span(name):
+    """Times the block as the phase ``name`` of the current request (if any) and in the metrics."""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        record(name, time.perf_counter() - started)
+
+
+def start_request(profiler=None):
+    """Starts collecting the spans of a request; returns the token for end_request()."""
+    return _request_spans.set({}), _request_profiler.set(profiler)
+
+
+def end_request(token, view, status, seconds):
+    """Records the request in the metrics and returns its spans (name -> [seconds, count])."""
+    spans = _request_spans.get() or {}
+    spans_token, profiler_token = token
+    _request_spans.reset(spans_token)
+    _request_profiler.reset(profiler_token)
+    REQUEST_DURATION.observe(view, seconds)
+    RESPONSES.increment(view, status)
+    return spans
+
+
+def server_timing(spans, total_seconds):
+    """The Server-Timing header value for a request's spans."""
+    entries = []
+    for name, (seconds, count) in spans.items():
+        token = re.sub(r'[^A-Za-z0-9_.-]', '_', name)
+        entry = f'{token};dur={seconds * 1000:.1f}'
+        if count > 1:
+            entry += f';desc="{count}x"'
+        entries.append(entry)
+    entries.append(f'total;dur={total_seconds * 1000:.1f}')
+    return ', '.join(entries)
+
+
+def render_metrics():
+    """All metrics in the Prometheus text exposition format."""
+    lines = [*REQUEST_DURATION.render(), *SPAN_DURATION.render(), *RESPONSES.render()]
+    return '\n'.join(lines) + '\n'
+
+
+# --- Sampling profiler ---
+
+def profiles_dir():
+    return os.path.join(settings.DATA_DIR, '.profiles')
+
+
+class SamplingProfiler:
+    """Samples the stack of one thread from a background thread; see the module docstring."""
+
+    def __init__(self, thread_id=None, interval_ms=None):
+        self.thread_id = thread_id or threading.get_ident()
+        self.interval = (interval_ms or PROFILE_INTERVAL_MS) / 1000
+        self.stacks = Counter()
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='request-profiler', daemon=True)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                continue
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f'{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})')
+                frame = frame.f_back
+            self.stacks[';'.join(reversed(stack))] += 1
+            self.samples += 1
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+        return self
+
+    def follow(self, thread_id):
+        """Samples ``thread_id`` from now on; returns the thread sampled until now."""
+        previous, self.thread_id = self.thread_id, thread_id
+        return previous
+
+    def dump(self, label):
+        """Writes the folded stacks to DATA_DIR/.profiles/ and returns the path."""
+        directory = profiles_dir()
+        os.makedirs(directory, exist_ok=True)
+        name = re.sub(r'[^A-Za-z0-9_.-]', '_', label)
+        path = os.path.join(directory, f'{time.strftime("%Y%m%d-%H%M%S")}-{time.time_ns() % 1000000:06d}-{name}.folded')
+        with open(path, 'w', encoding='utf-8') as handle:
+            for stack, count in self.stacks.most_common():
+                handle.write(f'{stack} {count}\n')
+        return path
+
+
+@contextmanager
+def follow_profiler():
+    """Points the current request's profiler (if any) at this thread for the block."""
+    profiler = _request_profiler.get()
+    if profiler is None:
+        yield
+        return
+    previous = profiler.follow(threading.get_ident())
+    try:
+        yield
+    finally:
+        profiler.follow(previous)
@@ -0,0 +1,289 @@
+# analyzer/utils/jobs.py
+
+"""
+A small local job queue backed by the BackgroundJob table.
+
+Expensive work such as retraining the hotspot model used to run inside the
+request that triggered it. Views now enqueue a named job instead. Repeated
+requests for a job that is still queued are coalesced into it and push its
+start time back (debounce), so a burst of submissions triggers one retrain;
+the push back is capped at JOB_MAX_WAIT_SECONDS after the first request, so
+a steady stream of submissions can't postpone the job forever. A partial
+unique constraint allows one queued run per job, so concurrent enqueue()
+calls from several processes coalesce instead of creating duplicates.
+A job can be limited with a payload, e.g. the states to retrain; the
+payloads of coalesced requests are merged and passed to the handler.
+
+A background worker thread claims due jobs and runs their registered handler.
+Claiming is an atomic UPDATE, so several processes can share the table safely.
+A job left running for JOB_TIMEOUT_SECONDS (its process died mid-run) is
+marked failed and queued again.
+
+Server processes start their worker when the app loads (see
+``autostart_worker()``), so jobs queued by a process that has since exited
+are still run. ``manage.py run_jobs`` runs the worker on its own, e.g. for
+deployments that set JOB_WORKER_AUTOSTART = False.
+"""
+
+import json
+import logging
+import os
+import sys
+import threading
+import time
+import traceback
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, OperationalError, close_old_connections, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from ..models import BackgroundJob
+
+
+logger = logging.getLogger(__name__)
+
+# Seconds a job waits for more requests to coalesce before it runs.
+JOB_DEBOUNCE_SECONDS = getattr(settings, 'JOB_DEBOUNCE_SECONDS', 30)
+# Longest a queued job can be pushed back by debouncing, from its first request.
+JOB_MAX_WAIT_SECONDS = getattr(settings, 'JOB_MAX_WAIT_SECONDS', 300)
+# A job running for longer than this is taken to be orphaned and is rerun.
+JOB_TIMEOUT_SECONDS = getattr(settings, 'JOB_TIMEOUT_SECONDS', 3600)
+# Upper bound on how long the worker sleeps between looking for due jobs.
+JOB_POLL_SECONDS = getattr(settings, 'JOB_POLL_SECONDS', 5)
+# Start the worker thread in server processes when the app loads.
+JOB_WORKER_AUTOSTART = getattr(settings, 'JOB_WORKER_AUTOSTART', True)
+
+# manage.py commands that serve requests; other commands don't start the worker.
+SERVER_COMMANDS = ('runserver',)
+
+# Lookups retried when a concurrent enqueue or claim wins the race, or the
+# database is locked by another writer.
+ENQUEUE_ATTEMPTS = 5
+# Seconds before retrying an enqueue that found the database locked (doubled per attempt).
+ENQUEUE_RETRY_SECONDS = 0.05
+
+_handlers = {}
+
+
+def register(name):
+    """Decorator registering ``func`` as the handler for jobs called ``name``."""
+    def decorator(func):
+        _handlers[name] = func
+        return func
+    return decorator
+
+
+def merge_payloads(first, second):
+    """
+    The payload of two coalesced requests: the union of their lists.
+
+    A request without a payload asks for everything, so it wins.
+    """
+    if first is None or second is None:
+        return None
+    merged = {key: list(values) for key, values in first.items()}
+    for key, values in second.items():
+        merged[key] = sorted(set(merged.get(key, [])) | set(values))
+    return merged
+
+
+def enqueue(name, delay=None, debounce=True, payload=None):
+    """
+    Queues a run of the ``name`` job and returns its BackgroundJob.
+
+    ``payload`` maps the handler's keyword arguments to lists, e.g.
+    ``{'states': ['Goa']}``; without one the job runs on everything. If a run
+    is already queued it is reused: its request count goes up, the payloads
+    are merged and, with ``debounce``, its start is pushed back by ``delay``
+    seconds, but no later than JOB_MAX_WAIT_SECONDS after it was first
+    queued. Without ``debounce`` the queued run keeps its start time.
+    """
+    if name not in _handlers:
+        raise KeyError(f"No job handler registered for '{name}'.")
+    delay = JOB_DEBOUNCE_SECONDS if delay is None else delay
+    run_after = timezone.now() + timedelta(seconds=delay)
+    for attempt in range(ENQUEUE_ATTEMPTS):
+        try:
+            job = _enqueue(name, run_after, debounce, payload)
+        except IntegrityError:
+            # Another process queued a run between our lookup and insert;
+            # go round again to coalesce into it.
+            if attempt == ENQUEUE_ATTEMPTS - 1:
+                raise
+            continue
+        except OperationalError:
+            # Another writer holds the database (SQLite's select_for_update()
+            # locks nothing). The caller's work is already saved, so wait
+            # and try again rather than fail the request.
+            if attempt == ENQUEUE_ATTEMPTS - 1:
+                raise
+            time.sleep(ENQUEUE_RETRY_SECONDS * 2 ** attempt)
+            continue
+        if job is not None:
+            break
+    else:
+        raise RuntimeError(f"Could not queue '{name}': its queued run kept being claimed.")
+    get_worker().wake()
+    return job
+
+
+def _enqueue(name, run_after, debounce, payload):
+    """One attempt at enqueue(); None if the queued run was claimed meanwhile."""
+    with transaction.atomic():
+        job = BackgroundJob.objects.select_for_update().filter(
+            name=name, status=BackgroundJob.STATUS_QUEUED
+        ).first()
+        if job is None:
+            return BackgroundJob.objects.create(name=name, run_after=run_after, payload=payload)
+        changes = {'requests': F('requests') + 1, 'payload': merge_payloads(job.payload, payload)}
+        if debounce:
+            latest = job.created_at + timedelta(seconds=JOB_MAX_WAIT_SECONDS)
+            changes['run_after'] = max(job.run_after, min(run_after, latest))
+        updated = BackgroundJob.objects.filter(pk=job.pk, status=BackgroundJob.STATUS_QUEUED).update(**changes)
+        if not updated:
+            return None
+        job.refresh_from_db()
+        return job
+
+
+def job_status(job):
+    """JSON-friendly status of a BackgroundJob."""
+    return {
+        'id': job.pk,
+        'name': job.name,
+        'status': job.status,
+        'requests': job.requests,
+        'payload': job.payload,
+        'run_after': job.run_after.isoformat() if job.run_after else None,
+        'created_at': job.created_at.isoformat() if job.created_at else None,
+        'started_at': job.started_at.isoformat() if job.started_at else None,
+        'finished_at': job.finished_at.isoformat() if job.finished_at else None,
+        'result': json.loads(job.result) if job.result else None,
+        'error': job.error,
+    }
+
+
+class JobWorker(threading.Thread):
+    """Daemon thread that runs due jobs one at a time."""
+
+    def __init__(self):
+        super().__init__(name='analyzer-job-worker', daemon=True)
+        self._wake = threading.Event()
+
+    def wake(self):
+        self._wake.set()
+
+    def _reclaim_stale(self):
+        """Fails the jobs running for longer than JOB_TIMEOUT_SECONDS and queues them again."""
+        now = timezone.now()
+        stale = BackgroundJob.objects.filter(
+            status=BackgroundJob.STATUS_RUNNING, started_at__lt=now - timedelta(seconds=JOB_TIMEOUT_SECONDS)
+        )
+        for job in stale:
+            reclaimed = BackgroundJob.objects.filter(pk=job.pk, status=BackgroundJob.STATUS_RUNNING).update(
+                status=BackgroundJob.STATUS_FAILED, finished_at=now,
+                error=f"Still running after {JOB_TIMEOUT_SECONDS}s; its worker is presumed dead.",
+            )
+            if reclaimed:
+                logger.warning("Background job %s timed out; queueing it again", job)
+                enqueue(job.name, delay=0, debounce=False, payload=job.payload)
+
+    def _claim_next(self):
+        """Marks the oldest due job as running and returns it, or None."""
+        self._reclaim_stale()
+        due = BackgroundJob.objects.filter(
+            status=BackgroundJob.STATUS_QUEUED, run_after__lte=timezone.now()
+        ).order_by('run_after')
+        for job in due[:5]:
+            claimed = BackgroundJob.objects.filter(pk=job.pk, status=BackgroundJob.STATUS_QUEUED).update(
+                status=BackgroundJob.STATUS_RUNNING, started_at=timezone.now()
+            )
+            if claimed:
+                job.refresh_from_db()
+                return job
+        return None
+
+    def _seconds_until_next(self):
+        job = BackgroundJob.objects.filter(status=BackgroundJob.STATUS_QUEUED).order_by('run_after').first()
+        if job is None:
+            return JOB_POLL_SECONDS
+        wait = (job.run_after - timezone.now()).total_seconds()
+        return min(max(wait, 0.1), JOB_POLL_SECONDS)
+
+    def _run(self, job):
+        try:
+            result = _handlers[job.name](**(job.payload or {}))
+            job.status = BackgroundJob.STATUS_DONE
+            job.result = json.dumps(result, default=str) if result is not None else None
+        except Exception:
+            logger.exception("Background job %s failed", job)
+            job.status = BackgroundJob.STATUS_FAILED
+            job.error = traceback.format_exc()
+        job.finished_at = timezone.now()
+        # Only if this run still owns the job: one that outlived
+        # JOB_TIMEOUT_SECONDS was failed and queued again by _reclaim_stale().
+        finished = BackgroundJob.objects.filter(
+            pk=job.pk, status=BackgroundJob.STATUS_RUNNING, started_at=job.started_at
+        ).update(status=job.status, result=job.result, error=job.error, finished_at=job.finished_at)
+        if not finished:
+            logger.warning("Background job %s finished after it was reclaimed; its outcome is dropped", job)
+
+    def run_due(self):
+        """Runs the jobs that are due now, one at a time; returns how many ran."""
+        ran = 0
+        job = self._claim_next()
+        while job is not None:
+            self._run(job)
+            ran += 1
+            job = self._claim_next()
+        return ran
+
+    def run(self):
+        while True:
+            close_old_connections()
+            try:
+                job = self._claim_next()
+                if job is not None:
+                    self._run(job)
+                    continue
+                timeout = self._seconds_until_next()
+            except Exception:
+                logger.exception("Job worker loop failed")
+                timeout = JOB_POLL_SECONDS
+            self._wake.wait(timeout)
+            self._wake.clear()
+
+
+_worker = None
+_worker_lock = threading.Lock()
+
+
+def get_worker():
+    """Returns the process's JobWorker, starting it on first use."""
+    global _worker
+    if _worker is None:
+        with _worker_lock:
+            if _worker is None:
+                _worker = JobWorker()
+                _worker.start()
+    return _worker
+
+
+def autostart_worker(argv=None):
+    """
+    Starts the worker if this process serves requests: under a WSGI/ASGI
+    server, or ``manage.py runserver`` (in the process that serves, not the
+    autoreloader watching it). Returns whether it was started.
+    """
+    argv = sys.argv if argv is None else argv
+    if not JOB_WORKER_AUTOSTART:
+        return False
+    if argv and os.path.basename(argv[0]) in ('manage.py', 'django-admin'):
+        if len(argv) < 2 or argv[1] not in SERVER_COMMANDS:
+            return False
+        if '--noreload' not in argv and os.environ.get('RUN_MAIN') != 'true':
+            return False
+    get_worker()
+    return True
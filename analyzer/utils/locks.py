@@ -0,0 +1,34 @@
+# analyzer/utils/locks.py
+
+"""Inter-process file locks (fcntl on POSIX, msvcrt on Windows)."""
+
+import os
+from contextlib import contextmanager
+
+
+@contextmanager
+def file_lock(path):
+    """
+    Holds an exclusive lock on ``path`` (created if needed) for the block.
+
+    The lock is taken on a separate open file, so it also serializes threads
+    of the same process.
+    """
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'a+b') as handle:
+        if os.name == 'nt':
+            import msvcrt
+            handle.seek(0)
+            msvcrt.locking(handle.fileno(), msvcrt.LK_LOCK, 1)
+            try:
+                yield
+            finally:
+                handle.seek(0)
+                msvcrt.locking(handle.fileno(), msvcrt.LK_UNLCK, 1)
+        else:
+            import fcntl
+            fcntl.flock(handle.fileno(), fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(handle.fileno(), fcntl.LOCK_UN)
@@ -0,0 +1,240 @@
+# analyzer/utils/partitioner.py
+
+"""
+Single-pass partitioning of the national dataset into state and district files.
+
+split_by_state.py filtered the whole frame once per state and
+save_district_csvs.py made a second pass for the districts. Here the input
+is streamed once in chunks; each chunk is grouped by state and by
+(state, district) and the groups go to buffered writers for the state and
+district partitions. Full buffers are written by a thread pool (one write in flight
+per partition, so rows keep their order), hashing the bytes as they are
+written. Partitions are built in a staging directory and moved into place at
+the end, together with a manifest of row counts, sizes and SHA-256 checksums.
+"""
+
+import hashlib
+import json
+import os
+import shutil
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext
+
+import pandas as pd
+
+from .atomic import atomic_write_text
+from .columnar import append_partition, columnar_available, read_partition, write_feather
+from .dataset_store import partition_name
+from .schema import CSV_DTYPES, MASTER_COLUMN_ORDER, coerce_types, normalize_columns
+
+
+CHUNK_SIZE = 200000
+# Rows buffered per partition before they are written out.
+BUFFER_ROWS = 50000
+
+REQUIRED_COLUMNS = ['State', 'District', 'latitude', 'longitude']
+# Rows without these are dropped; rows without a district only go to their state.
+KEY_COLUMNS = ['State', 'latitude', 'longitude']
+
+
+def manifest_path(data_dir):
+    return os.path.join(data_dir, 'manifest.json')
+
+
+def load_manifest(data_dir):
+    """The manifest of the last partitioning run, or None."""
+    try:
+        with open(manifest_path(data_dir), encoding='utf-8') as handle:
+            return json.load(handle)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None
+
+
+class PartitionWriter:
+    """Buffers one partition's rows and appends them to its CSV, hashing what is written."""
+
+    def __init__(self, path, columns):
+        self.path = path
+        self.columns = columns
+        self.rows = 0
+        self.bytes = 0
+        self._buffer = []
+        self._buffered = 0
+        self._digest = hashlib.sha256()
+        self._pending = None
+
+    def add(self, df):
+        self._buffer.append(df)
+        self._buffered += len(df)
+        return self._buffered >= BUFFER_ROWS
+
+    def flush(self, pool=None):
+        """Writes the buffer, on ``pool`` if given (after the previous write finished)."""
+        if not self._buffer:
+            return
+        frames, self._buffer, self._buffered = self._buffer, [], 0
+        if self._pending is not None:
+            self._pending.result()
+        if pool is None:
+            self._write(frames)
+        else:
+            self._pending = pool.submit(self._write, frames)
+
+    def _write(self, frames):
+        df = pd.concat(frames, ignore_index=True)
+        data = df.to_csv(index=False, header=self.rows == 0, columns=self.columns).encode('utf-8')
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        with open(self.path, 'ab') as handle:
+            handle.write(data)
+        self._digest.update(data)
+        self.rows += len(df)
+        self.bytes += len(data)
+
+    def close(self):
+        """Waits for the last write; returns the manifest entry."""
+        if self._pending is not None:
+            self._pending.result()
+        return {'rows': self.rows, 'bytes': self.bytes, 'sha256': self._digest.hexdigest()}
+
+
+def _partition_keys(values):
+    """partition_name() of each value, computed once per distinct value."""
+    names = {value: partition_name(value) for value in values.dropna().unique()}
+    return values.map(names)
+
+
+def _file_entry(path, rows):
+    """Manifest entry of a partition file that has ``rows`` rows."""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as handle:
+        for block in iter(lambda: handle.read(1 << 20), b''):
+            digest.update(block)
+    return {'rows': rows, 'bytes': os.path.getsize(path), 'sha256': digest.hexdigest()}
+
+
+def _refresh_feather(csv_path):
+    """Rewrites the Feather copy of a partition from its new CSV."""
+    df = coerce_types(read_partition(csv_path, dtype=CSV_DTYPES, on_bad_lines='skip'))[MASTER_COLUMN_ORDER]
+    write_feather(df, csv_path[:-len('.csv')] + '.feather')
+
+
+def partition_dataset(input_path, data_dir, chunksize=CHUNK_SIZE, workers=None, log=print, swap_lock=None):
+    """
+    Splits ``input_path`` into ``data_dir``/states/<State>.csv and
+    ``data_dir``/districts/<State>/<District>.csv in one pass.
+
+    Rows without a state or coordinates are dropped; rows without a
+    district are only written to their state partition. Existing
+    Feather copies of rewritten partitions are regenerated. ``swap_lock``
+    is a context manager held while the new partitions are moved into
+    place, e.g. the ingest lock. Returns the manifest, which is also written
+    to ``data_dir``/manifest.json.
+    """
+    started = time.perf_counter()
+    staging = os.path.join(data_dir, '.partition-staging')
+    shutil.rmtree(staging, ignore_errors=True)
+    workers = workers or min(32, (os.cpu_count() or 1) * 2)
+
+    writers = {}
+    input_rows = kept_rows = 0
+    columns = None
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        for chunk in pd.read_csv(input_path, chunksize=chunksize, dtype=CSV_DTYPES, keep_default_na=True):
+            normalize_columns(chunk)
+            missing = [column for column in REQUIRED_COLUMNS if column not in chunk.columns]
+            if missing:
+                raise ValueError(f"Column(s) {', '.join(missing)} missing in {input_path}.")
+            columns = columns or list(chunk.columns)
+            input_rows += len(chunk)
+            chunk = chunk.dropna(subset=KEY_COLUMNS)
+            kept_rows += len(chunk)
+
+            state_keys = _partition_keys(chunk['State'])
+            district_keys = _partition_keys(chunk['District'])
+            groups = [(os.path.join('states', f'{state}.csv'), rows)
+                      for state, rows in chunk.groupby(state_keys, sort=False, observed=True)]
+            groups += [(os.path.join('districts', state, f'{district}.csv'), rows)
+                       for (state, district), rows in chunk.groupby([state_keys, district_keys], sort=False, observed=True)]
+            for relative, rows in groups:
+                writer = writers.get(relative)
+                if writer is None:
+                    writer = writers[relative] = PartitionWriter(os.path.join(staging, relative), columns)
+                if writer.add(rows):
+                    writer.flush(pool)
+
+        for writer in writers.values():
+            writer.flush(pool)
+        partitions = {relative.replace(os.sep, '/'): writer.close() for relative, writer in sorted(writers.items())}
+
+        # Move the new partitions into place, then refresh stale Feather copies.
+        with swap_lock or nullcontext():
+            refresh = []
+            for relative in writers:
+                target = os.path.join(data_dir, relative)
+                os.makedirs(os.path.dirname(target), exist_ok=True)
+                os.replace(os.path.join(staging, relative), target)
+                if os.path.exists(target[:-len('.csv')] + '.feather'):
+                    refresh.append(target)
+            if refresh and columnar_available():
+                list(pool.map(_refresh_feather, refresh))
+    shutil.rmtree(staging, ignore_errors=True)
+
+    manifest = {
+        'created_at': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'input': os.path.abspath(input_path),
+        'input_rows': input_rows,
+        'dropped_rows': input_rows - kept_rows,
+        'seconds': round(time.perf_counter() - started, 3),
+        'partitions': partitions,
+    }
+    atomic_write_text(json.dumps(manifest, indent=2), manifest_path(data_dir))
+    log(f"✅ Wrote {len(partitions)} partitions from {kept_rows} rows in {manifest['seconds']:.2f}s")
+    return manifest
+
+
+def append_to_partitions(chunks, data_dir, log=print):
+    """
+    Appends the rows of ``chunks`` (DataFrames with the partitioned columns)
+    to the partitions under ``data_dir``, creating missing ones, and updates
+    their manifest entries. Rows are kept or dropped as by partition_dataset().
+
+    Returns the partition names of the states that got new rows.
+    """
+    started = time.perf_counter()
+    manifest = load_manifest(data_dir) or {'input_rows': 0, 'dropped_rows': 0, 'partitions': {}}
+    added = {}
+    input_rows = kept_rows = 0
+    for chunk in chunks:
+        normalize_columns(chunk)
+        input_rows += len(chunk)
+        chunk = chunk.dropna(subset=KEY_COLUMNS)
+        kept_rows += len(chunk)
+
+        state_keys = _partition_keys(chunk['State'])
+        district_keys = _partition_keys(chunk['District'])
+        groups = [(('states', state), rows) for state, rows in chunk.groupby(state_keys, sort=False, observed=True)]
+        groups += [(('districts', state, district), rows)
+                   for (state, district), rows in chunk.groupby([state_keys, district_keys], sort=False, observed=True)]
+        for parts, rows in groups:
+            base_path = os.path.join(data_dir, *parts)
+            if os.path.exists(base_path + '.csv'):
+                # Keep the column order of the file being appended to.
+                header = normalize_columns(pd.read_csv(base_path + '.csv', nrows=0)).columns
+                rows = rows.reindex(columns=header)
+            append_partition(rows, base_path)
+            relative = '/'.join(parts) + '.csv'
+            added[relative] = added.get(relative, 0) + len(rows)
+
+    for relative, rows in added.items():
+        path = os.path.join(data_dir, *relative.split('/'))
+        if os.path.exists(path):
+            previous = manifest['partitions'].get(relative, {}).get('rows', 0)
+            manifest['partitions'][relative] = _file_entry(path, previous + rows)
+    manifest['partitions'] = dict(sorted(manifest['partitions'].items()))
+    manifest['input_rows'] += input_rows
+    manifest['dropped_rows'] += input_rows - kept_rows
+    manifest['updated_at'] = time.strftime('%Y-%m-%dT%H:%M:%S')
+    atomic_write_text(json.dumps(manifest, indent=2), manifest_path(data_dir))
+    log(f"✅ Appended {kept_rows} rows to {len(added)} partitions in {time.perf_counter() - started:.2f}s")
+    return sorted({relative.split('/')[1][:-len('.csv')] for relative in added if relative.startswith('states/')})
@@ -0,0 +1,169 @@
+# analyzer/utils/points.py
+
+"""
+Compact, paginated accident points for the district map.
+
+The district page used to embed every accident as a JSON object in its HTML.
+The map now loads pages of points from the points API instead. A page is
+columnar: coordinates are delta-encoded integers (in 1e-5 degree steps,
+about a metre), text columns are dictionary-encoded, and
+points are ordered by Accident_Index. New accidents always get the highest
+ids, so a point's position in that order is a stable cursor even while
+accidents are being added (ids alone are not unique in the source data).
+"""
+
+import base64
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+from django.conf import settings
+
+from .dataset_store import get_store, partition_name
+from .executor import coalesce
+from .hotspots import get_hotspots
+from .schema import time_labels
+
+
+# Points per page when the client doesn't ask for a page size, and the maximum.
+POINTS_PAGE_SIZE = getattr(settings, 'POINTS_PAGE_SIZE', 2000)
+POINTS_MAX_PAGE_SIZE = getattr(settings, 'POINTS_MAX_PAGE_SIZE', 10000)
+# Coordinates are sent as integers in 1/COORDINATE_SCALE degrees.
+COORDINATE_SCALE = 100000
+# How many districts' prepared points are kept in memory.
+CACHED_DISTRICTS = 32
+
+# Output name -> dataset column, for the dictionary-encoded columns.
+TEXT_COLUMNS = {
+    'date': 'Date',
+    'time': 'Time',
+    'severity': 'Accident_Severity',
+    'road_type': 'Road_Type',
+}
+
+
+def encode_cursor(position):
+    return base64.urlsafe_b64encode(str(int(position)).encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    """
+    The position a cursor resumes from; raises ValueError if it is invalid
+    (negative positions included; page() rejects the ones past the end).
+    """
+    padded = cursor + '=' * (-len(cursor) % 4)
+    try:
+        position = int(base64.urlsafe_b64decode(padded.encode()).decode())
+    except (UnicodeDecodeError, base64.binascii.Error) as error:
+        raise ValueError(f'Invalid cursor: {cursor}') from error
+    if position < 0:
+        raise ValueError(f'Invalid cursor: {cursor}')
+    return position
+
+
+def delta_encode(values, scale=1):
+    """Scaled, rounded integers as [first, second - first, ...]."""
+    integers = np.round(np.asarray(values, dtype=np.float64) * scale).astype(np.int64)
+    return np.diff(integers, prepend=0).tolist()
+
+
+def dictionary_encode(values):
+    """{'values': distinct values, 'codes': index per row (-1 for missing)}."""
+    codes, uniques = pd.factorize(values)
+    return {'values': [str(value) for value in uniques], 'codes': codes.tolist()}
+
+
+class DistrictPoints:
+    """Per-district points, sorted by id, with their hotspot labels."""
+
+    def __init__(self, store=None, hotspots=None):
+        self.store = store or get_store()
+        self.hotspots = hotspots or get_hotspots()
+        self._lock = threading.Lock()
+        self._cache = OrderedDict()
+
+    def _prepare(self, state, district):
+        """The district's rows with coordinates, labelled and sorted; None if unknown."""
+        key = (partition_name(state), partition_name(district))
+        self.store.refresh()
+        version = self.store.version
+        with self._lock:
+            cached = self._cache.get(key)
+            if cached is not None and cached[0] == version:
+                self._cache.move_to_end(key)
+                return cached[1]
+        # Concurrent requests for a district that isn't prepared yet share one build.
+        return coalesce(('points', id(self), key, version), lambda: self._build(state, district, key, version))
+
+    def _build(self, state, district, key, version):
+        df = self.store.district(state, district)
+        if df is None:
+            return None
+
+        df = df.dropna(subset=['latitude', 'longitude'])
+        df['cluster'] = self.hotspots.labels(state, district, df)
+        df = df.sort_values('Accident_Index', kind='stable', na_position='first').reset_index(drop=True)
+        df['Date'] = df['Date'].dt.strftime('%Y-%m-%d')
+        df['Time'] = time_labels(df['Time'])
+        with self._lock:
+            self._cache[key] = (version, df)
+            self._cache.move_to_end(key)
+            while len(self._cache) > CACHED_DISTRICTS:
+                self._cache.popitem(last=False)
+        return df
+
+    def page(self, state, district, bbox=None, start=0, limit=None):
+        """
+        One page of a district's points, or None if the district has no data.
+
+        ``bbox`` is (south, west, north, east); ``start`` is the position from
+        the previous page's cursor. The result has the matching ``total``, the
+        ``cursor`` of the next page (None on the last one) and the columns.
+        Raises ValueError if ``start`` is past the district's last point.
+        """
+        df = self._prepare(state, district)
+        if df is None:
+            return None
+        if not 0 <= start <= len(df):
+            raise ValueError(f'Cursor out of range: {start}')
+        limit = min(limit or POINTS_PAGE_SIZE, POINTS_MAX_PAGE_SIZE)
+
+        mask = np.ones(len(df), dtype=bool)
+        if bbox is not None:
+            south, west, north, east = bbox
+            latitudes, longitudes = df['latitude'].to_numpy(), df['longitude'].to_numpy()
+            mask &= (latitudes >= south) & (latitudes <= north) & (longitudes >= west) & (longitudes <= east)
+        total = int(mask.sum())
+        mask[:start] = False
+        positions = np.flatnonzero(mask)[:limit + 1]
+        has_more = len(positions) > limit
+        positions = positions[:limit]
+        rows = df.iloc[positions]
+
+        result = {
+            'total': total,
+            'count': len(rows),
+            'cursor': encode_cursor(positions[-1] + 1) if has_more else None,
+            'scale': COORDINATE_SCALE,
+            'lat': delta_encode(rows['latitude'], COORDINATE_SCALE),
+            'lon': delta_encode(rows['longitude'], COORDINATE_SCALE),
+            'cluster': rows['cluster'].tolist(),
+        }
+        for name, column in TEXT_COLUMNS.items():
+            result[name] = dictionary_encode(rows[column])
+        return result
+
+
+_points = None
+_points_lock = threading.Lock()
+
+
+def get_district_points():
+    """Returns the process-wide DistrictPoints, creating it on first use."""
+    global _points
+    if _points is None:
+        with _points_lock:
+            if _points is None:
+                _points = DistrictPoints()
+    return _points
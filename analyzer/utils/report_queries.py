@@ -0,0 +1,257 @@
+# analyzer/utils/report_queries.py
+
+"""
+Database storage mode: accident records in the AccidentReport table.
+
+With ``ACCIDENT_STORAGE = 'database'`` the chart counts of the dashboard,
+state and district pages come from SQL instead of the in-memory frame: each
+counter is one ``GROUP BY`` over the rows of the scope, which the
+(state, district, date) index narrows down, and the national severity counts
+are read from the severity index. The dataset store, which the maps, heat
+cells, district points, spatial queries and hotspot models read, loads the
+same table (``load_frame()``) instead of the partition files, and adds the
+rows inserted since as they appear (see DatasetStore).
+
+The URLs carry partition names ('Andhra_Pradesh'), the table the names as
+they appear in the data ('Andhra Pradesh'); the mapping between them is
+cached and refreshed when rows are added.
+
+Submitted reports are inserted into the table only (``submit()``); they
+don't go through the ingest log and partition files, so the table is the
+single source of truth in this mode.
+"""
+
+import threading
+
+import pandas as pd
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Count, Max
+from django.db.models.functions import TruncMonth
+from django.utils import timezone
+
+from ..models import AccidentReport
+from .aggregates import Summary
+from .dataset_store import partition_name
+from .schema import MASTER_COLUMN_ORDER, coerce_types, time_labels
+
+
+# 'files' (the dataset store, the default) or 'database' (AccidentReport).
+ACCIDENT_STORAGE = getattr(settings, 'ACCIDENT_STORAGE', 'files')
+# Rows per INSERT batch when importing.
+IMPORT_BATCH_SIZE = 5000
+
+# Summary name -> AccidentReport field it counts.
+COUNTED_FIELDS = {
+    'severity': 'severity',
+    'road_type': 'road_type',
+    'weather': 'weather_conditions',
+    'time': 'time',
+    'states': 'state',
+    'districts': 'district',
+}
+
+# Dataset column -> AccidentReport field.
+FIELD_COLUMNS = {
+    'Accident_Index': 'accident_index',
+    'Date': 'date',
+    'Time': 'time',
+    'latitude': 'latitude',
+    'longitude': 'longitude',
+    'Accident_Severity': 'severity',
+    'Number_of_Vehicles': 'number_of_vehicles',
+    'Number_of_Casualties': 'number_of_casualties',
+    'Road_Type': 'road_type',
+    'Weather_Conditions': 'weather_conditions',
+    'Light_Conditions': 'light_conditions',
+    'State': 'state',
+    'District': 'district',
+}
+
+
+def database_storage():
+    return ACCIDENT_STORAGE == 'database'
+
+
+def table_signature():
+    """
+    The state of the table as a dataset store signature entry,
+    (``'database:<table>#<highest id>'``, newest timestamp in ns, rows).
+    """
+    stats = AccidentReport.objects.aggregate(latest=Max('id'), modified=Max('timestamp'), rows=Count('id'))
+    modified = int(stats['modified'].timestamp() * 1e9) if stats['modified'] else 0
+    return (f"database:{AccidentReport._meta.db_table}#{stats['latest'] or 0}", modified, stats['rows'])
+
+
+def signature_latest(entry):
+    """The highest row id of a table_signature() entry, or None for any other entry."""
+    name = entry[0]
+    if not name.startswith(f'database:{AccidentReport._meta.db_table}#'):
+        return None
+    return int(name.rsplit('#', 1)[1])
+
+
+def load_frame(after=None, through=None):
+    """
+    The rows of the table (with ids in (``after``, ``through``] if given)
+    as a typed dataset frame, in id order; None if there are none.
+    """
+    queryset = AccidentReport.objects.order_by('id')
+    if after is not None:
+        queryset = queryset.filter(id__gt=after)
+    if through is not None:
+        queryset = queryset.filter(id__lte=through)
+    rows = list(queryset.values_list(*FIELD_COLUMNS.values()))
+    if not rows:
+        return None
+    df = coerce_types(pd.DataFrame.from_records(rows, columns=list(FIELD_COLUMNS)))
+    return df[MASTER_COLUMN_ORDER].reset_index(drop=True)
+
+
+def _field_values(df):
+    """Dataset column values as lists of database values (None for missing), per AccidentReport field."""
+    values = {}
+    for column, field in FIELD_COLUMNS.items():
+        series = df[column]
+        if column == 'Date':
+            series = pd.to_datetime(series, errors='coerce').dt.date
+        elif column in ('Accident_Index', 'Number_of_Vehicles', 'Number_of_Casualties'):
+            series = pd.to_numeric(series, errors='coerce').round().astype('Int64')
+        elif column in ('latitude', 'longitude'):
+            series = pd.to_numeric(series, errors='coerce')
+        elif column == 'Time':
+            series = time_labels(series)
+        values[field] = series.astype(object).where(series.notna(), None).tolist()
+    return values
+
+
+def import_frame(df, batch_size=IMPORT_BATCH_SIZE):
+    """
+    Inserts the rows of a typed dataset frame in one transaction and returns
+    how many there were.
+
+    Uses a parameterized INSERT with executemany(): building a model instance
+    per row made bulk_create() spend most of an import in the ORM.
+    """
+    ops = connection.ops
+    values = _field_values(df)
+    values['date'] = [None if value is None else ops.adapt_datefield_value(value) for value in values['date']]
+    values['timestamp'] = [ops.adapt_datetimefield_value(timezone.now())] * len(df)
+    fields = [AccidentReport._meta.get_field(name) for name in values]
+    rows = list(zip(*values.values()))
+    sql = 'INSERT INTO {} ({}) VALUES ({})'.format(
+        ops.quote_name(AccidentReport._meta.db_table),
+        ', '.join(ops.quote_name(field.column) for field in fields),
+        ', '.join(['%s'] * len(fields)),
+    )
+    with transaction.atomic(), connection.cursor() as cursor:
+        for start in range(0, len(rows), batch_size):
+            cursor.executemany(sql, rows[start:start + batch_size])
+    get_report_aggregates().invalidate()
+    return len(rows)
+
+
+def submit(record):
+    """
+    Inserts a submitted record with the next Accident_Index and returns it
+    with the index set.
+
+    The highest index is read and the row inserted in one transaction, which
+    SQLite's IMMEDIATE transactions serialize between writers.
+    """
+    with transaction.atomic():
+        latest = AccidentReport.objects.aggregate(latest=Max('accident_index'))['latest']
+        record = {**record, 'Accident_Index': (latest or 0) + 1}
+        import_frame(pd.DataFrame([record])[MASTER_COLUMN_ORDER])
+    return record
+
+
+class DatabaseAggregates:
+    """The AggregateCache interface (``summary``/``add``) answered with SQL."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        # Highest row id seen when the names were read, and partition name
+        # -> names in the table for states and (state, district) pairs.
+        self._names = (None, {}, {})
+
+    def invalidate(self):
+        with self._lock:
+            self._names = (None, {}, {})
+
+    def _resolve(self):
+        latest = AccidentReport.objects.aggregate(latest=Max('id'))['latest']
+        with self._lock:
+            if self._names[0] == latest and latest is not None:
+                return self._names
+        states, districts = {}, {}
+        pairs = AccidentReport.objects.values_list('state', 'district').distinct().order_by()
+        for state, district in pairs:
+            if state is None:
+                continue
+            state_key = partition_name(state)
+            states.setdefault(state_key, set()).add(state)
+            if district is not None:
+                districts.setdefault((state_key, partition_name(district)), set()).add(district)
+        with self._lock:
+            self._names = (latest, states, districts)
+        return self._names
+
+    def _scope(self, state, district):
+        """Rows of the scope, or None if it has no rows."""
+        queryset = AccidentReport.objects.order_by()
+        if not state:
+            return queryset
+        _, states, districts = self._resolve()
+        state_names = states.get(partition_name(state))
+        if not state_names:
+            return None
+        queryset = queryset.filter(state__in=state_names)
+        if district:
+            district_names = districts.get((partition_name(state), partition_name(district)))
+            if not district_names:
+                return None
+            queryset = queryset.filter(district__in=district_names)
+        return queryset
+
+    def summary(self, state=None, district=None):
+        """
+        Counts for the whole country, a state, or one district of a state.
+
+        Returns None if the requested state/district has no records.
+        """
+        queryset = self._scope(state, district)
+        if queryset is None:
+            return None
+        summary = Summary()
+        for name, field in COUNTED_FIELDS.items():
+            for value, count in queryset.values_list(field).annotate(count=Count('id')).values_list(field, 'count'):
+                if value is not None:
+                    summary[name][str(value)] = count
+        months = queryset.filter(date__isnull=False).annotate(month=TruncMonth('date'))
+        for month, count in months.values_list('month').annotate(count=Count('id')).values_list('month', 'count'):
+            summary['months'][month.strftime('%Y-%m')] = count
+        summary.total = queryset.count()
+        if state and not summary.total:
+            return None
+        return summary
+
+    def add(self, new_df, store_version=None):
+        """
+        Nothing to do: submitted rows are already in the table (see submit())
+        and the counts are queried from it.
+        """
+
+
+_report_aggregates = None
+_report_aggregates_lock = threading.Lock()
+
+
+def get_report_aggregates():
+    """Returns the process-wide DatabaseAggregates, creating it on first use."""
+    global _report_aggregates
+    if _report_aggregates is None:
+        with _report_aggregates_lock:
+            if _report_aggregates is None:
+                _report_aggregates = DatabaseAggregates()
+    return _report_aggregates
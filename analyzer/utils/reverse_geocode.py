@@ -0,0 +1,162 @@
+# analyzer/utils/reverse_geocode.py
+
+"""
+Offline batch reverse geocoding (coordinates -> state, district).
+
+Replaces one rate-limited Nominatim request per row with the shapefile
+polygons of ``geocoding.Geocoder``:
+
+1. coordinates are rounded to 1e-5 degrees (about a metre) and deduplicated;
+2. coordinates looked up before are answered from a persistent SQLite
+   key-value cache;
+3. the rest are split into chunks that are geocoded on a process pool, and
+   the results are added to the cache.
+
+The cache is cleared automatically when the shapefiles change.
+"""
+
+import os
+import sqlite3
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+from django.conf import settings
+
+from .geocoding import Geocoder, districts_shapefile, geocoding_available, states_shapefile
+
+
+# Coordinates are cached and deduplicated in 1/COORDINATE_SCALE degrees.
+COORDINATE_SCALE = 100000
+# Unique coordinates per worker task.
+CHUNK_SIZE = 50000
+
+_worker_geocoder = None
+
+
+def cache_path():
+    return os.path.join(settings.DATA_DIR, '.cache', 'reverse_geocode.sqlite3')
+
+
+def _shapefiles_signature(paths):
+    parts = []
+    for path in paths:
+        try:
+            stat = os.stat(path)
+            parts.append(f'{os.path.basename(path)}:{stat.st_mtime_ns}:{stat.st_size}')
+        except (FileNotFoundError, TypeError):
+            parts.append(f'{path}:missing')
+    return '|'.join(parts)
+
+
+class GeocodeCache:
+    """(lat, lon) in 1e-5 degrees -> (state, district), stored in SQLite."""
+
+    def __init__(self, path, signature):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.connection = sqlite3.connect(path)
+        self.connection.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+            CREATE TABLE IF NOT EXISTS places (
+                lat INTEGER, lon INTEGER, state TEXT, district TEXT,
+                PRIMARY KEY (lat, lon)
+            ) WITHOUT ROWID;
+            """
+        )
+        row = self.connection.execute("SELECT value FROM meta WHERE key = 'signature'").fetchone()
+        if row is None or row[0] != signature:
+            with self.connection:
+                self.connection.execute('DELETE FROM places')
+                self.connection.execute("INSERT OR REPLACE INTO meta VALUES ('signature', ?)", (signature,))
+
+    def get(self, lat_keys, lon_keys):
+        """Cached (states, districts, found) arrays for the keys."""
+        with self.connection:
+            self.connection.execute('CREATE TEMP TABLE IF NOT EXISTS wanted (position INTEGER, lat INTEGER, lon INTEGER)')
+            self.connection.execute('DELETE FROM wanted')
+            self.connection.executemany(
+                'INSERT INTO wanted VALUES (?, ?, ?)',
+                zip(range(len(lat_keys)), lat_keys.tolist(), lon_keys.tolist()),
+            )
+            rows = self.connection.execute(
+                'SELECT wanted.position, places.state, places.district '
+                'FROM wanted JOIN places ON places.lat = wanted.lat AND places.lon = wanted.lon'
+            ).fetchall()
+        states = np.full(len(lat_keys), None, dtype=object)
+        districts = np.full(len(lat_keys), None, dtype=object)
+        found = np.zeros(len(lat_keys), dtype=bool)
+        for position, state, district in rows:
+            states[position], districts[position], found[position] = state, district, True
+        return states, districts, found
+
+    def put(self, lat_keys, lon_keys, states, districts):
+        with self.connection:
+            self.connection.executemany(
+                'INSERT OR REPLACE INTO places VALUES (?, ?, ?, ?)',
+                zip(lat_keys.tolist(), lon_keys.tolist(), states.tolist(), districts.tolist()),
+            )
+
+    def close(self):
+        self.connection.close()
+
+
+def _init_worker(districts_path, states_path):
+    global _worker_geocoder
+    _worker_geocoder = Geocoder(districts_path, states_path)
+
+
+def _geocode_chunk(latitudes, longitudes):
+    """Runs in a worker process: (states, districts) of one chunk."""
+    found = _worker_geocoder.assign(pd.DataFrame({'latitude': latitudes, 'longitude': longitudes}))
+    return (
+        found['State'].where(found['State'].notna(), None).to_numpy(dtype=object),
+        found['District'].where(found['District'].notna(), None).to_numpy(dtype=object),
+    )
+
+
+def reverse_geocode(latitudes, longitudes, districts_path=None, states_path=None,
+                    cache_file=None, workers=None, chunk_size=CHUNK_SIZE):
+    """
+    State and district of each coordinate as a DataFrame with 'State' and
+    'District' columns (None where a point is in no polygon or has no
+    coordinates).
+    """
+    if not geocoding_available():
+        raise RuntimeError("Offline reverse geocoding needs shapely 2 and geopandas.")
+    districts_path = districts_path or districts_shapefile()
+    states_path = states_path or states_shapefile()
+    latitudes = pd.to_numeric(pd.Series(latitudes), errors='coerce').to_numpy(dtype=np.float64)
+    longitudes = pd.to_numeric(pd.Series(longitudes), errors='coerce').to_numpy(dtype=np.float64)
+    states = np.full(len(latitudes), None, dtype=object)
+    districts = np.full(len(latitudes), None, dtype=object)
+
+    valid = ~(np.isnan(latitudes) | np.isnan(longitudes))
+    keys = np.round(np.column_stack([latitudes[valid], longitudes[valid]]) * COORDINATE_SCALE).astype(np.int64)
+    unique_keys, inverse = np.unique(keys, axis=0, return_inverse=True)
+    lat_keys, lon_keys = unique_keys[:, 0], unique_keys[:, 1]
+
+    cache = GeocodeCache(cache_file or cache_path(), _shapefiles_signature([districts_path, states_path]))
+    try:
+        unique_states, unique_districts, found = cache.get(lat_keys, lon_keys)
+        missing = np.flatnonzero(~found)
+        if len(missing):
+            missing_lat = lat_keys[missing] / COORDINATE_SCALE
+            missing_lon = lon_keys[missing] / COORDINATE_SCALE
+            chunks = [slice(start, start + chunk_size) for start in range(0, len(missing), chunk_size)]
+            workers = min(workers or os.cpu_count() or 1, len(chunks))
+            with ProcessPoolExecutor(
+                max_workers=workers, initializer=_init_worker, initargs=(districts_path, states_path)
+            ) as pool:
+                results = pool.map(_geocode_chunk, [missing_lat[chunk] for chunk in chunks],
+                                   [missing_lon[chunk] for chunk in chunks])
+                for chunk, (chunk_states, chunk_districts) in zip(chunks, results):
+                    unique_states[missing[chunk]] = chunk_states
+                    unique_districts[missing[chunk]] = chunk_districts
+            cache.put(lat_keys[missing], lon_keys[missing], unique_states[missing], unique_districts[missing])
+    finally:
+        cache.close()
+
+    states[valid] = unique_states[inverse.ravel()]
+    districts[valid] = unique_districts[inverse.ravel()]
+    return pd.DataFrame({'State': states, 'District': districts})
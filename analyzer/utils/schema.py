@@ -0,0 +1,193 @@
+# analyzer/utils/schema.py
+
+"""
+Column types of the accident dataset.
+
+The typed frames used to keep ``Time`` as Python strings, the counts as
+float64 and the ids as Int64, and every load built its own categorical
+dictionaries. This module defines the compact types used everywhere the
+dataset is loaded (the dataset store and its consumers, the partitioner,
+Feather files and the database import):
+
+* the text columns are categoricals over one process-wide dictionary per
+  column (``CATEGORIES``), which only grows, so frames loaded at different
+  times share their categories and concatenate without re-encoding;
+* ``Accident_Index`` is a nullable int32 (int64 only if an id needs it);
+* ``Number_of_Vehicles``/``Number_of_Casualties`` are nullable int8 (int16 if
+  a count needs it);
+* ``latitude``/``longitude`` are float32;
+* ``Time`` is the minute of the day (0-1439) as a nullable int16;
+  ``time_labels()`` turns it back into 'HH:MM' for output;
+* ``Date`` stays datetime64.
+
+CSV files keep their text format; only the in-memory representation changes.
+"""
+
+import threading
+from collections import defaultdict
+
+import numpy as np
+import pandas as pd
+
+from analyzer.ml.code_maps import COLUMN_MAPS
+
+
+MASTER_COLUMN_ORDER = [
+    'Accident_Index', 'Date', 'Time', 'latitude', 'longitude',
+    'Accident_Severity', 'Number_of_Vehicles', 'Number_of_Casualties',
+    'Road_Type', 'Weather_Conditions', 'Light_Conditions', 'State', 'District'
+]
+
+CATEGORICAL_COLUMNS = [
+    'Accident_Severity', 'Road_Type', 'Weather_Conditions', 'Light_Conditions',
+    'State', 'District'
+]
+COUNT_COLUMNS = ['Number_of_Vehicles', 'Number_of_Casualties']
+COORDINATE_COLUMNS = ['latitude', 'longitude']
+
+# read_csv() dtypes for dataset files: text columns are parsed straight into
+# categoricals, everything else as strings for coerce_types(). Some
+# partitions have lower-case state/district headers.
+CSV_DTYPES = defaultdict(
+    lambda: str, {column: 'category' for column in [*CATEGORICAL_COLUMNS, 'state', 'district']}
+)
+
+MINUTES_PER_DAY = 24 * 60
+# 'HH:MM' label of every minute of the day.
+TIME_LABELS = np.array([f'{minute // 60:02d}:{minute % 60:02d}' for minute in range(MINUTES_PER_DAY)], dtype=object)
+
+
+def normalize_columns(df):
+    """Some partitions were written with lower-case 'state'/'district' headers."""
+    df.rename(columns={'state': 'State', 'district': 'District'}, inplace=True)
+    return df
+
+
+class CategoryDictionaries:
+    """
+    The shared categories of each text column.
+
+    Categories are only ever appended, so codes never change meaning and a
+    dtype handed out earlier is a prefix of the current one. The coded
+    columns start with the labels of their code map.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._dtypes = {
+            column: pd.CategoricalDtype(sorted(set(COLUMN_MAPS[column].values())) if column in COLUMN_MAPS else [])
+            for column in CATEGORICAL_COLUMNS
+        }
+
+    def dtype(self, column, values=()):
+        """The column's dtype, extended with any of ``values`` it doesn't know yet."""
+        dtype = self._dtypes[column]
+        new = pd.Index(values).dropna().unique().difference(dtype.categories)
+        if new.empty:
+            return dtype
+        with self._lock:
+            dtype = self._dtypes[column]
+            new = new.difference(dtype.categories)
+            if not new.empty:
+                dtype = self._dtypes[column] = pd.CategoricalDtype([*dtype.categories, *sorted(new)])
+        return dtype
+
+
+CATEGORIES = CategoryDictionaries()
+
+
+def categorize(series, column):
+    """``series`` as a categorical over the shared categories of ``column``."""
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        values = series.cat.remove_unused_categories().cat.categories
+    else:
+        values = series.unique()
+    return series.astype(CATEGORIES.dtype(column, values))
+
+
+def concat(frames):
+    """
+    pd.concat() of dataset frames that keeps the text columns categorical.
+
+    Categoricals with different categories would concatenate to object
+    columns, so every frame is first moved onto the shared categories.
+    """
+    frames = [normalize_columns(frame.copy(deep=False)) for frame in frames]
+    for column in CATEGORICAL_COLUMNS:
+        columns = [frame[column] for frame in frames if column in frame.columns]
+        if not columns:
+            continue
+        values = [
+            series.cat.categories if isinstance(series.dtype, pd.CategoricalDtype) else series.unique()
+            for series in columns
+        ]
+        dtype = CATEGORIES.dtype(column, np.concatenate(values))
+        for frame in frames:
+            if column in frame.columns:
+                frame[column] = frame[column].astype(dtype)
+    return pd.concat(frames, ignore_index=True, sort=False)
+
+
+def smallest_int(values, dtypes=('Int8', 'Int16', 'Int32', 'Int64')):
+    """Whole numbers in ``values`` as the first nullable integer dtype they fit in."""
+    values = pd.to_numeric(values, errors='coerce').round()
+    for dtype in dtypes:
+        info = np.iinfo(dtype.lower())
+        if values.dropna().between(info.min, info.max).all():
+            return values.astype(dtype)
+    return values.astype('Int64')
+
+
+def _minutes(text):
+    """Minute of the day of an 'H:MM' or 'HH:MM[:SS]' text, or None."""
+    parts = str(text).strip().split(':')
+    if len(parts) < 2 or not parts[0].isdigit() or not parts[1][:2].isdigit():
+        return None
+    hours, minutes = int(parts[0]), int(parts[1][:2])
+    return hours * 60 + minutes if hours < 24 and minutes < 60 else None
+
+
+def time_minutes(series):
+    """'HH:MM' times (or minutes already) as nullable int16 minutes of the day."""
+    if pd.api.types.is_numeric_dtype(series.dtype) and not isinstance(series.dtype, pd.CategoricalDtype):
+        return series.astype('Int16')
+    # Parse each distinct text once; there are at most a few thousand.
+    codes, uniques = pd.factorize(series)
+    table = pd.array([_minutes(value) for value in uniques] + [None], dtype='Int16')
+    return pd.Series(table.take(codes), index=series.index)
+
+
+def time_labels(series):
+    """Times (minutes or text) as a categorical of 'HH:MM' labels."""
+    minutes = time_minutes(series)
+    codes = minutes.fillna(-1).to_numpy(dtype=np.int16)
+    return pd.Series(pd.Categorical.from_codes(codes, categories=TIME_LABELS), index=series.index)
+
+
+def coerce_types(df):
+    """
+    Applies the compact column types (see the module docstring), in place.
+
+    Invalid numbers, dates and times become missing values.
+    """
+    normalize_columns(df)
+    for column in MASTER_COLUMN_ORDER:
+        if column not in df.columns:
+            df[column] = np.nan
+
+    # Drop header lines that were appended into the middle of a CSV file.
+    if df['Accident_Index'].dtype == object:
+        df.drop(df.index[df['Accident_Index'] == 'Accident_Index'], inplace=True)
+
+    # Ids were written as floats ('13000.0').
+    df['Accident_Index'] = smallest_int(df['Accident_Index'], ('Int32', 'Int64'))
+    for column in COORDINATE_COLUMNS:
+        df[column] = pd.to_numeric(df[column], errors='coerce').astype('float32')
+    for column in COUNT_COLUMNS:
+        df[column] = smallest_int(df[column], ('Int8', 'Int16', 'Int32'))
+    if not pd.api.types.is_datetime64_any_dtype(df['Date'].dtype):
+        df['Date'] = pd.to_datetime(df['Date'], errors='coerce')
+    df['Time'] = time_minutes(df['Time'])
+    for column in CATEGORICAL_COLUMNS:
+        df[column] = categorize(df[column], column)
+    return df
@@ -0,0 +1,223 @@
+# analyzer/utils/snapshots.py
+
+"""
+Memory-mapped snapshots of the typed dataset, shared by worker processes.
+
+Every worker process used to parse the partitions and keep its own copy of
+the national frame, so each extra worker added another copy to the RAM in
+use. Now the first process to load a version of the data publishes it as a
+snapshot: one ``.npy`` file per column array (category codes, integer
+values and their missing-value masks, float32 coordinates, datetime64
+dates), the row positions of every state and district, and the scope
+digests. Every process, including the publisher, maps the files read-only
+(``np.load(mmap_mode='r')``) and builds its DataFrame on top of them without
+copying, so the data is held once in the page cache no matter how many
+workers attach. Put SNAPSHOT_DIR on a tmpfs such as /dev/shm to keep it in RAM.
+
+A snapshot holds the rows of the partition files; submissions still in the
+ingest log are added by each process on top of it, and a new snapshot is
+published when the log is flushed (see DatasetStore), so a submission never
+rewrites the snapshot.
+
+``current.json`` names the snapshot in use and is replaced atomically when a
+new version is published. Publishing happens under a file lock, so only one
+process builds a given version. Processes still using an older snapshot keep
+their mapping (unlinked files stay readable while mapped); only the
+KEEP_SNAPSHOTS newest snapshot directories are kept.
+"""
+
+import json
+import os
+import shutil
+import time
+from contextlib import contextmanager
+
+import numpy as np
+import pandas as pd
+from django.conf import settings
+
+from .atomic import atomic_write_text
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - not available on Windows
+    fcntl = None
+
+
+# Publish the loaded dataset as a shared snapshot and attach to it.
+SHARED_DATASET = getattr(settings, 'SHARED_DATASET', True)
+# Where snapshots live (default: DATA_DIR/.snapshots).
+SNAPSHOT_DIR = getattr(settings, 'SNAPSHOT_DIR', None)
+# Snapshot directories kept, the current one included.
+KEEP_SNAPSHOTS = 3
+
+# Nullable columns, stored as their values plus a missing-value mask.
+MASKED_ARRAYS = (pd.arrays.IntegerArray, pd.arrays.FloatingArray, pd.arrays.BooleanArray)
+
+CURRENT_FILE = 'current.json'
+META_FILE = 'meta.json'
+
+
+def snapshot_dir(data_dir):
+    return SNAPSHOT_DIR or os.path.join(data_dir, '.snapshots')
+
+
+@contextmanager
+def publish_lock(directory):
+    """Serializes publishing between processes (a no-op without fcntl)."""
+    os.makedirs(directory, exist_ok=True)
+    with open(os.path.join(directory, '.lock'), 'a') as handle:
+        if fcntl is not None:
+            fcntl.flock(handle, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(handle, fcntl.LOCK_UN)
+
+
+def read_current(directory):
+    """Metadata of the current snapshot (with its ``path``), or None."""
+    try:
+        with open(os.path.join(directory, CURRENT_FILE), encoding='utf-8') as handle:
+            name = json.load(handle)['snapshot']
+        path = os.path.join(directory, name)
+        with open(os.path.join(path, META_FILE), encoding='utf-8') as handle:
+            meta = json.load(handle)
+    except (FileNotFoundError, KeyError, json.JSONDecodeError):
+        return None
+    meta['path'] = path
+    return meta
+
+
+def signature_key(signature):
+    """A file signature as stored in the metadata (JSON turns tuples into lists)."""
+    return [list(entry) for entry in signature]
+
+
+def _save(path, name, array):
+    np.save(os.path.join(path, name), np.ascontiguousarray(array))
+    return name
+
+
+def _save_positions(path, name, rows):
+    """Concatenates the row positions of every scope; returns (file, [(scope, start, stop)])."""
+    scopes, arrays, start = [], [], 0
+    for scope, positions in rows.items():
+        arrays.append(np.asarray(positions, dtype=np.int64))
+        scopes.append([scope, start, start + len(positions)])
+        start += len(positions)
+    _save(path, name, np.concatenate(arrays) if arrays else np.array([], dtype=np.int64))
+    return {'file': name, 'scopes': scopes}
+
+
+def publish(directory, df, state_rows, district_rows, digests, signature):
+    """
+    Writes a new snapshot of ``df`` and its indexes and makes it current.
+
+    ``digests`` maps scopes (None, state, (state, district)) to
+    (rows, hash sum, modified). Call under publish_lock(). Returns the
+    snapshot's metadata.
+    """
+    name = f'{time.time_ns()}-{os.getpid()}'
+    staging = os.path.join(directory, f'.tmp-{name}')
+    os.makedirs(staging)
+    try:
+        columns = []
+        for position, column in enumerate(df.columns):
+            series = df[column]
+            dtype = series.dtype
+            if series.dtype == object:
+                series, dtype = series.astype('category'), 'category'
+            if isinstance(dtype, pd.CategoricalDtype):
+                columns.append({
+                    'name': column, 'kind': 'category',
+                    'codes': _save(staging, f'{position}.codes.npy', series.cat.codes.to_numpy()),
+                    'categories': [str(value) for value in dtype.categories],
+                })
+            elif isinstance(series.array, MASKED_ARRAYS):
+                columns.append({
+                    'name': column, 'kind': 'masked', 'dtype': str(dtype),
+                    'values': _save(
+                        staging, f'{position}.values.npy', series.to_numpy(dtype=dtype.numpy_dtype, na_value=0)
+                    ),
+                    'mask': _save(staging, f'{position}.mask.npy', series.isna().to_numpy()),
+                })
+            else:
+                columns.append({
+                    'name': column, 'kind': 'numpy',
+                    'values': _save(staging, f'{position}.values.npy', series.to_numpy()),
+                })
+        meta = {
+            'name': name,
+            'rows': len(df),
+            'signature': signature_key(signature),
+            'columns': columns,
+            'states': _save_positions(staging, 'states.npy', state_rows),
+            'districts': _save_positions(
+                staging, 'districts.npy', {f'{state}/{district}': rows for (state, district), rows in district_rows.items()}
+            ),
+            'digests': [
+                [*(scope if isinstance(scope, tuple) else (scope, None)), rows, str(total), modified]
+                for scope, (rows, total, modified) in digests.items()
+            ],
+        }
+        with open(os.path.join(staging, META_FILE), 'w', encoding='utf-8') as handle:
+            json.dump(meta, handle)
+        os.rename(staging, os.path.join(directory, name))
+    except BaseException:
+        shutil.rmtree(staging, ignore_errors=True)
+        raise
+    atomic_write_text(json.dumps({'snapshot': name}), os.path.join(directory, CURRENT_FILE))
+    _remove_old(directory, name)
+    meta['path'] = os.path.join(directory, name)
+    return meta
+
+
+def _remove_old(directory, current):
+    names = sorted(
+        (name for name in os.listdir(directory) if name[:1].isdigit() and name != current),
+        key=lambda name: int(name.split('-')[0]),
+    )
+    for name in names[:max(0, len(names) - (KEEP_SNAPSHOTS - 1))]:
+        shutil.rmtree(os.path.join(directory, name), ignore_errors=True)
+
+
+def _positions(meta, path, entry):
+    positions = np.load(os.path.join(path, entry['file']), mmap_mode='r')
+    return {scope: positions[start:stop] for scope, start, stop in entry['scopes']}
+
+
+def attach(meta):
+    """
+    Maps a snapshot: returns (frame, state rows, district rows, digests).
+
+    The frame's columns are read-only views of the mapped files.
+    """
+    path = meta['path']
+
+    def load(name):
+        return np.load(os.path.join(path, name), mmap_mode='r')
+
+    arrays = {}
+    for column in meta['columns']:
+        if column['kind'] == 'category':
+            arrays[column['name']] = pd.Categorical.from_codes(
+                load(column['codes']), dtype=pd.CategoricalDtype(column['categories']), validate=False
+            )
+        elif column['kind'] == 'masked':
+            array_type = pd.api.types.pandas_dtype(column['dtype']).construct_array_type()
+            arrays[column['name']] = array_type(load(column['values']), load(column['mask']))
+        else:
+            arrays[column['name']] = load(column['values'])
+    df = pd.DataFrame(arrays, index=pd.RangeIndex(meta['rows']), copy=False)
+
+    state_rows = _positions(meta, path, meta['states'])
+    district_rows = {
+        tuple(scope.split('/', 1)): rows for scope, rows in _positions(meta, path, meta['districts']).items()
+    }
+    digests = {}
+    for state, district, rows, total, modified in meta['digests']:
+        scope = (state, district) if district is not None else state
+        digests[scope] = (rows, int(total), modified)
+    return df, state_rows, district_rows, digests
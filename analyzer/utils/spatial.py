@@ -0,0 +1,218 @@
+# analyzer/utils/spatial.py
+
+"""
+Spatial index over the accident coordinates.
+
+Answers "accidents in this viewport", "accidents within 2 km of here" and
+"the k nearest accidents" without masking the whole frame. Each scope (the
+whole country, a state or a district) gets an index per dataset version:
+
+* points sorted by latitude, so a bounding box is two binary searches plus a
+  longitude check on the rows in that latitude band;
+* a haversine BallTree (built on first use) for radius and k-nearest queries,
+  with distances in metres.
+
+Query results are row positions in the dataset store's frame.
+"""
+
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+from branca.element import MacroElement
+from django.conf import settings
+from jinja2 import Template
+from sklearn.neighbors import BallTree
+
+from .dataset_store import get_store, partition_name, value_counts
+from .executor import coalesce
+from .hotspots import EARTH_RADIUS_METRES, to_radians
+from .schema import time_labels
+
+
+# Radius searched around a point clicked on the maps.
+SPATIAL_CLICK_RADIUS_METRES = getattr(settings, 'SPATIAL_CLICK_RADIUS_METRES', 2000)
+# Largest radius a radius query may ask for.
+SPATIAL_MAX_RADIUS_METRES = getattr(settings, 'SPATIAL_MAX_RADIUS_METRES', 100000)
+# Most points a query returns (the match count is always complete).
+SPATIAL_MAX_RESULTS = getattr(settings, 'SPATIAL_MAX_RESULTS', 10000)
+# How many state/district indexes are kept in memory besides the national one.
+CACHED_INDEXES = 64
+
+
+class SpatialIndex:
+    """
+    Latitude-sorted points with a lazily built haversine BallTree.
+
+    ``frame`` is the frame the positions refer to, if any.
+    """
+
+    def __init__(self, positions, latitudes, longitudes, frame=None):
+        latitudes = np.asarray(latitudes, dtype=np.float64)
+        longitudes = np.asarray(longitudes, dtype=np.float64)
+        valid = ~(np.isnan(latitudes) | np.isnan(longitudes))
+        order = np.argsort(latitudes[valid], kind='stable')
+        self.positions = np.asarray(positions)[valid][order]
+        self.latitudes = latitudes[valid][order]
+        self.longitudes = longitudes[valid][order]
+        self.frame = frame
+        self._tree = None
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.positions)
+
+    def _get_tree(self):
+        if self._tree is None:
+            with self._lock:
+                if self._tree is None:
+                    self._tree = BallTree(to_radians(self.latitudes, self.longitudes), metric='haversine')
+        return self._tree
+
+    def bbox(self, south, west, north, east):
+        """Positions of the points inside the box, ordered by latitude."""
+        lo = np.searchsorted(self.latitudes, south, side='left')
+        hi = np.searchsorted(self.latitudes, north, side='right')
+        longitudes = self.longitudes[lo:hi]
+        inside = (longitudes >= west) & (longitudes <= east)
+        return self.positions[lo:hi][inside]
+
+    def radius(self, latitude, longitude, metres):
+        """(positions, distances in metres) within ``metres``, nearest first."""
+        if not len(self):
+            return self.positions[:0], np.array([], dtype=np.float64)
+        indices, distances = self._get_tree().query_radius(
+            to_radians([latitude], [longitude]), r=metres / EARTH_RADIUS_METRES,
+            return_distance=True, sort_results=True,
+        )
+        return self.positions[indices[0]], distances[0] * EARTH_RADIUS_METRES
+
+    def nearest(self, latitude, longitude, k):
+        """(positions, distances in metres) of the ``k`` nearest points."""
+        k = min(k, len(self))
+        if not k:
+            return self.positions[:0], np.array([], dtype=np.float64)
+        distances, indices = self._get_tree().query(to_radians([latitude], [longitude]), k=k)
+        return self.positions[indices[0]], distances[0] * EARTH_RADIUS_METRES
+
+
+class SpatialIndexes:
+    """Spatial indexes per scope, rebuilt when the dataset version changes."""
+
+    def __init__(self, store=None):
+        self.store = store or get_store()
+        self._lock = threading.Lock()
+        self._indexes = OrderedDict()
+
+    def index(self, state=None, district=None):
+        """The index of the country, a state or a district; None if it has no data."""
+        key = (partition_name(state) if state else None, partition_name(district) if district else None)
+        self.store.refresh()
+        version = self.store.version
+        with self._lock:
+            cached = self._indexes.get(key)
+            if cached is not None and cached[0] == version:
+                self._indexes.move_to_end(key)
+                return cached[1]
+        # Concurrent requests for a scope that isn't indexed yet share one build.
+        return coalesce(('spatial', id(self), key, version), lambda: self._build(state, district, key))
+
+    def _build(self, state, district, key):
+        # The frame, the scope's rows and the version come from one snapshot,
+        # so the positions always point into the frame they are cached with.
+        version, frame, df = self.store.scope(state, district)
+        if df is None:
+            return None
+        # Frames from the store keep the frame's row numbers as their index.
+        index = SpatialIndex(df.index.to_numpy(), df['latitude'].to_numpy(), df['longitude'].to_numpy(), frame)
+
+        with self._lock:
+            cached = self._indexes.get(key)
+            # A slower build of an older snapshot must not replace a newer index.
+            if cached is None or cached[0] <= version:
+                self._indexes[key] = (version, index)
+            self._indexes.move_to_end(key)
+            # The national index is the most expensive one; never evict it.
+            while len(self._indexes) > CACHED_INDEXES + 1:
+                oldest = next(name for name in self._indexes if name != (None, None))
+                del self._indexes[oldest]
+        return index
+
+    @staticmethod
+    def results(index, positions, distances=None, limit=None):
+        """
+        JSON-friendly result of a query on ``index``: the match count, severity
+        counts of all matches and up to ``limit`` points as columns.
+        """
+        limit = min(limit or SPATIAL_MAX_RESULTS, SPATIAL_MAX_RESULTS)
+        matches = index.frame.take(positions)
+        shown = matches.head(limit)
+        points = {
+            'id': [None if pd.isna(value) else int(value) for value in shown['Accident_Index']],
+            'lat': np.round(shown['latitude'].to_numpy(dtype=np.float64), 5).tolist(),
+            'lon': np.round(shown['longitude'].to_numpy(dtype=np.float64), 5).tolist(),
+            'date': shown['Date'].dt.strftime('%Y-%m-%d').fillna('').tolist(),
+            'time': time_labels(shown['Time']).astype(object).fillna('').tolist(),
+            'severity': shown['Accident_Severity'].astype(str).tolist(),
+        }
+        if distances is not None:
+            points['distance_m'] = np.round(distances[:limit], 1).tolist()
+        return {
+            'count': len(matches),
+            'returned': len(shown),
+            'severity_counts': {str(key): int(value) for key, value in value_counts(matches['Accident_Severity']).items()},
+            'points': points,
+        }
+
+
+class NearbyAccidentsTool(MacroElement):
+    """
+    Folium element that shows the accidents around a clicked point in a popup,
+    using the radius query endpoint.
+    """
+
+    _template = Template(
+        """
+        {% macro script(this, kwargs) %}
+            (function() {
+                var map = {{ this.map_name }};
+                var url = {{ this.url|tojson }};
+                var metres = {{ this.metres }};
+                map.on('click', function(event) {
+                    var query = 'lat=' + event.latlng.lat + '&lon=' + event.latlng.lng + '&radius=' + metres + '&limit=1';
+                    fetch(url + (url.indexOf('?') === -1 ? '?' : '&') + query, { headers: { 'Accept': 'application/json' } })
+                        .then(function(response) { return response.json(); })
+                        .then(function(data) {
+                            var lines = ['<b>' + data.count + ' accidents within ' + (metres / 1000) + ' km</b>'];
+                            Object.keys(data.severity_counts).forEach(function(severity) {
+                                lines.push(severity + ': ' + data.severity_counts[severity]);
+                            });
+                            L.popup().setLatLng(event.latlng).setContent(lines.join('<br>')).openOn(map);
+                        });
+                });
+            })();
+        {% endmacro %}
+        """
+    )
+
+    def __init__(self, folium_map, url, metres=None):
+        super().__init__()
+        self._name = 'NearbyAccidentsTool'
+        self.map_name = folium_map.get_name()
+        self.url = url
+        self.metres = metres or SPATIAL_CLICK_RADIUS_METRES
+
+
+_indexes = None
+_indexes_lock = threading.Lock()
+
+
+def get_spatial_indexes():
+    """Returns the process-wide SpatialIndexes, creating it on first use."""
+    global _indexes
+    if _indexes is None:
+        with _indexes_lock:
+            if _indexes is None:
+                _indexes = SpatialIndexes()
+    return _indexes
@@ -0,0 +1,121 @@
+# analyzer/utils/vocabulary.py
+
+"""
+Distinct values of the coded columns, for the submit form's dropdowns.
+
+The form used to load the whole national dataset to call unique() on three
+columns. The vocabularies are now the labels of the code maps plus every value
+seen in the data, kept in memory and persisted to ``DATA_DIR/vocabulary.json``,
+so the form only needs the dataset the very first time they are built.
+Submissions add their values through ``add()``.
+"""
+
+import json
+import os
+import threading
+import time
+
+from django.conf import settings
+
+from ..ml.code_maps import COLUMN_MAPS
+from .atomic import atomic_write_text
+from .dataset_store import CHECK_INTERVAL, get_store, value_counts
+from .locks import file_lock
+from .wal import ingest_dir
+
+
+class Vocabulary:
+    """Sorted distinct values per coded column, shared by all processes via a JSON file."""
+
+    def __init__(self, data_dir=None, store=None):
+        self.data_dir = data_dir or settings.DATA_DIR
+        self.store = store or get_store()
+        self.path = os.path.join(self.data_dir, 'vocabulary.json')
+        self._lock = threading.Lock()
+        self._values = None
+        self._mtime = None
+        self._last_check = 0.0
+
+    def _lock_path(self):
+        return os.path.join(ingest_dir(self.data_dir), 'vocabulary.lock')
+
+    def _read(self):
+        """The persisted vocabularies and the file's mtime, or (None, None)."""
+        try:
+            mtime = os.stat(self.path).st_mtime_ns
+            with open(self.path, encoding='utf-8') as handle:
+                return {column: set(values) for column, values in json.load(handle).items()}, mtime
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None, None
+
+    def _write(self, values):
+        text = json.dumps({column: sorted(values[column]) for column in sorted(values)}, indent=2)
+        atomic_write_text(text, self.path)
+        return os.stat(self.path).st_mtime_ns
+
+    def _build(self):
+        """Code map labels plus the values found in the dataset."""
+        values = {column: set(code_map.values()) for column, code_map in COLUMN_MAPS.items()}
+        df = self.store.frame()
+        if df is not None:
+            for column in values:
+                values[column].update(str(value) for value in value_counts(df[column]).index)
+        return values
+
+    def _sync(self):
+        now = time.monotonic()
+        if self._values is not None and now - self._last_check < CHECK_INTERVAL:
+            return
+        with self._lock:
+            self._last_check = now
+            try:
+                mtime = os.stat(self.path).st_mtime_ns
+            except FileNotFoundError:
+                mtime = None
+            if self._values is not None and mtime == self._mtime:
+                return
+            values, mtime = self._read()
+            if values is None:
+                with file_lock(self._lock_path()):
+                    values, mtime = self._read()
+                    if values is None:
+                        values = self._build()
+                        mtime = self._write(values)
+            self._values, self._mtime = values, mtime
+
+    def values(self, column):
+        """Sorted distinct values of ``column`` (e.g. 'Road_Type')."""
+        self._sync()
+        return sorted(self._values.get(column, ()))
+
+    def add(self, new_df):
+        """Adds the values of newly ingested rows; persists only if something is new."""
+        self._sync()
+        new_values = {}
+        for column in COLUMN_MAPS:
+            seen = {str(value) for value in new_df[column].dropna()}
+            if not seen <= self._values.get(column, set()):
+                new_values[column] = seen
+        if not new_values:
+            return
+        with self._lock, file_lock(self._lock_path()):
+            # Merge with the file, which another process may have updated.
+            values, _ = self._read()
+            values = values or self._values
+            for column, seen in new_values.items():
+                values.setdefault(column, set()).update(seen)
+            self._values, self._mtime = values, self._write(values)
+
+
+_vocabulary = None
+_vocabulary_lock = threading.Lock()
+
+
+def get_vocabulary():
+    """Returns the process-wide Vocabulary, creating it on first use."""
+    global _vocabulary
+    if _vocabulary is None:
+        with _vocabulary_lock:
+            if _vocabulary is None:
+                _vocabulary = Vocabulary()
+    return _vocabulary
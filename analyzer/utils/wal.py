@@ -0,0 +1,60 @@
+# analyzer/utils/wal.py
+
+"""
+Write-ahead log files for submitted accident records.
+
+Records are appended to ``DATA_DIR/.ingest/wal.jsonl`` (one JSON object per
+line, fsync'ed) before a submission is acknowledged. A flush renames the log
+to ``wal.flushing.jsonl`` and writes its records to the partitions. Readers
+treat the records in both files as part of the dataset until they are flushed.
+Flushed records are kept in ``submitted.jsonl`` so they can be restored when
+the partitions are rebuilt from the source files.
+"""
+
+import json
+import os
+
+
+def ingest_dir(data_dir):
+    return os.path.join(data_dir, '.ingest')
+
+
+def wal_path(data_dir):
+    return os.path.join(ingest_dir(data_dir), 'wal.jsonl')
+
+
+def flushing_path(data_dir):
+    return os.path.join(ingest_dir(data_dir), 'wal.flushing.jsonl')
+
+
+def submitted_path(data_dir):
+    return os.path.join(ingest_dir(data_dir), 'submitted.jsonl')
+
+
+def wal_files(data_dir):
+    """The log files that currently hold unflushed records, oldest first."""
+    return [path for path in (flushing_path(data_dir), wal_path(data_dir)) if os.path.exists(path)]
+
+
+def append_record(path, record):
+    """Appends one record and forces it to disk."""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'a', encoding='utf-8') as handle:
+        handle.write(json.dumps(record) + '\n')
+        handle.flush()
+        os.fsync(handle.fileno())
+
+
+def read_records(path):
+    """All complete records in a log file; a torn last line is ignored."""
+    records = []
+    try:
+        with open(path, encoding='utf-8') as handle:
+            for line in handle:
+                try:
+                    records.append(json.loads(line))
+                except json.JSONDecodeError:
+                    break
+    except FileNotFoundError:
+        pass
+    return records
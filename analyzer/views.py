@@ -1,76 +1,96 @@
 # analyzer/views.py
 
-import os
 import pandas as pd
 import json
 import folium
 from folium.plugins import HeatMap
 from django.shortcuts import render
 from django.shortcuts import redirect
-from django.conf import settings
-from django.http import Http404
-import joblib
-from sklearn.preprocessing import StandardScaler
-from sklearn.cluster import DBSCAN
+from django.http import Http404, HttpResponse, HttpResponseForbidden, JsonResponse
+from django.urls import reverse
+from urllib.parse import urlencode
 from django.contrib.auth.forms import UserCreationForm, AuthenticationForm
 from django.contrib.auth import login, logout, authenticate
 from django.contrib import messages
 from django.contrib.auth.decorators import login_required
+from rest_framework.decorators import api_view
+from rest_framework.exceptions import ValidationError
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+from .models import BackgroundJob
+from .serializers import BboxQuerySerializer, NearestQuerySerializer, PointsQuerySerializer, RadiusQuerySerializer
+from .utils import ingest, jobs, report_queries
+from .utils.aggregates import Summary, get_aggregates
+from .utils.catalog import get_catalog
+from .utils.conditional import dataset_conditional, query_scope, url_scope
+from .utils.dataset_store import get_store
+from .utils.executor import offload
+from .utils.fragments import cached_fragment, invalidate_fragments
+from .utils.geocoding import get_geocoder
+from .utils.instrumentation import METRICS_ALLOWED_IPS, render_metrics, span
+from .utils.heatmap_grid import HeatCellLoader, clamp_zoom, get_heat_grid
+from .utils.points import get_district_points
+from .utils.schema import MASTER_COLUMN_ORDER
+from .utils.spatial import SPATIAL_CLICK_RADIUS_METRES, NearbyAccidentsTool, SpatialIndexes, get_spatial_indexes
+from .utils.vocabulary import get_vocabulary
 
 
 # --- Helper Function ---
-def load_data(file_path):
-    """Loads a CSV file into a pandas DataFrame."""
-    try:
-        return pd.read_csv(file_path)
-    except FileNotFoundError:
-        return None
-    
-def get_file_path(subfolder, filename):
-    """Constructs the full path to a data file."""
-    return os.path.join(settings.DATA_DIR, subfolder, f'{filename}.csv')
+def render_heatmap(map_center, zoom_start, radius, state=None, district=None):
+    """
+    Builds the folium heatmap HTML from pre-binned heat cells.
+
+    Only the cells for the initial zoom are inlined; the map fetches the
+    cells for its viewport from the heat cell endpoint as the user pans/zooms.
+    """
+    with span('heat_cells'):
+        heat_data = get_heat_grid().cells(zoom_start, state=state, district=district)
+    with span('folium'):
+        folium_map = folium.Map(location=map_center, zoom_start=zoom_start)
+        heatmap = HeatMap(heat_data, radius=radius).add_to(folium_map)
+        scope = {key: value for key, value in (('state', state), ('district', district)) if value}
+        url = reverse('heatmap_cells') + (f'?{urlencode(scope)}' if scope else '')
+        HeatCellLoader(folium_map, heatmap, url).add_to(folium_map)
+        # Clicking the map shows the accidents around that point
+        NearbyAccidentsTool(folium_map, reverse('spatial_radius') + (f'?{urlencode(scope)}' if scope else '')).add_to(folium_map)
+        return folium_map._repr_html_()
+
 
 # --- Page Views ---
+# The page and data views are async: their work runs in the bounded 'pages'
+# and 'data' pools (see utils/executor.py) instead of blocking the server.
 
+@offload('pages')
+@dataset_conditional(lambda request: (None, None), page=True)
 def dashboard_page(request):
     """View for the All-India Dashboard with robust data cleaning."""
-    df = load_data(os.path.join(settings.DATA_DIR, 'all_india.csv'))
+    # The store hands out the shared, already-typed national frame
+    # (numeric lat/lon, parsed dates), so it must not be modified here.
+    with span('load'):
+        df = get_store().frame()
     if df is None:
         raise Http404("All India dataset not found.")
-
-    # --- THIS IS THE FIX FOR THE LATITUDE/LONGITUDE ERROR ---
-    # We force 'latitude' and 'longitude' to be numeric, turning any non-numeric
-    # values (like 'Gujarat') into NaN (Not a Number).
-    df['latitude'] = pd.to_numeric(df['latitude'], errors='coerce')
-    df['longitude'] = pd.to_numeric(df['longitude'], errors='coerce')
-    
-    # We also keep the robust fix for the Date column
-    df['Date'] = pd.to_datetime(df['Date'], errors='coerce')
-    # ---------------------------------------------------------
+    # Chart counts are precomputed per dataset version
+    with span('aggregate'):
+        summary = get_aggregates().summary()
 
     # 1. Pie Chart: Accident severity
-    severity_counts = df['Accident_Severity'].value_counts().to_dict()
+    severity_counts = summary.top('severity')
 
     # 2. Bar Chart: Accidents per road type
-    road_type_counts = df['Road_Type'].value_counts().to_dict()
+    road_type_counts = summary.top('road_type')
 
-    # 3. Line Chart: Accidents by month
-    # This will now safely ignore rows with bad dates or locations
-    accidents_by_month = df.dropna(subset=['Date']).resample('M', on='Date').size().to_dict()
-    accidents_by_month = {time.strftime('%Y-%m'): count for time, count in accidents_by_month.items()}
+    # 3. Line Chart: Accidents by month (rows with bad dates are not counted)
+    accidents_by_month = summary.monthly()
 
-    # 4. Map: Overall accident heatmap
+    # 4. Map: Overall accident heatmap (binned cells, rows without lat/lon are skipped)
+    # (rendered once per data version, see utils/fragments.py)
     map_center = [20.5937, 78.9629]
-    india_map = folium.Map(location=map_center, zoom_start=5)
-    # This .dropna() is now very important, as it will remove rows where lat/lon are NaN
-    heat_data = df[['latitude', 'longitude']].dropna().values.tolist()
-    if heat_data:
-        HeatMap(heat_data, radius=15).add_to(india_map)
-    map_html = india_map._repr_html_()
+    map_html = cached_fragment('dashboard_map', lambda: render_heatmap(map_center, 5, radius=15))
 
     # 5. Top 5 States
     # top_5_states = df['State'].value_counts().head(5).to_dict()
-    last_5_states = df['State'][::-1].value_counts().tail(5).sort_values(ascending=True) .to_dict()
+    last_5_states = dict(sorted(summary['states'].items(), key=lambda item: item[1])[:5])
 
     context = {
         'page_title': 'All-India Accident Dashboard',
@@ -81,68 +101,66 @@ def dashboard_page(request):
         # 'top_5_states': top_5_states,
         'last_5_states': last_5_states
     }
-    return render(request, 'analyzer/dashboard.html', context)
+    with span('template'):
+        return render(request, 'analyzer/dashboard.html', context)
 
 # analyzer/views.py
 
+@offload('pages')
+@dataset_conditional(lambda request, state_name: (state_name, request.GET.get('district_filter')), page=True)
 def state_page(request, state_name):
     """View for the State-specific Page, with robust data cleaning."""
-    file_path = get_file_path('states', state_name)
-    df_full = load_data(file_path)
-    if df_full is None:
+    store = get_store()
+    aggregates = get_aggregates()
+    with span('aggregate'):
+        state_summary = aggregates.summary(state_name)
+    if state_summary is None:
         raise Http404(f"Data for state '{state_name}' not found.")
 
-    # --- THIS IS THE FIX ---
-    # We force all relevant columns to their correct data type.
-    # This prevents any sorting or analysis errors.
-    df_full['latitude'] = pd.to_numeric(df_full['latitude'], errors='coerce')
-    df_full['longitude'] = pd.to_numeric(df_full['longitude'], errors='coerce')
-    df_full['Date'] = pd.to_datetime(df_full['Date'], errors='coerce')
-    # This line is the most direct fix for the current error.
-    df_full['District'] = df_full['District'].astype(str)
-    # -----------------------
-
     # Get a sorted list of unique districts for the filter dropdown
-    available_districts = sorted(df_full['District'].unique())
+    available_districts = sorted(state_summary['districts'])
 
     # Check if a district was selected from the filter form
     selected_district = request.GET.get('district_filter', '')
 
-    # Filter the DataFrame if a district is selected
+    # Use the district counts if a district is selected
     if selected_district:
-        df = df_full[df_full['District'] == selected_district].copy()
+        with span('aggregate'):
+            summary = aggregates.summary(state_name, selected_district)
         page_title = f'Analysis for {selected_district}, {state_name}'
     else:
-        df = df_full.copy()
+        summary = state_summary
         page_title = f'{state_name} State Accident Analysis'
+    if summary is None:
+        summary = Summary()
 
-    # --- All calculations below are now safe ---
-    severity_counts = df['Accident_Severity'].value_counts().to_dict()
+    severity_counts = summary.top('severity')
 
     if selected_district:
         top_5_heading = f'Top Road Types in {selected_district}'
-        top_5_data = df['Road_Type'].value_counts().head(5).to_dict()
+        top_5_data = summary.top('road_type', 5)
     else:
         top_5_heading = 'Top 5 Districts'
-        top_5_data = df['District'].value_counts().head(5).to_dict()
+        top_5_data = summary.top('districts', 5)
 
-    weather_counts = df['Weather_Conditions'].value_counts().to_dict()
+    weather_counts = summary.top('weather')
 
-    accidents_by_month = df.dropna(subset=['Date']).resample('M', on='Date').size().to_dict()
-    accidents_by_month = {time.strftime('%Y-%m'): count for time, count in accidents_by_month.items()}
+    accidents_by_month = summary.monthly()
 
-    if not df.empty:
-        map_center = [df['latitude'].mean(), df['longitude'].mean()]
-        zoom_start = 10 if selected_district else 7
-    else:
-        map_center = [20.5937, 78.9629]
-        zoom_start = 7
-        
-    state_map = folium.Map(location=map_center, zoom_start=zoom_start)
-    heat_data = df[['latitude', 'longitude']].dropna().values.tolist()
-    if heat_data:
-        HeatMap(heat_data, radius=12).add_to(state_map)
-    map_html = state_map._repr_html_()
+    def render_map():
+        # Only sliced when the map isn't cached
+        with span('load'):
+            df = store.district(state_name, selected_district) if selected_district else store.state(state_name)
+        if df is not None and not df.empty:
+            map_center = [float(df['latitude'].mean()), float(df['longitude'].mean())]
+            zoom_start = 10 if selected_district else 7
+        else:
+            map_center = [20.5937, 78.9629]
+            zoom_start = 7
+        return render_heatmap(map_center, zoom_start, radius=12, state=state_name, district=selected_district)
+
+    # The map HTML is cached per data version of the state/district
+    map_html = cached_fragment('state_map', render_map, state=state_name, district=selected_district)
 
     context = {
         'page_title': page_title,
@@ -157,28 +175,29 @@ def state_page(request, state_name):
         'available_districts': available_districts,
         'selected_district': selected_district,
     }
-    return render(request, 'analyzer/state_detail.html', context)
-
+    with span('template'):
+        return render(request, 'analyzer/state_detail.html', context)
+
+@offload('pages')
+@dataset_conditional(
+    lambda request, state_name=None, district_name=None: (
+        state_name or request.GET.get('state_select'), district_name or request.GET.get('district_select')
+    ),
+    page=True,
+)
 def district_page(request, state_name=None, district_name=None):
     """
     Handles the District Detail page with robust data cleaning before ML processing.
     """
     # --- Part 1: Get data for the filter dropdowns ---
-    states_path = os.path.join(settings.DATA_DIR, 'states')
-    try:
-        all_states = sorted([name.replace('.csv', '') for name in os.listdir(states_path) if name.endswith('.csv')])
-    except FileNotFoundError:
-        all_states = []
+    catalog = get_catalog()
+    all_states = catalog.states()
 
     selected_state = state_name or request.GET.get('state_select')
     
     available_districts = []
     if selected_state:
-        districts_path = os.path.join(settings.DATA_DIR, 'districts', selected_state)
-        try:
-            available_districts = sorted([name.replace('.csv', '') for name in os.listdir(districts_path) if name.endswith('.csv')])
-        except FileNotFoundError:
-            available_districts = []
+        available_districts = catalog.districts(selected_state)
 
     selected_district = district_name or request.GET.get('district_select')
 
@@ -193,79 +212,52 @@ def district_page(request, state_name=None, district_name=None):
     }
 
     if selected_state and selected_district:
-        file_path = os.path.join(settings.DATA_DIR, 'districts', selected_state, f'{selected_district}.csv')
-        df = load_data(file_path)
+        with span('load'):
+            df = get_store().district(selected_state, selected_district)
         
         if df is not None and not df.empty:
-            # --- THIS IS THE FIX ---
-            # 1. Force coordinate columns to be numeric. Invalid values become NaN.
-            df['latitude'] = pd.to_numeric(df['latitude'], errors='coerce')
-            df['longitude'] = pd.to_numeric(df['longitude'], errors='coerce')
-            
-            # 2. Remove any rows that have invalid coordinates before doing any analysis.
-            df.dropna(subset=['latitude', 'longitude'], inplace=True)
-            # -----------------------
+            # Coordinates are already numeric; remove rows that had invalid ones
+            # before doing any analysis.
+            df = df.dropna(subset=['latitude', 'longitude'])
 
             context['data_loaded'] = True
             context['page_title'] = f'Hotspot Analysis for {selected_district}, {selected_state}'
             
-            # --- ML INTEGRATION (Now Safe) ---
-            model_path = os.path.join(settings.BASE_DIR, 'analyzer', 'models', 'dbscan_model.joblib')
-            try:
-                dbscan_model = joblib.load(model_path)
-            except FileNotFoundError:
-                dbscan_model = None
-
-            coords = df[['latitude', 'longitude']].to_numpy() # No need for .dropna() here anymore
-            
-            if dbscan_model is not None and len(coords) > 0:
-                scaler = StandardScaler()
-                coords_scaled = scaler.fit_transform(coords)
-                clusters = dbscan_model.fit_predict(coords_scaled)
-                df['cluster'] = clusters
-            else:
-                df['cluster'] = 0
-
-            # Prepare data for the template
-            map_data = df[['latitude', 'longitude', 'Date', 'Time', 'Accident_Severity', 'Road_Type', 'cluster']].copy()
-            map_data.columns = ['Latitude', 'Longitude', 'Date', 'Time', 'Severity', 'Road_Type', 'Cluster']
-            context['accident_json'] = map_data.to_json(orient='records')
+            # --- ML INTEGRATION ---
+            # The map loads the points with their hotspot labels (clustered once
+            # per district, see utils/hotspots.py) page by page from the points
+            # API, so they are not embedded in the page.
+            context['points_url'] = reverse('district_points', args=[selected_state, selected_district])
+            context['nearby_url'] = reverse('spatial_radius') + '?' + urlencode({'state': selected_state, 'district': selected_district})
+            context['nearby_metres'] = SPATIAL_CLICK_RADIUS_METRES
+            district_info = get_catalog().district(selected_state, selected_district)
+            context['district_bbox'] = json.dumps(district_info['bbox'] if district_info else None)
             
             # Other context data...
+            with span('aggregate'):
+                summary = get_aggregates().summary(selected_state, selected_district)
             context['total_accidents'] = len(df)
-            context['peak_time'] = df['Time'].mode()[0] if not df['Time'].empty else 'N/A'
-            context['common_road_type'] = df['Road_Type'].mode()[0] if not df['Road_Type'].empty else 'N/A'
-            context['severity_data'] = json.dumps(df['Accident_Severity'].value_counts().to_dict())
-            context['road_type_data'] = json.dumps(df['Road_Type'].value_counts().to_dict())
-            context['weather_data'] = json.dumps(df['Weather_Conditions'].value_counts().to_dict())
-
-    return render(request, 'analyzer/district_detail.html', context)
+            context['peak_time'] = summary.mode('time')
+            context['common_road_type'] = summary.mode('road_type')
+            context['severity_data'] = json.dumps(summary.top('severity'))
+            context['road_type_data'] = json.dumps(summary.top('road_type'))
+            context['weather_data'] = json.dumps(summary.top('weather'))
+
+    with span('template'):
+        return render(request, 'analyzer/district_detail.html', context)
 @login_required
 def submit_page(request):
     """
     Handles submission of new accident data, ensuring correct data types and column order.
     """
-    states_path = os.path.join(settings.DATA_DIR, 'states')
-    try:
-        all_states = sorted([name.replace('.csv', '') for name in os.listdir(states_path) if name.endswith('.csv')])
-    except FileNotFoundError:
-        all_states = []
-
-    districts_by_state = {}
-    for state in all_states:
-        districts_path = os.path.join(settings.DATA_DIR, 'districts', state)
-        try:
-            districts_by_state[state] = sorted([name.replace('.csv', '') for name in os.listdir(districts_path) if name.endswith('.csv')])
-        except FileNotFoundError:
-            districts_by_state[state] = []
-
-    india_df = load_data(os.path.join(settings.DATA_DIR, 'all_india.csv'))
-    if india_df is not None:
-        road_types = sorted(india_df['Road_Type'].dropna().unique())
-        weather_conditions = sorted(india_df['Weather_Conditions'].dropna().unique())
-        light_conditions = sorted(india_df['Light_Conditions'].dropna().unique())
-    else:
-        road_types, weather_conditions, light_conditions = [], [], []
+    districts_by_state = get_catalog().districts_by_state()
+    all_states = list(districts_by_state)
+
+    # Dropdown values come from the cached vocabularies, not the dataset
+    vocabulary = get_vocabulary()
+    road_types = vocabulary.values('Road_Type')
+    weather_conditions = vocabulary.values('Weather_Conditions')
+    light_conditions = vocabulary.values('Light_Conditions')
 
     if request.method == 'POST':
         # Get all data from the form
@@ -285,60 +277,63 @@ def submit_page(request):
         if not all([state, district, latitude, longitude, date, time, severity, road_type, weather, num_vehicles, num_casualties, light]):
             return redirect('submit_page')
 
-        # Define the master column order
-        master_column_order = [
-            'Accident_Index', 'Date', 'Time', 'latitude', 'longitude', 
-            'Accident_Severity', 'Number_of_Vehicles', 'Number_of_Casualties', 
-            'Road_Type', 'Weather_Conditions', 'Light_Conditions', 'State', 'District'
-        ]
-
-        # Get the last Accident_Index
-        india_csv_path = os.path.join(settings.DATA_DIR, 'all_india.csv')
-        try:
-            last_index_str = pd.read_csv(india_csv_path, usecols=['Accident_Index']).iloc[-1]['Accident_Index']
-            new_index = int(float(last_index_str)) + 1
-        except (FileNotFoundError, IndexError, ValueError, TypeError):
-            new_index = 1
-
-        # --- THIS IS THE CORRECTED PART ---
-        # Create the new record, ensuring the correct data types (float)
+        # Check the selected state/district against the district polygons
+        # near the coordinates (skipped without geopandas/shapefiles). A
+        # mismatch is reported but the record is kept as submitted.
+        geocoder = get_geocoder()
+        if geocoder is not None:
+            located = geocoder.mismatch(float(latitude), float(longitude), state, district)
+            if located is not None:
+                located_state, located_district = located
+                messages.warning(
+                    request,
+                    f"These coordinates appear to be in {located_district or 'no known district'}, {located_state}, "
+                    f"not in {district}, {state}. The report was saved as submitted.",
+                )
+
+        # Assign the next Accident_Index and log the record durably. The
+        # record is written to the district, state and national partitions
+        # by a batched flush instead of three CSV appends per request. In
+        # the database storage mode it is inserted into the table instead,
+        # which is then the only copy of it.
         new_record = {
-            'Accident_Index': [float(new_index)],
-            'Date': [date],
-            'Time': [time],
-            'latitude': [float(latitude)],
-            'longitude': [float(longitude)],
-            'Accident_Severity': [severity],
-            'Number_of_Vehicles': [float(num_vehicles)], # Changed to float
-            'Number_of_Casualties': [float(num_casualties)], # Changed to float
-            'Road_Type': [road_type],
-            'Weather_Conditions': [weather],
-            'Light_Conditions': [light],
-            'State': [state],
-            'District': [district]
+            'Date': date,
+            'Time': time,
+            'latitude': float(latitude),
+            'longitude': float(longitude),
+            'Accident_Severity': severity,
+            'Number_of_Vehicles': float(num_vehicles),
+            'Number_of_Casualties': float(num_casualties),
+            'Road_Type': road_type,
+            'Weather_Conditions': weather,
+            'Light_Conditions': light,
+            'State': state,
+            'District': district,
         }
-        
-        # Create and reorder the DataFrame
-        new_df = pd.DataFrame(new_record)
-        new_df = new_df[master_column_order]
-
-        # Append to all CSVs
-        district_csv_path = os.path.join(settings.DATA_DIR, 'districts', state, f'{district}.csv')
-        state_csv_path = os.path.join(settings.DATA_DIR, 'states', f'{state}.csv')
-        new_df.to_csv(district_csv_path, mode='a', header=False, index=False)
-        new_df.to_csv(state_csv_path, mode='a', header=False, index=False)
-        new_df.to_csv(india_csv_path, mode='a', header=False, index=False)
-
-        # Re-train the ML Model
-        full_df = pd.read_csv(india_csv_path)
-        coords = full_df[['latitude', 'longitude']].dropna().to_numpy()
-        if len(coords) > 0:
-            scaler = StandardScaler()
-            coords_scaled = scaler.fit_transform(coords)
-            dbscan_model = DBSCAN(eps=0.5, min_samples=5)
-            dbscan_model.fit(coords_scaled)
-            model_path = os.path.join(settings.BASE_DIR, 'analyzer', 'models', 'dbscan_model.joblib')
-            joblib.dump(dbscan_model, model_path)
+        if report_queries.database_storage():
+            new_record, pending = report_queries.submit(new_record), None
+        else:
+            new_record, pending = ingest.submit(new_record)
+        new_df = pd.DataFrame([new_record])[MASTER_COLUMN_ORDER]
+
+        # Add the record to the in-memory dataset and chart counts. The
+        # district's hotspots are re-clustered when its points are next
+        # requested, not in this request.
+        store_version = get_store().append(new_df)
+        get_aggregates().add(new_df, store_version)
+        get_vocabulary().add(new_df)
+        invalidate_fragments(state, district)
+
+        # Only records in the ingest log need flushing to the partitions.
+        if pending is not None and pending >= ingest.INGEST_FLUSH_BATCH_SIZE:
+            ingest.flush()
+        elif pending is not None:
+            jobs.enqueue('flush_ingest', delay=ingest.INGEST_FLUSH_SECONDS, debounce=False)
+
+        # Re-train the state's model in the background. Submissions arriving
+        # while a retrain is still queued are coalesced into the same job.
+        job = jobs.enqueue('retrain_dbscan', payload={'states': [state]})
+        messages.success(request, f"Accident report submitted. Hotspot model retraining is queued (job #{job.pk}).")
 
         return redirect('dashboard')
 
@@ -352,6 +347,107 @@ def submit_page(request):
     }
     return render(request, 'analyzer/submit_form.html', context)
 
+@offload('data', share=True)
+@dataset_conditional(query_scope)
+def heatmap_cells(request):
+    """
+    JSON heat cells for a map viewport.
+
+    Query parameters: zoom, bbox=south,west,north,east and optionally
+    state/district to limit the cells to one partition.
+    """
+    try:
+        zoom = int(request.GET.get('zoom', 5))
+        bbox = request.GET.get('bbox')
+        if bbox:
+            bbox = tuple(float(value) for value in bbox.split(','))
+            if len(bbox) != 4:
+                raise ValueError
+    except ValueError:
+        return JsonResponse({'error': 'zoom must be an integer and bbox must be south,west,north,east.'}, status=400)
+
+    state = request.GET.get('state') or None
+    district = request.GET.get('district') or None
+    cells = get_heat_grid().cells(zoom, bbox or None, state=state, district=district)
+    return JsonResponse({'zoom': clamp_zoom(zoom), 'cells': cells})
+
+@offload('data', share=True)
+@dataset_conditional(url_scope)
+@api_view(['GET'])
+def district_points(request, state_name, district_name):
+    """
+    One page of a district's accident points in the compact columnar format.
+
+    Query parameters: bbox=south,west,north,east, cursor (from the previous
+    page) and limit. See utils/points.py for the encoding.
+    """
+    query = PointsQuerySerializer(data=request.query_params)
+    query.is_valid(raise_exception=True)
+    try:
+        page = get_district_points().page(
+            state_name, district_name,
+            bbox=query.validated_data.get('bbox'),
+            start=query.validated_data.get('cursor', 0),
+            limit=query.validated_data.get('limit'),
+        )
+    except ValueError:
+        raise ValidationError({'cursor': ['Invalid cursor.']})
+    if page is None:
+        raise Http404(f"Data for district '{district_name}' not found.")
+    page['next'] = replace_query_param(request.build_absolute_uri(), 'cursor', page['cursor']) if page['cursor'] else None
+    return Response(page)
+
+def _spatial_query(request, serializer_class):
+    """Validated query parameters and the spatial index of their scope (404 if unknown)."""
+    query = serializer_class(data=request.query_params)
+    query.is_valid(raise_exception=True)
+    params = query.validated_data
+    index = get_spatial_indexes().index(params.get('state'), params.get('district'))
+    if index is None:
+        raise Http404("No data for this state/district.")
+    return params, index
+
+@offload('data', share=True)
+@dataset_conditional(query_scope)
+@api_view(['GET'])
+def spatial_bbox(request):
+    """Accidents inside bbox=south,west,north,east (optionally within state/district)."""
+    params, index = _spatial_query(request, BboxQuerySerializer)
+    positions = index.bbox(*params['bbox'])
+    return Response(SpatialIndexes.results(index, positions, limit=params.get('limit')))
+
+@offload('data', share=True)
+@dataset_conditional(query_scope)
+@api_view(['GET'])
+def spatial_radius(request):
+    """Accidents within radius metres of lat/lon, nearest first."""
+    params, index = _spatial_query(request, RadiusQuerySerializer)
+    positions, distances = index.radius(params['lat'], params['lon'], params['radius'])
+    return Response(SpatialIndexes.results(index, positions, distances, limit=params.get('limit')))
+
+@offload('data', share=True)
+@dataset_conditional(query_scope)
+@api_view(['GET'])
+def spatial_nearest(request):
+    """The k accidents nearest to lat/lon."""
+    params, index = _spatial_query(request, NearestQuerySerializer)
+    positions, distances = index.nearest(params['lat'], params['lon'], params['k'])
+    return Response(SpatialIndexes.results(index, positions, distances, limit=params.get('limit')))
+
+def metrics(request):
+    """Request and span duration histograms in the Prometheus text format."""
+    if request.META.get('REMOTE_ADDR') not in METRICS_ALLOWED_IPS:
+        return HttpResponseForbidden("Metrics are only served to local clients.")
+    return HttpResponse(render_metrics(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+def job_status(request, job_id):
+    """JSON status of a background job (e.g. the retrain queued by a submission)."""
+    try:
+        job = BackgroundJob.objects.get(pk=job_id)
+    except BackgroundJob.DoesNotExist:
+        raise Http404(f"Job {job_id} not found.")
+    return JsonResponse(jobs.job_status(job))
+
 # analyzer/views.py
 
 # --- AUTHENTICATION VIEWS ---
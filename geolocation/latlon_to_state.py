@@ -1,42 +1,50 @@
 # latlon_to_state.py
+# Run from the project root: python -m geolocation.latlon_to_state [--help]
 
-import pandas as pd
+import argparse
+import os
 import time
-from geopy.geocoders import Nominatim
-from geopy.extra.rate_limiter import RateLimiter
-from geopy.exc import GeocoderTimedOut, GeocoderServiceError
-
-print("🚀 Script started: Processing latitude and longitude to state...")  # 👈 Startup message
-
-# Load your cleaned accident data
-df = pd.read_csv("C:/Py_Group/roadsafe_ai/data/cleaned_accidents.csv")   # ✅ Adjust path if needed
-
-# Setup Nominatim geolocator
-geolocator = Nominatim(user_agent="roadsafe_ai")
-geocode = RateLimiter(geolocator.reverse, min_delay_seconds=1)
-
-# Function to reverse geocode and get state
-def get_state(row, retries=3, delay=2):
-    lat, lon = row['latitude'], row['longitude']
-    for attempt in range(retries):
-        try:
-            location = geocode((lat, lon), language='en')
-            if location and 'state' in location.raw['address']:
-                return location.raw['address']['state']
-            else:
-                return "Unknown"
-        except (GeocoderTimedOut, GeocoderServiceError) as e:
-            print(f"⚠️ Retry {attempt+1}/{retries} for ({lat}, {lon}): {e}")
-            time.sleep(delay)
-        except Exception as e:
-            print(f"❌ Unexpected error at ({lat}, {lon}): {e}")
-            return "Unknown"
-    return "Unknown"
-
-# Apply to all rows
-print("🛰️ Classifying states from lat/lon...")
-df['State'] = df.apply(lambda row: get_state(row), axis=1)
-
-# Save updated dataset
-df.to_csv("C:/Py_Group/roadsafe_ai/data/raw/accidents_with_states.csv", index=False)
-print("✅ States added and saved to data/accidents_with_states.csv")
+
+import pandas as pd
+
+from analyzer.utils.reverse_geocode import reverse_geocode
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Add the state of each accident from its coordinates.')
+    parser.add_argument('--input', default='data/cleaned_accidents.csv', help='Cleaned accident data.')
+    parser.add_argument('--output', default='data/raw/accidents_with_states.csv')
+    parser.add_argument('--data-dir', default='data', help='Directory with the shapefiles and the lookup cache.')
+    parser.add_argument('--workers', type=int, default=None, help='Geocoding processes (default: one per CPU).')
+    args = parser.parse_args(argv)
+
+    print("🚀 Script started: Processing latitude and longitude to state...")  # 👈 Startup message
+
+    # Load your cleaned accident data
+    df = pd.read_csv(args.input)
+
+    # Offline lookup against the shipped shapefiles (no Nominatim requests).
+    # Coordinates are deduplicated, cached in <data dir>/.cache/ and geocoded
+    # in parallel chunks.
+    districts_shapefile = os.path.join(args.data_dir, 'shapefiles', 'districts', '2011_Dist.shp')
+    states_shapefile = os.path.join(args.data_dir, 'shapefiles', 'States', 'Admin2.shp')
+    cache_file = os.path.join(args.data_dir, '.cache', 'reverse_geocode.sqlite3')
+
+    print("🛰️ Classifying states from lat/lon...")
+    started = time.perf_counter()
+    places = reverse_geocode(
+        df['latitude'], df['longitude'],
+        districts_path=districts_shapefile, states_path=states_shapefile, cache_file=cache_file,
+        workers=args.workers,
+    )
+    df['State'] = places['State'].fillna("Unknown").to_numpy()
+    print(f"⏱️ Classified {len(df)} rows in {time.perf_counter() - started:.1f}s")
+
+    # Save updated dataset
+    os.makedirs(os.path.dirname(args.output) or '.', exist_ok=True)
+    df.to_csv(args.output, index=False)
+    print(f"✅ States added and saved to {args.output}")
+
+
+if __name__ == '__main__':
+    main()
@@ -3,6 +3,11 @@ ASGI config for roadsafe_ai project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
 
+The analyzer's page and data views are async and run their work in bounded
+pools (see analyzer/utils/executor.py), so serve the project through this
+module with an ASGI server (e.g. ``uvicorn roadsafe_ai.asgi:application``)
+to keep slow pages from holding up other requests.
+
 For more information on this file, see
 https://docs.djangoproject.com/en/5.2/howto/deployment/asgi/
 """
@@ -43,6 +43,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    # Server-Timing header, per-view metrics and opt-in profiling
+    'analyzer.middleware.TimingMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -80,10 +82,38 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        # WAL lets readers run while the job worker or an import writes.
+        # Transactions take the write lock when they begin (waiting up to
+        # 'timeout'); a deferred transaction that reads and then writes fails
+        # with "database is locked" at once if another writer got in between.
+        'OPTIONS': {
+            'init_command': 'PRAGMA journal_mode=WAL; PRAGMA synchronous=NORMAL;',
+            'timeout': 20,
+            'transaction_mode': 'IMMEDIATE',
+        },
     }
 }
 
 
+# Caches
+# https://docs.djangoproject.com/en/5.2/topics/cache/
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    # Rendered map HTML (see analyzer/utils/fragments.py). The local-memory
+    # backend evicts least recently used entries; with CULL_FREQUENCY equal
+    # to MAX_ENTRIES it drops one entry at a time.
+    'fragments': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'roadsafe-fragments',
+        'TIMEOUT': None,
+        'OPTIONS': {'MAX_ENTRIES': 256, 'CULL_FREQUENCY': 256},
+    },
+}
+
+
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
 